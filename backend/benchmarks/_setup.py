@@ -0,0 +1,47 @@
+"""Shared bootstrap for the micro-benchmarks in this directory.
+
+Run a benchmark from the `backend` directory, e.g.::
+
+    python -m benchmarks.jwt_auth
+
+Each script gets Django configured against a throwaway test database, so it
+never touches `db.sqlite3`.
+"""
+import os
+import sys
+import time
+import atexit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'evento_app.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from django.test.runner import DiscoverRunner  # noqa: E402
+
+# Fast hasher: benchmarks create users but never measure password hashing
+settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+setup_test_environment()
+_runner = DiscoverRunner(verbosity=0)
+_old_config = _runner.setup_databases()
+atexit.register(lambda: _runner.teardown_databases(_old_config))
+
+
+def bench(label, func, number=1000, repeat=5):
+    """Run `func` `number` times, `repeat` times, and print the best per-call time."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    per_call_us = best / number * 1e6
+    print(f'{label:<55} {per_call_us:10.1f} µs/call')
+    return per_call_us
@@ -0,0 +1,58 @@
+"""Per-request cost of JWT authentication with EmailVerificationMiddleware enabled.
+
+Compares the previous setup (middleware and DRF each decode the token and load
+the user) with the shared single pass, and the ALLOWED_PATHS matcher.
+"""
+from benchmarks._setup import bench
+
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.authentication import RequestCachedJWTAuthentication
+from users.middleware import EmailVerificationMiddleware
+from users.models import User
+
+
+user = User.objects.create_user(username='bench', email='bench@example.com', password='x')
+token = str(AccessToken.for_user(user))
+factory = RequestFactory()
+
+
+def make_request():
+    request = factory.get('/api/events/', HTTP_AUTHORIZATION=f'Bearer {token}')
+    return request
+
+
+def run(authenticator):
+    """Simulate middleware + DRF authentication for one request."""
+    def view(request):
+        authenticator.authenticate(Request(request))
+    middleware = EmailVerificationMiddleware(view)
+    middleware.jwt_authenticator = authenticator
+
+    def once():
+        middleware(make_request())
+    return once
+
+
+print('JWT authentication per request')
+old = bench('before: middleware + DRF each authenticate', run(JWTAuthentication()), number=500)
+new = bench('after: single shared pass', run(RequestCachedJWTAuthentication()), number=500)
+print(f'{"saving":<55} {old - new:10.1f} µs/call ({(old - new) / old:.0%})')
+
+for label, authenticator in (('before', JWTAuthentication()), ('after', RequestCachedJWTAuthentication())):
+    with CaptureQueriesContext(connection) as queries:
+        run(authenticator)()
+    print(f'{label}: {len(queries.captured_queries)} user SELECT(s) per request')
+
+print()
+print('ALLOWED_PATHS matching (non-allowed path, worst case)')
+paths = EmailVerificationMiddleware.ALLOWED_PATHS
+matcher = EmailVerificationMiddleware.ALLOWED_PATHS_RE
+path = '/api/registrations/validate_qr/'
+bench('before: any(path.startswith(p) for p in ALLOWED_PATHS)', lambda: any(path.startswith(p) for p in paths), number=100000)
+bench('after: precompiled regex match', lambda: matcher.match(path), number=100000)
@@ -0,0 +1,41 @@
+"""Overhead of TokenBucketThrottle.allow_request() per cache backend.
+
+The limiter should add well under a millisecond per request.
+"""
+import os
+import tempfile
+
+from benchmarks._setup import bench
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import RequestFactory, override_settings
+from rest_framework.request import Request
+
+from evento_app.settings import _cache_config
+from evento_app.throttling import TokenBucketThrottle
+
+
+class View:
+    throttle_scope = 'bench'
+
+
+BACKENDS = {
+    'locmem': _cache_config('locmem', 'bench-ratelimit'),
+    'file': _cache_config('file', os.path.join(tempfile.mkdtemp(), 'ratelimit')),
+    'db': _cache_config('db', None),
+}
+
+request = Request(RequestFactory().post('/api/token/', REMOTE_ADDR='203.0.113.7'))
+request._user = None  # anonymous: keyed by IP
+view = View()
+rates = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'bench': '1000000/s'}}
+
+print('TokenBucketThrottle.allow_request()')
+for name, config in BACKENDS.items():
+    with override_settings(CACHES={**settings.CACHES, 'ratelimit': config}, REST_FRAMEWORK=rates):
+        call_command('createcachetable', verbosity=0)
+        caches['ratelimit'].clear()
+        throttle = TokenBucketThrottle()
+        bench(f'{name} cache', lambda: throttle.allow_request(request, view), number=2000)
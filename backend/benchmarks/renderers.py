@@ -0,0 +1,70 @@
+"""Encode/decode time of the JSON and MessagePack renderers on real payloads.
+
+Compares DRF's stdlib JSONRenderer/JSONParser with evento_app.renderers
+(orjson when installed) and MessagePack (when `msgpack` is installed) on an
+event list page of 1,000 rows and on a scanner check-in response.
+"""
+import io
+from datetime import timedelta
+
+from benchmarks._setup import bench
+
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from evento_app import renderers
+from events.models import Event, Registration
+from events.serializers import EventSerializer, RegistrationSerializer
+from users.models import User
+
+ROWS = 1000
+
+admins = [User.objects.create_user(username=f'admin{i}', email=f'admin{i}@example.com', password='x') for i in range(2)]
+now = timezone.now()
+Event.objects.bulk_create([
+    Event(name=f'Concierto {i}', description='Descripción del evento ' * 5, date=now + timedelta(hours=i),
+          location='Auditorio', capacity=500, price='12.50')
+    for i in range(ROWS)
+])
+Event.admins.through.objects.bulk_create([
+    Event.admins.through(event_id=pk, user_id=admin.pk) for pk in Event.objects.values_list('pk', flat=True) for admin in admins
+])
+registration = Registration.objects.create(user=admins[0], event=Event.objects.first(), qr_code='qr_codes/bench.png')
+
+request = Request(APIRequestFactory().get('/api/events/'))
+PAYLOADS = {
+    'event list (1,000 rows)': {
+        'count': ROWS, 'next': None, 'previous': None,
+        'results': EventSerializer(Event.objects.prefetch_related('admins'), many=True, context={'request': request}).data,
+    },
+    'scan response': {
+        'valid': True, 'registration': RegistrationSerializer(registration, context={'request': request}).data,
+        'scanned_at': now, 'message': 'Entrada válida',
+    },
+}
+
+ENCODERS = {
+    'stdlib json': JSONRenderer(),
+    'fast json': renderers.FastJSONRenderer(),
+}
+DECODERS = {
+    'stdlib json': (JSONParser(), 'application/json'),
+    'fast json': (renderers.FastJSONParser(), 'application/json'),
+}
+if renderers.msgpack is not None:
+    ENCODERS['msgpack'] = renderers.MessagePackRenderer()
+    DECODERS['msgpack'] = (renderers.MessagePackParser(), 'application/msgpack')
+if renderers.orjson is None:
+    print('orjson is not installed: "fast json" is the stdlib fallback')
+
+for name, data in PAYLOADS.items():
+    number = 20 if 'list' in name else 5000
+    for label, renderer in ENCODERS.items():
+        size = len(renderer.render(data, renderer.media_type, {}))
+        bench(f'{name}: encode {label} ({size} bytes)', lambda: renderer.render(data, renderer.media_type, {}), number=number)
+    for label, (parser, media_type) in DECODERS.items():
+        body = ENCODERS[label].render(data, media_type, {})
+        bench(f'{name}: decode {label}', lambda: parser.parse(io.BytesIO(body), media_type, {}), number=number)
@@ -0,0 +1,70 @@
+"""Serialization time per 1,000 rows: full serializers vs sparse fieldsets.
+
+"full" is the default list representation (events embed every admin as a
+UserSerializer, registrations embed the user and render `qr_url`);
+"+ prefetch" is the same with the related rows loaded up front; "sparse"
+is `?fields=` over `values()`, as the list views serve it.
+"""
+from datetime import timedelta
+
+from benchmarks._setup import bench
+
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from events.models import DistributionGroup, Event, Registration
+from events.serializers import EventSerializer, RegistrationSerializer
+from users.models import User
+
+ROWS = 1000
+
+factory = APIRequestFactory()
+
+
+def make_request(query=''):
+    return Request(factory.get(f'/api/events/{query}'))
+
+
+admins = [User.objects.create_user(username=f'admin{i}', email=f'admin{i}@example.com', password='x') for i in range(3)]
+attendee = User.objects.create_user(username='attendee', email='attendee@example.com', password='x')
+group = DistributionGroup.objects.create(name='Bench')
+now = timezone.now()
+Event.objects.bulk_create([
+    Event(name=f'Event {i}', date=now + timedelta(hours=i), location='Hall', capacity=100, price=5, group=group)
+    for i in range(ROWS)
+])
+events = list(Event.objects.all())
+Event.admins.through.objects.bulk_create([
+    Event.admins.through(event_id=event.pk, user_id=admin.pk) for event in events for admin in admins
+])
+Registration.objects.bulk_create([
+    Registration(user=attendee, event=event, short_code=f'B{event.pk:07d}', qr_code='qr_codes/bench.png')
+    for event in events
+])
+
+
+def serialize(serializer_class, queryset, query=''):
+    request = make_request(query)
+    return lambda: serializer_class(queryset.all(), many=True, context={'request': request}).data
+
+
+def serialize_values(serializer_class, queryset, query):
+    request = make_request(query)
+
+    def run():
+        serializer = serializer_class(context={'request': request})
+        lookups = serializer.values_lookups()
+        return serializer.values_representation(queryset.values(*set(lookups.values())), lookups)
+    return run
+
+
+EVENT_FIELDS = '?fields=id,name,date,location,price,group,group_name,is_public,registered_count'
+REGISTRATION_FIELDS = '?fields=id,user,event,short_code,used,attendee_type'
+
+bench('events: full', serialize(EventSerializer, Event.objects.all()), number=1)
+bench('events: full + prefetch', serialize(EventSerializer, Event.objects.select_related('group').prefetch_related('admins')), number=1)
+bench('events: sparse (values)', serialize_values(EventSerializer, Event.objects.all(), EVENT_FIELDS), number=1)
+bench('registrations: full', serialize(RegistrationSerializer, Registration.objects.all()), number=1)
+bench('registrations: full + select_related', serialize(RegistrationSerializer, Registration.objects.select_related('user')), number=1)
+bench('registrations: sparse (values)', serialize_values(RegistrationSerializer, Registration.objects.all(), REGISTRATION_FIELDS), number=1)
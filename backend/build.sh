@@ -6,6 +6,7 @@ pip install -r requirements.txt
 
 python manage.py collectstatic --no-input
 python manage.py migrate
+python manage.py createcachetable
 
 # Create initial superuser if it doesn't exist
 python manage.py create_initial_superuser
@@ -0,0 +1,85 @@
+"""Fast JSON and MessagePack renderers/parsers for DRF.
+
+Configured in REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] and
+['DEFAULT_PARSER_CLASSES']:
+
+- FastJSONRenderer / FastJSONParser encode and decode with orjson when it
+  is installed and fall back to DRF's stdlib implementation otherwise (and
+  for indented output, e.g. `Accept: application/json; indent=4`). The
+  output matches DRF's: UTC datetimes end in 'Z', Decimals become numbers,
+  lazy translations become strings, U+2028/U+2029 are escaped.
+- MessagePackRenderer / MessagePackParser handle `application/msgpack`
+  (`Accept` / `Content-Type`, or `?format=msgpack`) for the mobile app and
+  the scanners. They need the optional `msgpack` package; settings only
+  enable them when it is importable.
+
+JSON stays the first renderer, so clients that send no Accept header keep
+getting JSON.
+"""
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+
+# Types orjson/msgpack don't know natively (Decimal, lazy strings, QuerySet...)
+# are converted the way DRF's own encoder does it
+_encode_default = JSONEncoder().default
+
+ORJSON_OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        ret = orjson.dumps(data, default=_encode_default, option=ORJSON_OPTIONS)
+        # Escaped like DRF does; these bytes only ever occur inside JSON strings
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FastJSONParser(JSONParser):
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read() if stream is not None else b'')
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_encode_default, use_bin_type=True, datetime=False)
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, strict_map_key=False)
+        except Exception as exc:
+            raise ParseError('MessagePack parse error - %s' % (str(exc) or type(exc).__name__))
+
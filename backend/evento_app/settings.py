@@ -39,7 +39,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     # 'django.middleware.csrf.CsrfViewMiddleware',  # Desactivado temporalmente
     'django.contrib.auth.middleware.AuthenticationMiddleware',
-    # 'users.middleware.EmailVerificationMiddleware',  # Desactivado temporalmente
+    # 'users.middleware.EmailVerificationMiddleware',  # Desactivado temporalmente (shares its JWT result with DRF when enabled)
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -111,6 +111,74 @@ EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'False') == 'True'
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'no-reply@example.com')
 
+# Cache configuration. Local memory by default (one cache per worker); set
+# CACHE_BACKEND=file or CACHE_BACKEND=db to share it between gunicorn workers.
+def _cache_config(backend, location):
+    if backend == 'file':
+        return {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}
+    if backend == 'db':
+        # Requires `python manage.py createcachetable`
+        return {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'django_cache'}
+    return {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': location}
+
+import tempfile
+CACHES = {
+    'default': _cache_config(
+        os.getenv('CACHE_BACKEND', 'locmem'),
+        os.getenv('CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'eventoapp_cache')),
+    ),
+}
+
+# Rate-limit buckets (see evento_app.throttling). Shared between workers by default ('file');
+# 'db' shares them between machines, 'locmem' is only right for a single process (each worker
+# would otherwise allow the full rate).
+CACHES['ratelimit'] = _cache_config(
+    os.getenv('RATELIMIT_CACHE_BACKEND', 'file'),
+    os.getenv('RATELIMIT_CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'eventoapp_ratelimit')),
+)
+RATELIMIT_CACHE = 'ratelimit'
+RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'True').lower() in ('1', 'true', 'yes')
+
+# Anonymous event list pages (events.listcache). Only used with a backend every worker
+# shares ('file' or 'db'), so an Event change invalidates every copy; with the locmem
+# default, or TTL 0, the cache is disabled.
+CACHES['eventlist'] = _cache_config(
+    os.getenv('EVENT_LIST_CACHE_BACKEND', 'locmem'),
+    os.getenv('EVENT_LIST_CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'eventoapp_eventlist')),
+)
+EVENT_LIST_CACHE = 'eventlist'
+EVENT_LIST_CACHE_TTL = int(os.getenv('EVENT_LIST_CACHE_TTL', '60'))
+
+# How often each worker checks live events for new/deleted entry codes (see events.hotcache)
+HOT_CODES_RECHECK_SECONDS = float(os.getenv('HOT_CODES_RECHECK_SECONDS', '1'))
+
+# Live attendance stream (events.live). 'db' follows check-ins from every worker
+# through the database; 'memory' only sees this process (single worker).
+LIVE_STREAM_MODE = os.getenv('LIVE_STREAM_MODE', 'db' if int(os.getenv('WEB_CONCURRENCY', '1')) > 1 else 'memory')
+LIVE_STREAM_MAX_SECONDS = int(os.getenv('LIVE_STREAM_MAX_SECONDS', '60'))
+LIVE_STREAM_POLL_SECONDS = float(os.getenv('LIVE_STREAM_POLL_SECONDS', '2'))
+
+# Hours after Event.date when a (non-live) event counts as finished and its analytics are cached for good
+ANALYTICS_FINISHED_AFTER_HOURS = int(os.getenv('ANALYTICS_FINISHED_AFTER_HOURS', '24'))
+
+# The revenue rollup (events.rollups) recomputes each day on every run until this long after
+# the day ended; a transaction committing later than that is not counted
+ROLLUP_SAFETY_LAG_SECONDS = int(os.getenv('ROLLUP_SAFETY_LAG_SECONDS', '60'))
+
+# Delta sync (events.sync): watermark lag for late commits, and how long deletions are remembered.
+# Clients whose watermark is older than the retention get a full snapshot.
+SYNC_SAFETY_SECONDS = int(os.getenv('SYNC_SAFETY_SECONDS', '5'))
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', '30'))
+
+# Export jobs (events.reports) still 'running' this long after they started are taken as
+# abandoned by a dead worker and queued again
+EXPORT_JOB_TIMEOUT_SECONDS = int(os.getenv('EXPORT_JOB_TIMEOUT_SECONDS', '1800'))
+
+# Seconds a user's admin/creator/member sets stay cached (see events.authz). Only used with a
+# shared default cache (CACHE_BACKEND=file or db); with locmem they are loaded on every request,
+# since a removed admin/member would otherwise keep access on the workers not invalidated.
+AUTHZ_CACHE_TTL = int(os.getenv('AUTHZ_CACHE_TTL', '60'))
+
 # Basic logging config
 LOGGING = {
     'version': 1,
@@ -169,23 +237,60 @@ if SENTRY_DSN:
         pass
 
 # Django REST Framework + Simple JWT
+# JSON goes through orjson when installed (evento_app.renderers); application/msgpack
+# is offered when the optional msgpack package is
+from importlib.util import find_spec
+_MSGPACK = find_spec('msgpack') is not None
+
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'evento_app.renderers.FastJSONRenderer',
+        *(('evento_app.renderers.MessagePackRenderer',) if _MSGPACK else ()),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'evento_app.renderers.FastJSONParser',
+        *(('evento_app.renderers.MessagePackParser',) if _MSGPACK else ()),
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.RequestCachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # Reverse proxies in front of gunicorn (Render/Railway: 1). Throttles key anonymous clients
+    # on the address this many hops from the end of X-Forwarded-For, so a client-supplied
+    # header cannot pick its own bucket. Use 0 when clients connect to gunicorn directly.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '1')),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # Token-bucket rates per throttle_scope (evento_app.throttling.TokenBucketThrottle)
+    'DEFAULT_THROTTLE_RATES': {
+        'login': os.getenv('RATE_LOGIN', '10/min'),
+        'register': os.getenv('RATE_REGISTER', '10/hour'),
+        'email_verification': os.getenv('RATE_EMAIL_VERIFICATION', '5/hour'),
+        'phone_verification': os.getenv('RATE_PHONE_VERIFICATION', '5/hour'),
+        'invitation_info': os.getenv('RATE_INVITATION_INFO', '30/min'),
+        'validate_qr': os.getenv('RATE_VALIDATE_QR', '120/min'),
+    },
 }
 
 from datetime import timedelta
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=int(os.getenv('JWT_ACCESS_MINUTES', '60'))),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=int(os.getenv('JWT_REFRESH_DAYS', '1'))),
+    'TOKEN_OBTAIN_SERIALIZER': 'users.tokens.UserClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'users.tokens.UserClaimsTokenRefreshSerializer',
 }
 
+# Seconds each worker keeps the slim user row used by JWT authentication
+JWT_USER_CACHE_TTL = int(os.getenv('JWT_USER_CACHE_TTL', '30'))
+# Embed that slim user in access tokens so authenticated requests need no user query.
+# Role/flag changes then reach a client when its access token is refreshed.
+JWT_EMBED_USER_CLAIMS = os.getenv('JWT_EMBED_USER_CLAIMS', 'False').lower() in ('1', 'true', 'yes')
+
 # OAuth / Social Authentication
 AUTHENTICATION_BACKENDS = (
     'social_core.backends.google.GoogleOAuth2',
@@ -214,6 +319,11 @@ SOCIAL_AUTH_PIPELINE = (
 
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:5173')
 
+# /tickets/ redirects here when set (e.g. http://localhost:3000 while developing the React app);
+# otherwise it serves the static prototype below, or the Django template if that file is missing
+FRONTEND_DEV_SERVER_URL = os.getenv('FRONTEND_DEV_SERVER_URL', '')
+TICKETS_PROTOTYPE_PATH = os.getenv('TICKETS_PROTOTYPE_PATH', str(BASE_DIR.parent / 'frontend_web' / 'prototype' / 'index.html'))
+
 # CORS & CSRF Configuration
 CORS_ALLOW_CREDENTIALS = True
 # Be strict in production
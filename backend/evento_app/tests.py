@@ -0,0 +1,135 @@
+import datetime
+import io
+import unittest
+import uuid
+from decimal import Decimal
+from importlib.util import find_spec
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from evento_app import renderers
+from evento_app.throttling import TokenBucketThrottle
+
+
+class View:
+    throttle_scope = 'test'
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'test': '3/min'}})
+class TokenBucketThrottleProxyTests(SimpleTestCase):
+    """With the default NUM_PROXIES (1) the client is the last X-Forwarded-For entry, whatever the client sends."""
+
+    def setUp(self):
+        caches[settings.RATELIMIT_CACHE].clear()
+
+    def allowed(self, forwarded_for):
+        request = Request(RequestFactory().post('/api/token/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=forwarded_for))
+        request._user = None  # anonymous: keyed by IP
+        return TokenBucketThrottle().allow_request(request, View())
+
+    def test_spoofed_forwarded_for_does_not_reset_the_bucket(self):
+        results = [self.allowed(f'198.51.100.{i}, 203.0.113.7') for i in range(5)]
+        self.assertEqual(results, [True, True, True, False, False])
+
+    def test_clients_behind_the_proxy_get_their_own_buckets(self):
+        for _ in range(3):
+            self.assertTrue(self.allowed('203.0.113.7'))
+        self.assertFalse(self.allowed('203.0.113.7'))
+        self.assertTrue(self.allowed('203.0.113.8'))
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'test': '3/min'}})
+class TokenBucketThrottleAccountingTests(SimpleTestCase):
+    def setUp(self):
+        caches[settings.RATELIMIT_CACHE].clear()
+
+    def allowed(self, throttle=None):
+        request = Request(RequestFactory().post('/api/token/', REMOTE_ADDR='203.0.113.7'))
+        request._user = None
+        return (throttle or TokenBucketThrottle()).allow_request(request, View())
+
+    def test_default_backend_is_shared_between_workers(self):
+        from django.core.cache.backends.locmem import LocMemCache
+        self.assertNotIsInstance(caches[settings.RATELIMIT_CACHE], LocMemCache)
+
+    def test_concurrent_requests_cannot_share_the_last_token(self):
+        from concurrent.futures import ThreadPoolExecutor
+        locmem = {**settings.CACHES, 'ratelimit': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                                   'LOCATION': 'throttle-race'}}
+        with override_settings(CACHES=locmem):
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                results = list(pool.map(lambda _: self.allowed(), range(40)))
+        self.assertEqual(results.count(True), 3)
+
+    def test_tokens_come_back_over_the_period(self):
+        from unittest import mock
+        start = 6000.0  # the start of a period
+        with mock.patch('evento_app.throttling.time.time', return_value=start + 30):
+            self.assertEqual([self.allowed() for _ in range(4)], [True, True, True, False])
+        with mock.patch('evento_app.throttling.time.time', return_value=start + 80):
+            # 20 s into the next period: 2/3 of the previous 3 requests still count
+            throttle = TokenBucketThrottle()
+            self.assertEqual([self.allowed(throttle), self.allowed(throttle)], [True, False])
+            self.assertGreater(throttle.wait(), 0)
+        with mock.patch('evento_app.throttling.time.time', return_value=start + 190):
+            self.assertEqual([self.allowed() for _ in range(4)], [True, True, True, False])
+
+
+PAYLOAD = {
+    'name': 'Cena de gala \u2028ñ',
+    'price': Decimal('12.50'),
+    'date': datetime.datetime(2026, 3, 19, 20, 30, 5, 123, tzinfo=datetime.timezone.utc),
+    'day': datetime.date(2026, 3, 19),
+    'entry_code': uuid.UUID(int=42),
+    'label': gettext_lazy('Invitado'),
+    'admins': [{'id': 1, 'username': 'ana'}],
+    'group': None,
+    'rate': 0.25,
+}
+
+
+class FastJSONTests(SimpleTestCase):
+    def test_output_matches_drf(self):
+        self.assertEqual(renderers.FastJSONRenderer().render(PAYLOAD), JSONRenderer().render(PAYLOAD))
+
+    def test_indented_output_uses_drf(self):
+        rendered = renderers.FastJSONRenderer().render(PAYLOAD, 'application/json; indent=4')
+        self.assertEqual(rendered, JSONRenderer().render(PAYLOAD, 'application/json; indent=4'))
+
+    def test_without_orjson_it_is_drf(self):
+        from unittest import mock
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(renderers.FastJSONRenderer().render(PAYLOAD), JSONRenderer().render(PAYLOAD))
+            body = JSONRenderer().render(PAYLOAD)
+            self.assertEqual(renderers.FastJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+
+    def test_parser_matches_drf(self):
+        body = JSONRenderer().render(PAYLOAD)
+        self.assertEqual(renderers.FastJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+
+    def test_parse_errors(self):
+        with self.assertRaises(ParseError):
+            renderers.FastJSONParser().parse(io.BytesIO(b'{"name": '))
+
+
+@unittest.skipUnless(find_spec('msgpack'), 'msgpack is not installed')
+class MessagePackTests(SimpleTestCase):
+    def test_round_trip_matches_the_json_representation(self):
+        import json
+        packed = renderers.MessagePackRenderer().render(PAYLOAD)
+        unpacked = renderers.MessagePackParser().parse(io.BytesIO(packed))
+        self.assertEqual(unpacked, json.loads(JSONRenderer().render(PAYLOAD)))
+
+    def test_parse_errors(self):
+        with self.assertRaises(ParseError):
+            renderers.MessagePackParser().parse(io.BytesIO(b'\xc1'))
+
+    def test_offered_by_content_negotiation(self):
+        self.assertIn('evento_app.renderers.MessagePackRenderer', settings.REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'])
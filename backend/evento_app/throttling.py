@@ -0,0 +1,96 @@
+"""Token-bucket rate limiting for DRF views.
+
+Usage on a view or `@action`::
+
+    throttle_classes=[TokenBucketThrottle], throttle_scope='login'
+
+The rate of each scope comes from REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']
+('10/min' = bursts of up to 10 requests, refilled at 10 per minute). Buckets
+are keyed by scope and by user (authenticated) or client IP (anonymous), and
+live in the cache named by RATELIMIT_CACHE, which must be shared by every
+gunicorn worker (file or db; locmem only for a single process). When a
+request is refused DRF answers 429 with `Retry-After` set from `wait()`.
+
+The bucket is kept as a sliding window of two per-period counters, taken
+with `cache.add()` + `cache.incr()` rather than read-then-set, so concurrent
+requests can't both spend the last token. Those calls are atomic on the
+locmem, memcached and redis backends; Django's file and db backends
+implement `incr()` as get+set, which narrows the race to that call.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'10/min' -> (10, 60). Same format as DRF's SimpleRateThrottle."""
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    cache_key_prefix = 'rl'
+
+    def __init__(self):
+        self._wait = None
+
+    def get_rate(self, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if not scope:
+            return scope, None
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        return scope, rate
+
+    def get_cache_key(self, request, scope):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            ident = f'u{user.pk}'
+        else:
+            ident = f'ip{self.get_ident(request)}'
+        return f'{self.cache_key_prefix}:{scope}:{ident}'
+
+    def allow_request(self, request, view):
+        if not getattr(settings, 'RATELIMIT_ENABLED', True):
+            return True
+        scope, rate = self.get_rate(view)
+        if rate is None:
+            return True
+        capacity, period = parse_rate(rate)
+
+        cache = caches[getattr(settings, 'RATELIMIT_CACHE', 'default')]
+        key = self.get_cache_key(request, scope)
+        now = time.time()
+        window, elapsed = divmod(now, period)
+        current = f'{key}:{int(window)}'
+        # Requests of the previous period still count for the part of it inside the last `period` seconds
+        previous = cache.get(f'{key}:{int(window) - 1}', 0)
+        carried = previous * (1 - elapsed / period)
+        cache.add(current, 0, 2 * period)
+        try:
+            taken = cache.incr(current)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.add(current, 1, 2 * period)
+            taken = 1
+        if carried + taken <= capacity:
+            return True
+        # Refused requests don't use up the limit
+        try:
+            cache.decr(current)
+        except ValueError:
+            pass
+        if taken > capacity or not previous:
+            self._wait = period - elapsed
+        else:
+            # Until enough of the previous period has slid out of the window
+            self._wait = max(0.0, period * (1 - (capacity - taken) / previous) - elapsed)
+        return False
+
+    def wait(self):
+        return self._wait
@@ -7,11 +7,9 @@ from rest_framework import routers
 from events.views import EventViewSet, RegistrationViewSet, WalletViewSet, TransactionViewSet
 from events.views import DistributionGroupViewSet
 from events.views import GroupAccessTokenViewSet
-from users.views import UserViewSet, OAuthCallbackView
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
+from events.views import ExportJobViewSet, SyncView, BootstrapView
+from users.views import UserViewSet, OAuthCallbackView, ThrottledTokenObtainPairView
+from rest_framework_simplejwt.views import TokenRefreshView
 
 router = routers.DefaultRouter()
 router.register(r'events', EventViewSet, basename='event')
@@ -21,12 +19,15 @@ router.register(r'group-tokens', GroupAccessTokenViewSet, basename='groupaccesst
 router.register(r'users', UserViewSet, basename='user')
 router.register(r'wallets', WalletViewSet, basename='wallet')
 router.register(r'transactions', TransactionViewSet, basename='transaction')
+router.register(r'export-jobs', ExportJobViewSet, basename='exportjob')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', lambda request: redirect('tickets/')),
+    path('api/sync/', SyncView.as_view(), name='sync'),
+    path('api/bootstrap/', BootstrapView.as_view(), name='bootstrap'),
     path('api/', include(router.urls)),
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/token/', ThrottledTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('auth/', include('social_django.urls', namespace='social')),
     path('auth/callback/', OAuthCallbackView.as_view(), name='oauth_callback'),
@@ -22,6 +22,7 @@ def generate_qr_code(data, filename_prefix=None):
         canvas.seek(0)
         
         filename = f"{data}.png"
-        return filename, File(canvas)
+        # File() without a name is falsy, which made callers skip saving the image
+        return filename, File(canvas, name=filename)
     except Exception:
         return None, None
@@ -1,20 +1,20 @@
 from django.contrib import admin
 from .models import Event, Registration, EmailLog, DistributionGroup
-from .models import GroupAccessToken, GroupInvitation, Wallet, Transaction
+from .models import GroupAccessToken, GroupInvitation, Wallet, Transaction, WalletSnapshot
 
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'date', 'location', 'max_qr_codes', 'registration_deadline')
+    list_display = ('id', 'name', 'date', 'location', 'max_qr_codes', 'registration_deadline', 'is_live')
     search_fields = ('name', 'description')
-    list_filter = ('date',)
+    list_filter = ('date', 'is_live')
 
 
 @admin.register(Registration)
 class RegistrationAdmin(admin.ModelAdmin):
-    list_display = ('id', 'event', 'user', 'entry_code', 'used')
+    list_display = ('id', 'event', 'user', 'entry_code', 'short_code', 'used')
     list_filter = ('event', 'used')
-    search_fields = ('entry_code', 'user__username', 'user__email')
+    search_fields = ('entry_code', 'short_code', 'user__username', 'user__email')
 
 
 @admin.register(EmailLog)
@@ -66,3 +66,39 @@ class TransactionAdmin(admin.ModelAdmin):
     list_filter = ('transaction_type', 'created_at')
     search_fields = ('wallet__user__username', 'description')
     readonly_fields = ('created_at',)
+
+
+@admin.register(WalletSnapshot)
+class WalletSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('id', 'wallet', 'last_transaction_id', 'balance', 'created_at')
+    search_fields = ('wallet__user__username',)
+    readonly_fields = ('wallet', 'last_transaction_id', 'balance', 'created_at')
+
+
+from .models import ExportJob
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'group', 'requested_by', 'file_format', 'status', 'processed_rows', 'total_rows', 'created_at', 'finished_at')
+    list_filter = ('status', 'file_format', 'created_at')
+    search_fields = ('group__name', 'requested_by__username', 'fingerprint')
+    readonly_fields = ('fingerprint', 'data_version', 'created_at', 'started_at', 'finished_at')
+
+
+from .models import RefundJob, OutboxEmail
+
+
+@admin.register(RefundJob)
+class RefundJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'event', 'status', 'refunded_payments', 'total_payments', 'refunded_amount', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('id', 'recipient', 'subject', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('recipient', 'subject')
+    readonly_fields = ('created_at', 'sent_at')
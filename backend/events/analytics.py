@@ -0,0 +1,85 @@
+"""Arrival analytics for an event, aggregated in the database.
+
+Arrivals are bucketed with the database's own date truncation (TruncMinute /
+TruncHour / TruncDay: `date_trunc` on Postgres, Django's registered
+functions on SQLite) in one GROUP BY over the (event, attended_at) index.
+Results for finished events never change and are cached without expiry.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDay, TruncHour, TruncMinute
+from django.utils import timezone
+
+from .exports import ATTENDEE_TYPE_LABELS
+from .models import Registration
+
+
+BUCKETS = {'minute': TruncMinute, 'hour': TruncHour, 'day': TruncDay}
+
+
+def event_is_finished(event):
+    """No more check-ins expected: not live and ANALYTICS_FINISHED_AFTER past its date."""
+    after = timedelta(hours=getattr(settings, 'ANALYTICS_FINISHED_AFTER_HOURS', 24))
+    return not event.is_live and event.date + after < timezone.now()
+
+
+def arrivals_by_bucket(event_id, bucket='minute'):
+    """[(bucket start, arrivals)] in time order."""
+    trunc = BUCKETS[bucket]
+    rows = (Registration.objects.filter(event_id=event_id, attended_at__isnull=False)
+            .annotate(slot=trunc('attended_at'))
+            .order_by().values('slot').annotate(n=Count('id')).order_by('slot')
+            .values_list('slot', 'n'))
+    return list(rows)
+
+
+def attendance_by_type(event_id):
+    rows = (Registration.objects.filter(event_id=event_id)
+            .order_by().values('attendee_type')
+            .annotate(registered=Count('id'), attended=Count('id', filter=Q(used=True)))
+            .order_by('attendee_type'))
+    result = []
+    for row in rows:
+        no_show = row['registered'] - row['attended']
+        result.append({
+            'attendee_type': row['attendee_type'],
+            'label': ATTENDEE_TYPE_LABELS.get(row['attendee_type'], row['attendee_type']),
+            'registered': row['registered'],
+            'attended': row['attended'],
+            'no_show': no_show,
+            'no_show_rate': round(no_show / row['registered'], 4) if row['registered'] else 0,
+        })
+    return result
+
+
+def event_analytics(event, bucket='minute'):
+    """Arrivals per bucket, peak gate load and no-show rate per attendee type."""
+    finished = event_is_finished(event)
+    key = f'analytics:{event.pk}:{bucket}'
+    if finished:
+        data = cache.get(key)
+        if data is not None:
+            return {**data, 'cached': True}
+
+    arrivals = arrivals_by_bucket(event.pk, bucket)
+    peak = max(arrivals, key=lambda item: item[1]) if arrivals else None
+    by_type = attendance_by_type(event.pk)
+    registered = sum(row['registered'] for row in by_type)
+    attended = sum(row['attended'] for row in by_type)
+    data = {
+        'event': event.pk,
+        'bucket': bucket,
+        'finished': finished,
+        'arrivals': [{'time': slot, 'count': n} for slot, n in arrivals],
+        'peak': {'time': peak[0], 'count': peak[1]} if peak else None,
+        'registered': registered,
+        'attended': attended,
+        'no_show_rate': round((registered - attended) / registered, 4) if registered else 0,
+        'by_type': by_type,
+    }
+    if finished:
+        cache.set(key, data, None)
+    return {**data, 'cached': False}
@@ -0,0 +1,116 @@
+"""Request-scoped authorization context.
+
+`get_authz(request)` loads, once per request, the ids of the events a user
+administers and the groups they admin, create in or belong to, and answers
+role checks from memory. The sets are also kept in the cache for
+`AUTHZ_CACHE_TTL` seconds and dropped when the corresponding M2M relations
+change (see `events.signals`). That only happens with a cache every worker
+shares (CACHE_BACKEND=file or db): with the per-process locmem default the
+invalidation would reach one worker only, so the sets are loaded per request.
+"""
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import CharField, Value
+
+from .models import Event, DistributionGroup
+
+
+def _cache_key(user_id):
+    return f'authz:{user_id}'
+
+
+def _cache_ttl():
+    """Seconds to keep role sets across requests; 0 unless the default cache is shared."""
+    if isinstance(caches['default'], LocMemCache):
+        return 0
+    return getattr(settings, 'AUTHZ_CACHE_TTL', 60)
+
+
+def _pk(obj):
+    """Accept a model instance or a raw primary key."""
+    return getattr(obj, 'pk', obj)
+
+
+class AuthzContext:
+    """Role sets of one user. Build it with `AuthzContext.for_user` or `get_authz`."""
+
+    def __init__(self, user, managed_events=(), admin_groups=(), creator_groups=(), member_groups=()):
+        self.user = user
+        self.managed_events = frozenset(managed_events)
+        self.admin_groups = frozenset(admin_groups)
+        self.creator_groups = frozenset(creator_groups)
+        self.member_groups = frozenset(member_groups)
+
+    @property
+    def is_staff(self):
+        return bool(self.user and self.user.is_authenticated and self.user.is_staff)
+
+    @classmethod
+    def _load(cls, user_id):
+        """All four role sets in a single UNION ALL query."""
+        kind = lambda name: Value(name, output_field=CharField())
+        queries = [
+            Event.admins.through.objects.filter(user_id=user_id).annotate(kind=kind('event_admin')).values_list('kind', 'event_id'),
+            DistributionGroup.admins.through.objects.filter(user_id=user_id).annotate(kind=kind('group_admin')).values_list('kind', 'distributiongroup_id'),
+            DistributionGroup.creators.through.objects.filter(user_id=user_id).annotate(kind=kind('group_creator')).values_list('kind', 'distributiongroup_id'),
+            DistributionGroup.members.through.objects.filter(user_id=user_id).annotate(kind=kind('group_member')).values_list('kind', 'distributiongroup_id'),
+        ]
+        sets = {'event_admin': set(), 'group_admin': set(), 'group_creator': set(), 'group_member': set()}
+        for name, pk in queries[0].union(*queries[1:], all=True):
+            sets[name].add(pk)
+        return sets['event_admin'], sets['group_admin'], sets['group_creator'], sets['group_member']
+
+    @classmethod
+    def for_user(cls, user):
+        if not user or not user.is_authenticated:
+            return cls(user)
+        ttl = _cache_ttl()
+        if ttl <= 0:
+            return cls(user, *cls._load(user.pk))
+        key = _cache_key(user.pk)
+        sets = cache.get(key)
+        if sets is None:
+            sets = cls._load(user.pk)
+            cache.set(key, sets, ttl)
+        return cls(user, *sets)
+
+    # Role checks. Arguments may be instances or primary keys.
+
+    def is_event_admin(self, event):
+        return _pk(event) in self.managed_events
+
+    def is_group_admin(self, group):
+        return group is not None and _pk(group) in self.admin_groups
+
+    def is_group_creator(self, group):
+        return group is not None and _pk(group) in self.creator_groups
+
+    def is_group_member(self, group):
+        return group is not None and _pk(group) in self.member_groups
+
+    def can_manage_group(self, group):
+        """Staff, group admins and group creators."""
+        return self.is_staff or self.is_group_admin(group) or self.is_group_creator(group)
+
+    def can_admin_event(self, event):
+        """Staff, event admins and admins of the event's group."""
+        return self.is_staff or self.is_event_admin(event) or self.is_group_admin(event.group_id)
+
+    def can_manage_event(self, event):
+        """Staff, event admins and admins/creators of the event's group."""
+        return self.can_admin_event(event) or self.is_group_creator(event.group_id)
+
+
+def get_authz(request):
+    """Return the AuthzContext of `request.user`, building it at most once per request."""
+    http_request = getattr(request, '_request', request)
+    authz = getattr(http_request, '_authz', None)
+    if authz is None or authz.user is not request.user:
+        authz = AuthzContext.for_user(request.user)
+        http_request._authz = authz
+    return authz
+
+
+def invalidate_authz(user_ids):
+    cache.delete_many([_cache_key(pk) for pk in user_ids])
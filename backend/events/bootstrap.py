@@ -0,0 +1,112 @@
+"""Home screen payload for the apps (`GET /api/bootstrap/`).
+
+Everything the home screen shows in one response, built with a fixed number
+of `values()` queries (profile, wallet, registrations joined to their event,
+upcoming events, groups) whatever the number of rows. Registrations carry
+their event inline and the QR payload, so the app needs no follow-up
+requests.
+
+The ETag (`home_etag`) is built before the payload, from the user's row,
+the wallet and COUNT/MAX(updated_at) aggregates of every section, so a
+client with the same data gets an empty 304 without the payload queries.
+"""
+from django.core.files.storage import default_storage
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from users.models import User
+from .authz import get_authz
+from .codes import format_qr_payload
+from .conditional import make_etag
+from .models import DistributionGroup, Event, Registration, Wallet
+
+
+UPCOMING_EVENTS = 50
+
+USER_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name', 'role', 'avatar', 'email_verified', 'phone_verified')
+EVENT_FIELDS = ('id', 'name', 'date', 'location', 'price', 'is_public', 'is_live', 'group_id', 'capacity',
+                'registered_count', 'cancelled_at')
+
+
+def _media_url(request, name):
+    return request.build_absolute_uri(default_storage.url(name)) if name else None
+
+
+def _upcoming_events(authz):
+    visible = Q() if authz.is_staff else (
+        Q(is_public=True) | Q(pk__in=authz.managed_events) | Q(group_id__in=authz.member_groups))
+    return Event.objects.filter(visible, date__gte=timezone.now(), cancelled_at__isnull=True)
+
+
+def home_etag(request):
+    """ETag of `home_payload(request)` from a few aggregates, without building it.
+
+    Computed before the payload, so a concurrent change can only make the
+    next request miss, never hide data.
+    """
+    user_id = request.user.pk
+    authz = get_authz(request)
+    # Flag-only saves (verification) use update_fields and keep updated_at
+    account = User.objects.filter(pk=user_id).values_list(
+        'updated_at', 'email_verified', 'phone_verified', 'wallet__updated_at').first()
+    registrations = Registration.objects.filter(user_id=user_id).aggregate(
+        n=Count('id'), last=Max('updated_at'), event_last=Max('event__updated_at'))
+    events = _upcoming_events(authz).aggregate(n=Count('id'), last=Max('updated_at'))
+    groups = DistributionGroup.objects.filter(pk__in=authz.member_groups).aggregate(n=Count('id'), last=Max('updated_at'))
+    return make_etag(
+        'bootstrap', user_id, request.build_absolute_uri('/'), account,
+        sorted(registrations.items()), sorted(events.items()), sorted(groups.items()),
+        sorted(authz.managed_events), sorted(authz.member_groups), sorted(authz.admin_groups & authz.member_groups),
+    )
+
+
+def home_payload(request):
+    user_id = request.user.pk
+    authz = get_authz(request)
+
+    profile = User.objects.filter(pk=user_id).values(*USER_FIELDS).first()
+    profile['avatar_url'] = _media_url(request, profile.pop('avatar'))
+
+    wallet = Wallet.objects.filter(user_id=user_id).values('id', 'balance', 'currency').first()
+
+    registrations = []
+    rows = (Registration.objects.filter(user_id=user_id)
+            .values('id', 'short_code', 'entry_code', 'used', 'attended_at', 'attendee_first_name', 'attendee_last_name',
+                    'attendee_type', 'alias', 'event_id', 'event__name', 'event__date', 'event__location', 'event__cancelled_at')
+            .order_by('-event__date', 'id'))
+    for row in rows:
+        registrations.append({
+            'id': row['id'],
+            'short_code': row['short_code'],
+            'entry_code': row['entry_code'],
+            'qr': format_qr_payload(row['event_id'], row['short_code']),
+            'used': row['used'],
+            'attended_at': row['attended_at'],
+            'attendee_first_name': row['attendee_first_name'],
+            'attendee_last_name': row['attendee_last_name'],
+            'attendee_type': row['attendee_type'],
+            'alias': row['alias'],
+            'event': {
+                'id': row['event_id'],
+                'name': row['event__name'],
+                'date': row['event__date'],
+                'location': row['event__location'],
+                'cancelled_at': row['event__cancelled_at'],
+            },
+        })
+
+    events = list(_upcoming_events(authz).order_by('date', 'id').values(*EVENT_FIELDS)[:UPCOMING_EVENTS])
+
+    groups = []
+    for row in DistributionGroup.objects.filter(pk__in=authz.member_groups).order_by('name').values('id', 'name', 'logo', 'is_public'):
+        row['logo'] = _media_url(request, row['logo'])
+        row['is_admin'] = authz.is_group_admin(row['id'])
+        groups.append(row)
+
+    return {
+        'user': profile,
+        'wallet': wallet,
+        'registrations': registrations,
+        'events': events,
+        'groups': groups,
+    }
@@ -0,0 +1,114 @@
+"""Set-based helpers for many-to-many relations and registrations.
+
+The M2M helpers write directly to the `through` table in one statement and
+send a single `m2m_changed` signal per batch, so receivers (cache
+invalidation, visibility) run once instead of once per row.
+"""
+from django.db.models.signals import m2m_changed
+
+from .codes import generate_short_code
+from .counters import bump_event_counters
+from .models import Registration
+
+
+def _relation_info(instance, field_name):
+    manager = getattr(instance, field_name)
+    through = manager.through
+    return manager, through, manager.source_field_name, manager.target_field_name
+
+
+def current_m2m_ids(instance, field_name):
+    """Set of related ids currently linked to `instance` through `field_name` (one query)."""
+    _, through, source, target = _relation_info(instance, field_name)
+    return set(through.objects.filter(**{source: instance.pk}).values_list(f'{target}_id', flat=True))
+
+
+def _send(instance, field_name, action, pk_set):
+    manager, through, _, _ = _relation_info(instance, field_name)
+    m2m_changed.send(
+        sender=through, action=action, instance=instance, reverse=False,
+        model=manager.model, pk_set=set(pk_set), using=instance._state.db or 'default',
+    )
+
+
+def bulk_add_m2m(instance, field_name, ids, current=None, batch_size=1000):
+    """Link `ids` to `instance`, skipping the ones already linked. Returns the added ids."""
+    _, through, source, target = _relation_info(instance, field_name)
+    if current is None:
+        current = current_m2m_ids(instance, field_name)
+    to_add = set(ids) - set(current)
+    if not to_add:
+        return set()
+    _send(instance, field_name, 'pre_add', to_add)
+    through.objects.bulk_create(
+        [through(**{f'{source}_id': instance.pk, f'{target}_id': pk}) for pk in to_add],
+        batch_size=batch_size, ignore_conflicts=True,
+    )
+    _send(instance, field_name, 'post_add', to_add)
+    return to_add
+
+
+def bulk_remove_m2m(instance, field_name, ids, current=None):
+    """Unlink `ids` from `instance` with a single DELETE. Returns the removed ids."""
+    _, through, source, target = _relation_info(instance, field_name)
+    if current is None:
+        current = current_m2m_ids(instance, field_name)
+    to_remove = set(ids) & set(current)
+    if not to_remove:
+        return set()
+    _send(instance, field_name, 'pre_remove', to_remove)
+    through.objects.filter(**{source: instance.pk, f'{target}__in': to_remove}).delete()
+    _send(instance, field_name, 'post_remove', to_remove)
+    return to_remove
+
+
+def bulk_replace_m2m(instance, field_name, ids):
+    """Make `ids` the exact set of related objects. Returns `(added, removed)`."""
+    current = current_m2m_ids(instance, field_name)
+    ids = set(ids)
+    removed = bulk_remove_m2m(instance, field_name, current - ids, current=current)
+    added = bulk_add_m2m(instance, field_name, ids - current, current=current)
+    return added, removed
+
+
+def _dedupe_short_codes(registrations):
+    """Regenerate the (rare) short codes that already exist in their event, in one query per round."""
+    pending = registrations
+    seen = set()
+    while pending:
+        for reg in pending:
+            while (reg.event_id, reg.short_code) in seen:
+                reg.short_code = generate_short_code()
+            seen.add((reg.event_id, reg.short_code))
+        taken = set(Registration.objects.filter(
+            event_id__in={reg.event_id for reg in pending},
+            short_code__in={reg.short_code for reg in pending},
+        ).values_list('event_id', 'short_code'))
+        pending = [reg for reg in pending if (reg.event_id, reg.short_code) in taken]
+        for reg in pending:
+            reg.short_code = generate_short_code()
+
+
+def _bump_counters(registrations):
+    """bulk_create skips Registration.save(): update the Event counters once per event."""
+    per_event = {}
+    for reg in registrations:
+        types = per_event.setdefault(reg.event_id, {})
+        types[reg.attendee_type] = types.get(reg.attendee_type, 0) + 1
+    for event_id, types in per_event.items():
+        bump_event_counters(event_id, registered=sum(types.values()), types=types)
+
+
+def bulk_create_registrations(registrations, batch_size=1000):
+    """bulk_create registrations with per-event unique short codes and update the Event counters.
+
+    Skips `Registration.save()`, so the QR images are rendered here, before
+    the insert; callers bump the codes version of live events.
+    """
+    _dedupe_short_codes(registrations)
+    for reg in registrations:
+        if not reg.qr_code:
+            reg._render_qr_code()
+    Registration.objects.bulk_create(registrations, batch_size=batch_size)
+    _bump_counters(registrations)
+    return registrations
@@ -0,0 +1,63 @@
+"""Ticket codes: the UUID `entry_code` and the short, typable `short_code`.
+
+Short codes are 8 Crockford base32 characters (no I, L, O or U), unique per
+event. Reading them back is forgiving: case, spaces and dashes are ignored
+and O/I/L are taken as 0/1/1. New QR images encode `<event id>-<short code>`,
+which fits the QR alphanumeric mode and gives a much smaller symbol than the
+36-character UUID; printed tickets with the UUID keep working.
+"""
+import re
+import secrets
+import uuid
+
+
+CROCKFORD_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+SHORT_CODE_LENGTH = 8
+
+_TYPOS = str.maketrans({'O': '0', 'I': '1', 'L': '1'})
+_SHORT_CODE_RE = re.compile(f'^[{CROCKFORD_ALPHABET}]{{{SHORT_CODE_LENGTH}}}$')
+_COMPACT_RE = re.compile(r'^(\d+)-([0-9A-Za-z]{%d})$' % SHORT_CODE_LENGTH)
+
+
+def generate_short_code():
+    return ''.join(secrets.choice(CROCKFORD_ALPHABET) for _ in range(SHORT_CODE_LENGTH))
+
+
+def normalize_short_code(value):
+    """Canonical form of a typed short code, or None if it can't be one."""
+    code = re.sub(r'[\s-]', '', str(value)).upper().translate(_TYPOS)
+    return code if _SHORT_CODE_RE.match(code) else None
+
+
+def format_qr_payload(event_id, short_code):
+    """What a ticket's QR encodes: `<event id>-<short code>` (read back by `parse_ticket_code`)."""
+    return f'{event_id}-{short_code}'
+
+
+def qr_payload(registration):
+    return format_qr_payload(registration.event_id, registration.short_code)
+
+
+def parse_ticket_code(value):
+    """Parse what a scanner or a person sent.
+
+    Returns `('uuid', entry_code, None)`, `('short', short_code, event_id)`
+    (event_id is None when the code was typed without it) or None.
+    Accepts a bare UUID, a URL ending in one, `<event id>-<short code>` and a
+    bare short code.
+    """
+    text = str(value).strip().rstrip('/').rsplit('/', 1)[-1]
+    if len(text) == 36:
+        try:
+            return 'uuid', uuid.UUID(text), None
+        except ValueError:
+            pass
+    compact = _COMPACT_RE.match(text)
+    if compact:
+        code = normalize_short_code(compact.group(2))
+        if code:
+            return 'short', code, int(compact.group(1))
+    code = normalize_short_code(text)
+    if code:
+        return 'short', code, None
+    return None
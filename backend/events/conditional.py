@@ -0,0 +1,101 @@
+"""Conditional GET (ETag / If-None-Match) for the read endpoints.
+
+List ETags come from one aggregate over the filtered queryset:
+`COUNT(*)` and `MAX(updated_at)` plus the view's `etag_aggregates`, which
+cover the related rows embedded in the payload (admins, the registration's
+user, the group name), hashed with the user and the full request path. Adds
+and edits move a max, deletes move the count. When the client's
+`If-None-Match` matches, the view answers 304 before the page is fetched or
+serialized. Detail ETags use the same aggregates for the one row.
+
+Every write path keeps `updated_at` current: `auto_now` on save(), explicit
+`updated_at=` in the `.update()` calls (counters, check-ins) and the
+m2m_changed receivers in events.signals, which also cover the role-dependent
+fields (`is_member`).
+"""
+import hashlib
+from datetime import datetime
+
+from django.db.models import Count, Max
+from django.utils.http import http_date, parse_http_date_safe
+
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def make_etag(*parts):
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # Weak comparison: ignore the W/ prefix on both sides
+    candidates = {tag.strip().removeprefix('W/') for tag in header.split(',')}
+    return etag[2:] in candidates
+
+
+def not_modified(etag, last_modified=None):
+    response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+def modified_since(request, last_modified):
+    """False when If-Modified-Since (and no If-None-Match) shows the client is up to date."""
+    if last_modified is None or 'HTTP_IF_NONE_MATCH' in request.META:
+        return True
+    since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return since is None or int(last_modified.timestamp()) > since
+
+
+class ConditionalGetMixin:
+    """ETag support for `list` and `retrieve` of a ModelViewSet whose model has `updated_at`."""
+
+    # Related rows embedded in the payload, folded into the ETags, e.g. {'group': Max('group__updated_at')}
+    etag_aggregates = {}
+
+    def etag_state(self, model, pks):
+        """COUNT, MAX(updated_at) and `etag_aggregates` over the rows in `pks` (a list or a `values('pk')` queryset)."""
+        # Aggregated over a fresh queryset: joins of the view's filters would narrow the related maxima
+        rows = model.objects.filter(pk__in=pks).order_by()
+        state = rows.aggregate(n=Count('pk', distinct=True), last=Max('updated_at'), **self.etag_aggregates)
+        return sorted(state.items())
+
+    def list_etag(self, request):
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        state = self.etag_state(queryset.model, queryset.values('pk'))
+        user = request.user.pk if request.user.is_authenticated else 'anon'
+        return make_etag(queryset.model._meta.label, user, request.get_full_path(), state)
+
+    def conditional_list(self, request, build):
+        """Answer 304 if the ETag matches, otherwise `build()` and tag the response."""
+        etag = self.list_etag(request)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        response = build()
+        if response.status_code == 200:
+            response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_list(request, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        user = request.user.pk if request.user.is_authenticated else 'anon'
+        state = self.etag_state(type(instance), [instance.pk]) if self.etag_aggregates else []
+        last_modified = max([instance.updated_at] + [value for _, value in state if isinstance(value, datetime)])
+        etag = make_etag(instance._meta.label, instance.pk, user, instance.updated_at.isoformat(), state)
+        if etag_matches(request, etag) or not modified_since(request, last_modified):
+            return not_modified(etag, last_modified)
+        response = Response(self.get_serializer(instance).data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
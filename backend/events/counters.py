@@ -0,0 +1,82 @@
+"""Denormalized registration counters on Event.
+
+`Registration.save()` (create and check-in), the Registration post_delete
+receiver, `check_in()` (QR scans) and the CSV import keep them in step with
+F() updates inside the same transaction as the row change. Anything that
+writes registrations with raw `.update()` or SQL must call
+`bump_event_counters` itself; `manage.py recount_event_counters` recomputes
+them from the registrations table.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from .models import Event, Registration
+
+
+TYPE_COUNTERS = {'member': 'member_count', 'guest': 'guest_count', 'child': 'child_count'}
+COUNTER_FIELDS = ('registered_count', 'checked_in_count') + tuple(TYPE_COUNTERS.values())
+
+
+def bump_event_counters(event_id, registered=0, checked_in=0, types=None):
+    """Add the given deltas to one event's counters in a single UPDATE.
+
+    `types` maps attendee_type -> delta.
+    """
+    deltas = {'registered_count': registered, 'checked_in_count': checked_in}
+    for attendee_type, delta in (types or {}).items():
+        field = TYPE_COUNTERS.get(attendee_type)
+        if field:
+            deltas[field] = deltas.get(field, 0) + delta
+    updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if updates:
+        Event.objects.filter(pk=event_id).update(updated_at=Now(), **updates)
+
+
+def check_in(registration_id, event_id, at):
+    """Mark a registration used unless it already is. True when this call checked it in.
+
+    A conditional UPDATE: of two concurrent scans of the same code only one
+    matches the row, so `checked_in_count` is bumped exactly once.
+    """
+    with transaction.atomic():
+        checked_in = Registration.objects.filter(pk=registration_id, used=False).update(used=True, attended_at=at, updated_at=at)
+        if checked_in:
+            bump_event_counters(event_id, checked_in=1)
+    return bool(checked_in)
+
+
+def computed_counters(event_ids=None):
+    """{event_id: {field: value}} counted from the registrations table."""
+    aggregates = {
+        'registered_count': Count('id'),
+        'checked_in_count': Count('id', filter=Q(used=True)),
+    }
+    for attendee_type, field in TYPE_COUNTERS.items():
+        aggregates[field] = Count('id', filter=Q(attendee_type=attendee_type))
+    qs = Registration.objects.all()
+    if event_ids is not None:
+        qs = qs.filter(event_id__in=event_ids)
+    rows = qs.order_by().values('event_id').annotate(**aggregates)
+    return {row.pop('event_id'): row for row in rows}
+
+
+def recount_event_counters(event_ids=None):
+    """Recompute the counters and save the ones that drifted. Returns the fixed events."""
+    counted = computed_counters(event_ids)
+    events = Event.objects.only('id', *COUNTER_FIELDS)
+    if event_ids is not None:
+        events = events.filter(pk__in=event_ids)
+    zero = dict.fromkeys(COUNTER_FIELDS, 0)
+    now = timezone.now()
+    fixed = []
+    for event in events.iterator(chunk_size=2000):
+        expected = counted.get(event.pk, zero)
+        if any(getattr(event, field) != expected[field] for field in COUNTER_FIELDS):
+            for field in COUNTER_FIELDS:
+                setattr(event, field, expected[field])
+            event.updated_at = now
+            fixed.append(event)
+    Event.objects.bulk_update(fixed, COUNTER_FIELDS + ('updated_at',), batch_size=1000)
+    return fixed
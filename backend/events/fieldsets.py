@@ -0,0 +1,95 @@
+"""Sparse fieldsets: `?fields=` and `?expand=` on the main viewsets.
+
+Without `?fields=` responses keep their full shape. With it, only the listed
+fields are returned and nested objects (`expandable_fields`) collapse to
+primary keys unless named in `?expand=`:
+
+    GET /api/events/?fields=id,name,date
+    GET /api/events/?fields=id,name,admins&expand=admins
+
+When every requested field is backed by a column, the list is read with
+`values()` and each value goes through its serializer field's
+`to_representation()`: no model instances, same output as the regular path.
+"""
+from rest_framework import serializers
+from rest_framework.response import Response
+
+
+def requested(request, param):
+    """The comma separated names in `?<param>=`, or None when absent."""
+    if request is None or not hasattr(request, 'query_params'):
+        return None
+    value = request.query_params.get(param)
+    if value is None:
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class SparseFieldsSerializerMixin:
+    """Applies the request's `?fields=`/`?expand=` (GET only) to a ModelSerializer.
+
+    `expandable_fields` maps a nested field to a factory for its compact form.
+    `values_fields` maps fields that are not plain columns to the `values()`
+    lookup whose raw value is their representation ('group': 'group_id').
+    """
+    expandable_fields = {}
+    values_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        fields = requested(request, 'fields')
+        if fields is None or request.method != 'GET':
+            return
+        for name in set(self.fields) - set(fields):
+            self.fields.pop(name)
+        expand = set(requested(request, 'expand') or ())
+        for name, compact in self.expandable_fields.items():
+            if name in self.fields and name not in expand:
+                self.fields[name] = compact()
+
+    def values_lookups(self):
+        """{field: values() lookup} for the current fields, or None if any needs a model instance."""
+        columns = {field.name: field.attname for field in self.Meta.model._meta.concrete_fields}
+        lookups = {}
+        for name, field in self.fields.items():
+            if isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField)):
+                return None
+            if name in self.values_fields:
+                lookups[name] = self.values_fields[name]
+            elif field.source in columns and not isinstance(field, (serializers.RelatedField, serializers.FileField)):
+                lookups[name] = columns[field.source]
+            else:
+                return None
+        return lookups
+
+    def values_representation(self, rows, lookups):
+        """Serialize `values()` rows (dicts keyed by lookup) with the current fields."""
+        converters = [
+            (name, lookup, None if name in self.values_fields else self.fields[name].to_representation)
+            for name, lookup in lookups.items()
+        ]
+        data = []
+        for row in rows:
+            item = {}
+            for name, lookup, convert in converters:
+                value = row[lookup]
+                item[name] = value if convert is None or value is None else convert(value)
+            data.append(item)
+        return data
+
+
+class SparseFieldsViewMixin:
+    """`list` through `values()` when `?fields=` only asks for column-backed fields."""
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer()
+        lookups = serializer.values_lookups() if requested(request, 'fields') is not None else None
+        if not lookups:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        rows = queryset.values(*set(lookups.values()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.values_representation(page, lookups))
+        return Response(serializer.values_representation(rows, lookups))
@@ -0,0 +1,116 @@
+"""Per-worker cache of entry codes for live events.
+
+While an event has `is_live` set, every worker keeps its registrations in
+memory, indexed by entry code and by short code, so QR scans for unknown or already-used
+codes are answered without touching the database. Only a successful first
+check-in writes (a conditional UPDATE), and the worker updates its own copy
+right away.
+
+Freshness:
+- At most every `HOT_CODES_RECHECK_SECONDS` the worker reads the
+  `(id, codes_version)` of live events in one small query and reloads the
+  codes of any event whose version changed. Creating or deleting a
+  registration (and resetting `used`) bumps `Event.codes_version`.
+- Check-ins made by other workers do not bump the version. A code this worker
+  still believes unused goes to the conditional UPDATE, which finds it used,
+  and the local entry is corrected then.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db.models import F
+
+from .models import Event, Registration
+
+
+HotCode = namedtuple('HotCode', 'registration_id event_id entry_code short_code used attended_at attendee_type attendee')
+LiveEvent = namedtuple('LiveEvent', 'id name group_id version')
+
+
+def bump_codes_version(event_ids):
+    """Tell every worker to reload the codes of these events (no-op unless live)."""
+    event_ids = list(event_ids)
+    if event_ids:
+        Event.objects.filter(pk__in=event_ids, is_live=True).update(codes_version=F('codes_version') + 1)
+
+
+def _attendee_name(first, last, user_first, user_last, username):
+    # Same rules as Registration.get_attendee_name()
+    if first and last:
+        return f'{first} {last}'
+    full_name = f'{user_first} {user_last}'.strip()
+    return full_name or username
+
+
+class HotCodes:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.events = {}    # event_id -> LiveEvent
+        self.codes = {}     # event_id -> {str(entry_code) or short_code: HotCode}
+        self._checked_at = 0.0
+
+    def refresh(self, force=False):
+        recheck = getattr(settings, 'HOT_CODES_RECHECK_SECONDS', 1.0)
+        now = time.monotonic()
+        if not force and now - self._checked_at < recheck:
+            return
+        with self._lock:
+            if not force and now - self._checked_at < recheck:
+                return
+            live = {
+                row[0]: LiveEvent(*row)
+                for row in Event.objects.filter(is_live=True).values_list('id', 'name', 'group_id', 'codes_version')
+            }
+            stale = [pk for pk, event in live.items() if pk not in self.events or self.events[pk].version != event.version]
+            codes = {pk: self.codes[pk] for pk in live if pk not in stale}
+            if stale:
+                for pk in stale:
+                    codes[pk] = {}
+                rows = Registration.objects.filter(event_id__in=stale).values_list(
+                    'entry_code', 'short_code', 'id', 'event_id', 'used', 'attended_at', 'attendee_type',
+                    'attendee_first_name', 'attendee_last_name',
+                    'user__first_name', 'user__last_name', 'user__username',
+                ).iterator(chunk_size=5000)
+                for entry_code, short_code, pk, event_id, used, attended_at, attendee_type, *names in rows:
+                    hit = HotCode(pk, event_id, str(entry_code), short_code, used, attended_at, attendee_type, _attendee_name(*names))
+                    codes[event_id][hit.entry_code] = hit
+                    codes[event_id][short_code] = hit
+            # Swap whole dicts so readers never see a half-built state
+            self.events, self.codes = live, codes
+            self._checked_at = now
+
+    def get_event(self, event_id):
+        self.refresh()
+        return self.events.get(event_id)
+
+    def lookup(self, kind, code, event_id=None):
+        """HotCode for a parsed ticket code (see events.codes.parse_ticket_code), or None.
+
+        Without `event_id` all live events are searched; a short code found in
+        more than one of them is ambiguous and returns None.
+        """
+        self.refresh()
+        key = str(code)
+        if event_id is not None:
+            return self.codes.get(event_id, {}).get(key)
+        hits = [event_codes[key] for event_codes in self.codes.values() if key in event_codes]
+        if len(hits) == 1 or (hits and kind == 'uuid'):
+            return hits[0]
+        return None
+
+    def mark_used(self, hit, attended_at):
+        """Write-through after a check-in (ours or one discovered in the database)."""
+        event_codes = self.codes.get(hit.event_id)
+        if event_codes is not None:
+            hit = hit._replace(used=True, attended_at=attended_at)
+            event_codes[hit.entry_code] = hit
+            event_codes[hit.short_code] = hit
+
+    def clear(self):
+        with self._lock:
+            self.events, self.codes, self._checked_at = {}, {}, 0.0
+
+
+hot_codes = HotCodes()
@@ -0,0 +1,220 @@
+"""Bulk import of attendees from CSV into a DistributionGroup.
+
+The whole file is validated before anything is written. Rows are then
+applied in chunks, each chunk in its own transaction: users are matched by
+email (or created), memberships are inserted directly in the M2M `through`
+table and registrations are created with `bulk_create` (which renders their
+QR images before the insert, see `bulk_create_registrations`).
+"""
+import csv
+import io
+import secrets
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from users.models import User
+from .bulk import bulk_add_m2m, bulk_create_registrations, current_m2m_ids
+from .hotcache import bump_codes_version
+from .models import Event, Registration
+
+
+IMPORT_BATCH_SIZE = 1000
+
+ATTENDEE_TYPE_ALIASES = {
+    '': 'member',
+    'member': 'member', 'fallero': 'member', 'fallera': 'member',
+    'guest': 'guest', 'invitado': 'guest', 'invitada': 'guest',
+    'child': 'child', 'niño': 'child', 'niña': 'child', 'nino': 'child', 'nina': 'child',
+}
+
+CSV_COLUMNS = ['email', 'first_name', 'last_name', 'attendee_type', 'alias', 'event_id']
+
+
+def read_attendee_csv(fileobj):
+    """Return a list of dict rows from an uploaded (bytes) or text CSV file."""
+    data = fileobj.read()
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+    sample = data[:4096]
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(io.StringIO(data), dialect=dialect)
+    rows = []
+    for row in reader:
+        rows.append({(key or '').strip().lower(): (value or '').strip() for key, value in row.items()})
+    return rows
+
+
+def validate_attendee_rows(rows, group, event_ids=None):
+    """Validate every row up front.
+
+    Returns `(clean_rows, errors)` where `errors` is a list of
+    `{'row': <line number>, 'errors': [...]}`. Line numbers count the header
+    as line 1.
+    """
+    group_event_ids = set(
+        Event.objects.filter(group=group).values_list('id', flat=True)
+    ) | set(group.events.values_list('id', flat=True))
+    default_events = list(event_ids or [])
+    invalid_defaults = [pk for pk in default_events if pk not in group_event_ids]
+
+    clean, errors = [], []
+    if invalid_defaults:
+        errors.append({'row': None, 'errors': [f'Eventos que no pertenecen al grupo: {invalid_defaults}']})
+
+    for line, row in enumerate(rows, start=2):
+        row_errors = []
+        email = row.get('email', '').lower()
+        try:
+            validate_email(email)
+        except ValidationError:
+            row_errors.append(f'Email inválido: "{row.get("email", "")}"')
+
+        attendee_type = ATTENDEE_TYPE_ALIASES.get(row.get('attendee_type', '').lower())
+        if attendee_type is None:
+            row_errors.append(f'Tipo de asistente desconocido: "{row.get("attendee_type")}"')
+
+        for field in ('first_name', 'last_name', 'alias'):
+            if len(row.get(field, '')) > 100:
+                row_errors.append(f'{field} supera los 100 caracteres')
+
+        events = default_events
+        if row.get('event_id'):
+            try:
+                event_id = int(row['event_id'])
+            except ValueError:
+                row_errors.append(f'event_id inválido: "{row["event_id"]}"')
+            else:
+                if event_id not in group_event_ids:
+                    row_errors.append(f'El evento {event_id} no pertenece al grupo')
+                events = [event_id]
+
+        if row_errors:
+            errors.append({'row': line, 'errors': row_errors})
+            continue
+        clean.append({
+            'line': line,
+            'email': email,
+            'first_name': row.get('first_name', ''),
+            'last_name': row.get('last_name', ''),
+            'attendee_type': attendee_type,
+            'alias': row.get('alias', ''),
+            'events': events,
+        })
+
+    # Capacity (max_qr_codes) per event, checked against the whole file at once
+    requested = {}
+    for row in clean:
+        for event_id in row['events']:
+            requested[event_id] = requested.get(event_id, 0) + 1
+    if requested:
+        limits = Event.objects.filter(pk__in=requested, max_qr_codes__isnull=False)
+        for event in limits:
+            if event.registered_count + requested[event.pk] > event.max_qr_codes:
+                errors.append({'row': None, 'errors': [
+                    f'El evento "{event.name}" solo admite {event.max_qr_codes} registros '
+                    f'({event.registered_count} existentes, {requested[event.pk]} en el fichero)'
+                ]})
+    return clean, errors
+
+
+def _match_users(emails):
+    """Map lower-cased email -> user id for existing users (lowest id wins)."""
+    found = {}
+    emails = list(emails)
+    for start in range(0, len(emails), IMPORT_BATCH_SIZE):
+        chunk = emails[start:start + IMPORT_BATCH_SIZE]
+        qs = (User.objects.annotate(email_lower=Lower('email')).filter(email_lower__in=chunk)
+              .order_by('id').values_list('email_lower', 'id'))
+        for email, pk in qs:
+            found.setdefault(email, pk)
+    return found
+
+
+def _create_users(rows_by_email):
+    """bulk_create users for the given {email: row} and return {email: id}."""
+    emails = list(rows_by_email)
+    taken = set(User.objects.filter(username__in=[email[:150] for email in emails]).values_list('username', flat=True))
+    unusable = make_password(None)
+    new_users = []
+    for email in emails:
+        username = email[:150]
+        if username in taken:
+            username = f'{email[:143]}-{secrets.token_hex(3)}'
+        taken.add(username)
+        row = rows_by_email[email]
+        new_users.append(User(
+            username=username, email=email, password=unusable,
+            first_name=row['first_name'][:150], last_name=row['last_name'][:150],
+        ))
+    User.objects.bulk_create(new_users, batch_size=IMPORT_BATCH_SIZE)
+    # Not every backend returns primary keys from bulk_create, so read them back
+    return _match_users(emails)
+
+
+def import_attendees(group, rows, event_ids=None, dry_run=False, skip_invalid=False):
+    """Validate and import `rows` (as returned by `read_attendee_csv`).
+
+    Returns a report dict. When there are validation errors nothing is written
+    unless `skip_invalid` is set, in which case only the valid rows are
+    imported.
+    """
+    clean, errors = validate_attendee_rows(rows, group, event_ids)
+    report = {
+        'rows': len(rows),
+        'valid_rows': len(clean),
+        'errors': errors,
+        'users_matched': 0,
+        'users_created': 0,
+        'members_added': 0,
+        'registrations_created': 0,
+        'dry_run': dry_run,
+    }
+    blocking = any(err['row'] is None for err in errors) or (errors and not skip_invalid)
+    if blocking or dry_run:
+        report['imported'] = False
+        return report
+
+    members = current_m2m_ids(group, 'members')
+    user_ids = {}  # email -> user id, shared across chunks
+    for start in range(0, len(clean), IMPORT_BATCH_SIZE):
+        chunk = clean[start:start + IMPORT_BATCH_SIZE]
+        with transaction.atomic():
+            pending = {}
+            for row in chunk:
+                if row['email'] not in user_ids:
+                    pending.setdefault(row['email'], row)
+            matched = _match_users(pending)
+            report['users_matched'] += len(matched)
+            user_ids.update(matched)
+            missing = {email: row for email, row in pending.items() if email not in matched}
+            if missing:
+                created = _create_users(missing)
+                report['users_created'] += len(created)
+                user_ids.update(created)
+
+            added = bulk_add_m2m(group, 'members', {user_ids[row['email']] for row in chunk}, current=members)
+            members |= added
+            report['members_added'] += len(added)
+
+            registrations = [
+                Registration(
+                    user_id=user_ids[row['email']], event_id=event_id,
+                    attendee_first_name=row['first_name'], attendee_last_name=row['last_name'],
+                    attendee_type=row['attendee_type'], alias=row['alias'],
+                )
+                for row in chunk for event_id in row['events']
+            ]
+            bulk_create_registrations(registrations, batch_size=IMPORT_BATCH_SIZE)
+            report['registrations_created'] += len(registrations)
+
+    # bulk_create sends no signals: refresh the code cache of live events
+    bump_codes_version({event_id for row in clean for event_id in row['events']})
+    report['imported'] = True
+    return report
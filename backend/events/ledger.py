@@ -0,0 +1,193 @@
+"""Wallet ledger: `Transaction` rows are the source of truth for balances.
+
+A wallet's balance is its latest `WalletSnapshot` plus the sum of the
+transactions after it, so reading it touches only the short tail of the
+ledger. `post_transaction()` is the writer for single movements: it locks
+the wallet row, derives the balance from the ledger, records `balance_after`
+and mirrors the result into `Wallet.balance` (kept for the admin and old
+clients). Bulk writers (events.refunds) take the same row locks and read
+the balances of a whole batch with `wallet_balances()`.
+
+`manage.py snapshot_wallets` writes new snapshots for wallets with a long
+tail; `manage.py reconcile_wallets` compares every wallet against the full
+ledger and reports (or fixes) drift.
+"""
+import base64
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Transaction, Wallet, WalletSnapshot
+
+
+logger = logging.getLogger('events.ledger')
+
+ZERO = Decimal('0.00')
+
+
+class InsufficientFunds(Exception):
+    def __init__(self, balance):
+        super().__init__(f'Saldo insuficiente: {balance}')
+        self.balance = balance
+
+
+def latest_snapshot(wallet_id):
+    return WalletSnapshot.objects.filter(wallet_id=wallet_id).order_by('-last_transaction_id').first()
+
+
+def wallet_balance(wallet_id):
+    """Latest snapshot + the transactions recorded after it."""
+    snapshot = latest_snapshot(wallet_id)
+    tail = Transaction.objects.filter(wallet_id=wallet_id)
+    if snapshot is not None:
+        tail = tail.filter(id__gt=snapshot.last_transaction_id)
+    total = tail.aggregate(total=Sum('amount'))['total'] or ZERO
+    return (snapshot.balance if snapshot else ZERO) + total
+
+
+def wallet_balances(wallet_ids):
+    """`wallet_balance()` for many wallets in two queries: {wallet_id: balance}."""
+    latest = WalletSnapshot.objects.order_by('-last_transaction_id')
+    snapshots = {
+        row['pk']: row for row in Wallet.objects.filter(pk__in=wallet_ids).annotate(
+            snapshot_last=Subquery(latest.filter(wallet_id=OuterRef('pk')).values('last_transaction_id')[:1]),
+            snapshot_balance=Subquery(latest.filter(wallet_id=OuterRef('pk')).values('balance')[:1]),
+        ).values('pk', 'snapshot_last', 'snapshot_balance')
+    }
+    tails = dict(
+        Transaction.objects.filter(wallet_id__in=wallet_ids)
+        .annotate(snapshot_last=Subquery(latest.filter(wallet_id=OuterRef('wallet_id')).values('last_transaction_id')[:1]))
+        .filter(Q(snapshot_last__isnull=True) | Q(id__gt=F('snapshot_last')))
+        .order_by().values('wallet_id').annotate(total=Sum('amount')).values_list('wallet_id', 'total')
+    )
+    return {
+        pk: (row['snapshot_balance'] or ZERO) + (tails.get(pk) or ZERO)
+        for pk, row in snapshots.items()
+    }
+
+
+def post_transaction(wallet, amount, transaction_type, description='', event=None, allow_negative=False):
+    """Append a transaction to the wallet's ledger and return it.
+
+    Raises InsufficientFunds when a debit would leave the balance below zero
+    (unless `allow_negative`). Runs in its own atomic block, so calling it
+    inside a larger transaction makes the debit roll back with it.
+    """
+    amount = Decimal(amount)
+    with transaction.atomic():
+        # Serializes writers and snapshots of the same wallet
+        locked = Wallet.objects.select_for_update().get(pk=wallet.pk)
+        balance = wallet_balance(locked.pk) + amount
+        if amount < 0 and balance < 0 and not allow_negative:
+            raise InsufficientFunds(balance - amount)
+        tx = Transaction.objects.create(
+            wallet=locked,
+            amount=amount,
+            transaction_type=transaction_type,
+            description=description,
+            event=event,
+            balance_after=balance,
+        )
+        locked.balance = balance
+        locked.save(update_fields=['balance', 'updated_at'])
+    wallet.balance = balance
+    return tx
+
+
+def snapshot_wallet(wallet_id, min_tail=1):
+    """Fold the wallet's tail into a new snapshot if it has at least `min_tail` transactions."""
+    with transaction.atomic():
+        list(Wallet.objects.select_for_update().filter(pk=wallet_id).values_list('pk'))
+        snapshot = latest_snapshot(wallet_id)
+        tail = Transaction.objects.filter(wallet_id=wallet_id)
+        if snapshot is not None:
+            tail = tail.filter(id__gt=snapshot.last_transaction_id)
+        agg = tail.aggregate(n=Count('id'), total=Sum('amount'), last=Max('id'))
+        if not agg['n'] or agg['n'] < min_tail:
+            return None
+        return WalletSnapshot.objects.create(
+            wallet_id=wallet_id,
+            last_transaction_id=agg['last'],
+            balance=(snapshot.balance if snapshot else ZERO) + agg['total'],
+        )
+
+
+def _wallet_chunks(chunk_size):
+    last = 0
+    while True:
+        ids = list(Wallet.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
+
+
+def snapshot_wallets(min_tail=100, chunk_size=1000):
+    """Snapshot every wallet whose tail reached `min_tail` transactions. Returns the new snapshots."""
+    created = []
+    for ids in _wallet_chunks(chunk_size):
+        for wallet_id in ids:
+            snapshot = snapshot_wallet(wallet_id, min_tail)
+            if snapshot is not None:
+                created.append(snapshot)
+    return created
+
+
+def reconcile_wallets(chunk_size=1000, fix=False):
+    """Compare each wallet with its full ledger sum.
+
+    Returns a list of {'wallet', 'ledger', 'stored', 'snapshot'} for wallets
+    whose `Wallet.balance` or snapshot-derived balance differ from the
+    ledger. With `fix`, `Wallet.balance` is rewritten from the ledger.
+    """
+    mismatches = []
+    for ids in _wallet_chunks(chunk_size):
+        ledger = dict(Transaction.objects.filter(wallet_id__in=ids).order_by()
+                      .values('wallet_id').annotate(total=Sum('amount')).values_list('wallet_id', 'total'))
+        stored = dict(Wallet.objects.filter(pk__in=ids).values_list('pk', 'balance'))
+        for wallet_id in ids:
+            expected = ledger.get(wallet_id) or ZERO
+            derived = wallet_balance(wallet_id)
+            if stored[wallet_id] == expected and derived == expected:
+                continue
+            mismatches.append({'wallet': wallet_id, 'ledger': expected, 'stored': stored[wallet_id], 'snapshot': derived})
+            logger.warning('Wallet %s drifted: ledger=%s stored=%s snapshot=%s', wallet_id, expected, stored[wallet_id], derived)
+            if fix:
+                Wallet.objects.filter(pk=wallet_id).update(balance=expected, updated_at=timezone.now())
+    return mismatches
+
+
+def _encode_cursor(tx):
+    return base64.urlsafe_b64encode(f'{tx.created_at.isoformat()}|{tx.pk}'.encode()).decode()
+
+
+def _decode_cursor(value):
+    try:
+        created_at, pk = base64.urlsafe_b64decode(value.encode()).decode().split('|')
+        created_at = parse_datetime(created_at)
+        if created_at is None:
+            return None
+        return created_at, int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def statement_page(wallet, cursor=None, limit=50):
+    """One page of the wallet's statement, newest first, keyed on (created_at, id).
+
+    Returns `(transactions, next_cursor)`, or `(None, None)` for a bad cursor.
+    """
+    qs = wallet.transactions.select_related('event').order_by('-created_at', '-id')
+    if cursor:
+        position = _decode_cursor(cursor)
+        if position is None:
+            return None, None
+        created_at, pk = position
+        qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    rows = list(qs[:limit + 1])
+    next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
@@ -0,0 +1,81 @@
+"""Response cache for the anonymous event list (`GET /api/events/`).
+
+Anonymous visitors only ever see public events, so the serialized page
+depends only on the query parameters and on the scheme and host the
+pagination links are built with. Pages are stored under
+`eventlist:<version>:<hash of origin and normalized parameters>`; any change to an
+Event (save, delete, admins) or to a group name bumps the version, which
+orphans every stored page at once without scanning keys. Orphans expire
+with EVENT_LIST_CACHE_TTL, which also bounds how stale the counters
+(updated with F() expressions, no signals) can get.
+
+The cache alias is EVENT_LIST_CACHE and must be shared by every worker
+(file or db): a version bump in a per-process locmem cache would only reach
+the worker that handled the write, so with locmem the cache is disabled.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+VERSION_KEY = 'eventlist:version'
+
+# Query parameters that change the anonymous list; anything else is ignored
+LIST_PARAMS = ('search', 'visibility', 'group', 'date_from', 'date_to', 'is_free', 'order_by', 'page', 'fields', 'expand')
+
+
+def _cache():
+    return caches[getattr(settings, 'EVENT_LIST_CACHE', 'default')]
+
+
+def enabled():
+    """True when a TTL is set and the backend is shared between workers."""
+    return getattr(settings, 'EVENT_LIST_CACHE_TTL', 60) > 0 and not isinstance(_cache(), LocMemCache)
+
+
+def _fresh_version():
+    # Starts from the clock so a counter lost to eviction never reuses an old version
+    return int(time.time() * 1000)
+
+
+def list_version():
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _fresh_version(), None)
+        version = cache.get(VERSION_KEY) or _fresh_version()
+    return version
+
+
+def bump_list_version():
+    cache = _cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Not set yet (or evicted)
+        cache.add(VERSION_KEY, _fresh_version(), None)
+
+
+def list_key(request):
+    """Cache key for the request: scheme, host and the known, non-empty params in a fixed order.
+
+    The page holds absolute `next`/`previous` links, so the origin is part of the key.
+    """
+    query_params = request.query_params
+    normalized = request.scheme + '://' + request.get_host() + '?' + urlencode(sorted(
+        (name, value) for name in LIST_PARAMS for value in query_params.getlist(name) if value != ''
+    ))
+    digest = hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+    return f'eventlist:{list_version()}:{digest}'
+
+
+def get_page(key):
+    return _cache().get(key)
+
+
+def set_page(key, data):
+    _cache().set(key, data, getattr(settings, 'EVENT_LIST_CACHE_TTL', 60))
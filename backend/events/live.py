@@ -0,0 +1,181 @@
+"""Live attendance feed for the SSE endpoint (`GET /api/events/<id>/live/`).
+
+Check-ins call `publish_checkin()`, which hands the arrival to every stream of
+the same event open in this process once the transaction commits.
+
+With several gunicorn workers a check-in can land in a different process, so
+in 'db' mode (the default when WEB_CONCURRENCY > 1, see LIVE_STREAM_MODE) the
+stream reads new arrivals from the database with a cursor on
+`(attended_at, id)`; local notifications only wake it up early. In 'memory'
+mode the notifications are the data and the database is not polled.
+"""
+import json
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+
+from rest_framework.renderers import BaseRenderer
+
+from .models import Event, Registration
+
+
+LAST_ARRIVALS = 10
+
+_subscribers = {}  # event_id -> set of queue.Queue
+_lock = threading.Lock()
+
+
+def subscribe(event_id):
+    q = queue.Queue(maxsize=1000)
+    with _lock:
+        _subscribers.setdefault(event_id, set()).add(q)
+    return q
+
+
+def unsubscribe(event_id, q):
+    with _lock:
+        queues = _subscribers.get(event_id)
+        if queues is not None:
+            queues.discard(q)
+            if not queues:
+                del _subscribers[event_id]
+
+
+def _deliver(event_id, arrival):
+    with _lock:
+        queues = list(_subscribers.get(event_id, ()))
+    for q in queues:
+        try:
+            q.put_nowait(arrival)
+        except queue.Full:
+            pass  # a stuck client; it resynchronizes from the snapshot when it reconnects
+
+
+def has_listeners(event_id):
+    return event_id in _subscribers
+
+
+def publish_checkin(event_id, registration_id, attendee, attendee_type, attended_at):
+    """Announce a check-in to the live streams of this process after commit."""
+    if not has_listeners(event_id):
+        return
+    arrival = {
+        'id': registration_id,
+        'attendee': attendee,
+        'attendee_type': attendee_type,
+        'attended_at': attended_at,
+    }
+    transaction.on_commit(lambda: _deliver(event_id, arrival))
+
+
+def _arrival_rows(event_id):
+    return (Registration.objects.filter(event_id=event_id, attended_at__isnull=False)
+            .select_related('user')
+            .only('id', 'attendee_type', 'attended_at', 'attendee_first_name', 'attendee_last_name',
+                  'user__username', 'user__first_name', 'user__last_name'))
+
+
+def _as_arrival(registration):
+    return {
+        'id': registration.id,
+        'attendee': registration.get_attendee_name(),
+        'attendee_type': registration.attendee_type,
+        'attended_at': registration.attended_at,
+    }
+
+
+def _counts(event_id):
+    return (Event.objects.filter(pk=event_id)
+            .values('registered_count', 'checked_in_count', 'member_count', 'guest_count', 'child_count').first()) or {}
+
+
+def _sse(event, data, event_id=None):
+    lines = []
+    if event_id:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append('data: ' + json.dumps(data, cls=DjangoJSONEncoder))
+    return '\n'.join(lines) + '\n\n'
+
+
+def _after(cursor):
+    """Rows strictly after `(attended_at, id)` in (attended_at, id) order."""
+    attended_at, pk = cursor
+    return Q(attended_at__gt=attended_at) | Q(attended_at=attended_at, id__gt=pk)
+
+
+def _cursor_id(arrival):
+    return f"{arrival['attended_at'].isoformat()}|{arrival['id']}"
+
+
+def stream_mode():
+    return getattr(settings, 'LIVE_STREAM_MODE', 'memory')
+
+
+def attendance_stream(event_id, max_seconds=None, poll_seconds=None):
+    """Generator of SSE messages: a `snapshot`, then a `checkin` per batch of arrivals.
+
+    Ends after `max_seconds` so a connection never holds a worker thread for
+    long; the `retry:` field makes EventSource reconnect and get a fresh
+    snapshot.
+    """
+    max_seconds = max_seconds if max_seconds is not None else getattr(settings, 'LIVE_STREAM_MAX_SECONDS', 60)
+    poll_seconds = poll_seconds if poll_seconds is not None else getattr(settings, 'LIVE_STREAM_POLL_SECONDS', 2)
+    use_db = stream_mode() == 'db'
+
+    q = subscribe(event_id)
+    try:
+        last = [_as_arrival(reg) for reg in _arrival_rows(event_id).order_by('-attended_at', '-id')[:LAST_ARRIVALS]]
+        counts = _counts(event_id)
+        cursor = (last[0]['attended_at'], last[0]['id']) if last else None
+        yield 'retry: 3000\n\n'
+        yield _sse('snapshot', {'counts': counts, 'last_arrivals': last}, last and _cursor_id(last[0]))
+
+        deadline = time.monotonic() + max_seconds
+        while time.monotonic() < deadline:
+            try:
+                notified = [q.get(timeout=poll_seconds)]
+            except queue.Empty:
+                notified = []
+            while True:
+                try:
+                    notified.append(q.get_nowait())
+                except queue.Empty:
+                    break
+
+            if use_db:
+                rows = _arrival_rows(event_id)
+                if cursor is not None:
+                    rows = rows.filter(_after(cursor))
+                arrivals = [_as_arrival(reg) for reg in rows.order_by('attended_at', 'id')[:500]]
+                if arrivals:
+                    counts = _counts(event_id)
+            else:
+                arrivals = notified
+                if arrivals:
+                    counts = {**counts, 'checked_in_count': counts.get('checked_in_count', 0) + len(arrivals)}
+
+            if not arrivals:
+                yield ': keepalive\n\n'
+                continue
+            cursor = (arrivals[-1]['attended_at'], arrivals[-1]['id'])
+            yield _sse('checkin', {'counts': counts, 'arrivals': arrivals}, _cursor_id(arrivals[-1]))
+    finally:
+        unsubscribe(event_id, q)
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets DRF accept `Accept: text/event-stream`; error bodies become an `error` event."""
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, (str, bytes)):
+            return data
+        return _sse('error', data)
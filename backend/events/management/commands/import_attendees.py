@@ -0,0 +1,46 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from events.importers import CSV_COLUMNS, read_attendee_csv, import_attendees
+from events.models import DistributionGroup
+
+
+class Command(BaseCommand):
+    help = f'Import attendees from a CSV file into a group. Columns: {", ".join(CSV_COLUMNS)}'
+
+    def add_arguments(self, parser):
+        parser.add_argument('group_id', type=int)
+        parser.add_argument('csv_path')
+        parser.add_argument('--event', type=int, action='append', dest='event_ids', default=[],
+                            help='Event to register rows without event_id into (repeatable)')
+        parser.add_argument('--dry-run', action='store_true', help='Only validate the file')
+        parser.add_argument('--skip-invalid', action='store_true', help='Import valid rows even if others have errors')
+        parser.add_argument('--report', help='Write the full JSON report to this path')
+
+    def handle(self, *args, **options):
+        try:
+            group = DistributionGroup.objects.get(pk=options['group_id'])
+        except DistributionGroup.DoesNotExist:
+            raise CommandError(f'Group {options["group_id"]} not found')
+
+        with open(options['csv_path'], 'rb') as f:
+            rows = read_attendee_csv(f)
+        report = import_attendees(group, rows, options['event_ids'],
+                                  dry_run=options['dry_run'], skip_invalid=options['skip_invalid'])
+
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        for error in report['errors'][:20]:
+            self.stdout.write(self.style.WARNING(f'Line {error["row"] or "-"}: {"; ".join(error["errors"])}'))
+        if len(report['errors']) > 20:
+            self.stdout.write(self.style.WARNING(f'... {len(report["errors"]) - 20} more errors'))
+
+        summary = (f'{report["valid_rows"]}/{report["rows"]} valid rows, {report["users_created"]} users created, '
+                   f'{report["users_matched"]} matched, {report["members_added"]} members added, '
+                   f'{report["registrations_created"]} registrations created')
+        if report['imported']:
+            self.stdout.write(self.style.SUCCESS(summary))
+        else:
+            self.stdout.write(self.style.ERROR(f'Nothing imported: {summary}'))
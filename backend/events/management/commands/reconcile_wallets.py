@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from events.ledger import reconcile_wallets
+
+
+class Command(BaseCommand):
+    help = 'Compare every wallet with the sum of its transactions and report the ones that drifted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Wallets checked per batch')
+        parser.add_argument('--fix', action='store_true', help='Rewrite Wallet.balance from the ledger')
+
+    def handle(self, *args, **options):
+        mismatches = reconcile_wallets(chunk_size=options['chunk_size'], fix=options['fix'])
+        for row in mismatches:
+            self.stdout.write(self.style.WARNING(
+                f"Billetera {row['wallet']}: ledger={row['ledger']} guardado={row['stored']} snapshot={row['snapshot']}"
+            ))
+        if mismatches and not options['fix']:
+            self.stdout.write(self.style.ERROR(f'{len(mismatches)} billetera(s) con diferencias'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{len(mismatches)} billetera(s) corregidas' if mismatches else 'Sin diferencias'))
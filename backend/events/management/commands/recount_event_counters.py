@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from events.counters import recount_event_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the registration/check-in counters stored on Event and fix the ones that drifted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_ids', nargs='*', type=int, help='Only these events (default: all)')
+
+    def handle(self, *args, **options):
+        fixed = recount_event_counters(options['event_ids'] or None)
+        for event in fixed:
+            self.stdout.write(f'Evento {event.pk}: {event.registered_count} registros, {event.checked_in_count} entradas')
+        self.stdout.write(self.style.SUCCESS(f'{len(fixed)} evento(s) corregidos'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from events.models import Registration
+
+
+class Command(BaseCommand):
+    help = 'Render the QR images of registrations stored without one (e.g. bulk-created before they were rendered on insert).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_ids', nargs='*', type=int, help='Only these events (default: all)')
+
+    def handle(self, *args, **options):
+        missing = Registration.objects.filter(qr_code='').only('id', 'event_id', 'short_code', 'qr_code').order_by('id')
+        if options['event_ids']:
+            missing = missing.filter(event_id__in=options['event_ids'])
+        rendered = 0
+        for registration in missing.iterator(chunk_size=500):
+            if registration.ensure_qr_code():
+                rendered += 1
+        self.stdout.write(self.style.SUCCESS(f'{rendered} QR generado(s)'))
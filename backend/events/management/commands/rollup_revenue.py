@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from events.rollups import rollup_daily_revenue
+
+
+class Command(BaseCommand):
+    help = 'Fold new transactions into the DailyRevenue rollup (incremental, from the last watermark).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running periodically')
+        parser.add_argument('--sleep', type=float, default=300.0, help='Seconds between runs in --loop mode')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = rollup_daily_revenue()
+            self.stdout.write(self.style.SUCCESS(f'{processed} transacción(es) procesadas'))
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
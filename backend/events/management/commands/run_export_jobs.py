@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from events.reports import run_pending_export_jobs
+
+
+class Command(BaseCommand):
+    help = ('Build pending export jobs (group reports). Jobs running for longer than EXPORT_JOB_TIMEOUT_SECONDS '
+            'are taken as abandoned and queued again; use --loop to keep running as a worker.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new jobs')
+        parser.add_argument('--sleep', type=float, default=5.0, help='Seconds between polls in --loop mode')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = run_pending_export_jobs()
+            if processed:
+                self.stdout.write(self.style.SUCCESS(f'{processed} export job(s) processed'))
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from events.refunds import run_pending_refund_jobs
+
+
+class Command(BaseCommand):
+    help = ('Refund the payments of cancelled events (RefundJob). Jobs left running by a crashed worker '
+            'are resumed on start; use --loop to keep running as a worker.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new jobs')
+        parser.add_argument('--sleep', type=float, default=5.0, help='Seconds between polls in --loop mode')
+
+    def progress(self, job):
+        self.stdout.write(f'Evento {job.event_id}: {job.refunded_payments}/{job.total_payments} pagos devueltos ({job.refunded_amount})')
+
+    def handle(self, *args, **options):
+        # Only one refund worker runs, so anything still 'running' at start was interrupted
+        resume = True
+        while True:
+            processed = run_pending_refund_jobs(resume=resume, progress=self.progress)
+            resume = False
+            if processed:
+                self.stdout.write(self.style.SUCCESS(f'{processed} refund job(s) processed'))
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
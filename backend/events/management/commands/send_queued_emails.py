@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from events.outbox import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = 'Send the emails waiting in the outbox. Use --loop to keep running as a worker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new emails')
+        parser.add_argument('--sleep', type=float, default=10.0, help='Seconds between polls in --loop mode')
+        parser.add_argument('--batch-size', type=int, default=100, help='Emails sent per batch')
+
+    def handle(self, *args, **options):
+        while True:
+            while True:
+                sent, failed = send_queued_emails(options['batch_size'])
+                if sent or failed:
+                    self.stdout.write(self.style.SUCCESS(f'{sent} email(s) sent, {failed} failed'))
+                # Failures stay queued for the next poll instead of being retried right away
+                if failed or sent < options['batch_size']:
+                    break
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from events.ledger import snapshot_wallets
+
+
+class Command(BaseCommand):
+    help = 'Write balance snapshots for wallets with a long ledger tail since their last snapshot.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-tail', type=int, default=100, help='Only wallets with at least this many transactions since their last snapshot')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Wallets read per query')
+
+    def handle(self, *args, **options):
+        created = snapshot_wallets(min_tail=options['min_tail'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'{len(created)} snapshot(s) creados'))
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.27 on 2026-10-19 13:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0020_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='codes_version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Se incrementa al crear o borrar registros; invalida la caché de códigos de entrada.'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='is_live',
+            field=models.BooleanField(default=False, help_text='Evento en curso: los códigos de entrada se cargan en memoria para validar QR sin consultar la base de datos.'),
+        ),
+    ]
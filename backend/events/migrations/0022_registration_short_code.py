@@ -0,0 +1,43 @@
+# Generated by Django 4.2.27 on 2026-10-19 13:13
+
+from django.db import migrations, models
+import events.codes
+
+
+def fill_short_codes(apps, schema_editor):
+    """AddField gives every existing row the same default; give each its own."""
+    Registration = apps.get_model('events', 'Registration')
+    taken = set()
+    batch = []
+    for registration in Registration.objects.only('id', 'event_id').iterator(chunk_size=2000):
+        code = events.codes.generate_short_code()
+        while (registration.event_id, code) in taken:
+            code = events.codes.generate_short_code()
+        taken.add((registration.event_id, code))
+        registration.short_code = code
+        batch.append(registration)
+        if len(batch) >= 2000:
+            Registration.objects.bulk_update(batch, ['short_code'])
+            batch = []
+    if batch:
+        Registration.objects.bulk_update(batch, ['short_code'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0021_event_is_live'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registration',
+            name='short_code',
+            field=models.CharField(default=events.codes.generate_short_code, editable=False, help_text='Código corto (Crockford base32) para teclear a mano; único por evento.', max_length=8),
+        ),
+        migrations.RunPython(fill_short_codes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='registration',
+            constraint=models.UniqueConstraint(fields=('event', 'short_code'), name='unique_registration_short_code'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.27 on 2026-10-19 13:15
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_counters(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    Registration = apps.get_model('events', 'Registration')
+    rows = Registration.objects.order_by().values('event_id').annotate(
+        registered_count=Count('id'),
+        checked_in_count=Count('id', filter=Q(used=True)),
+        member_count=Count('id', filter=Q(attendee_type='member')),
+        guest_count=Count('id', filter=Q(attendee_type='guest')),
+        child_count=Count('id', filter=Q(attendee_type='child')),
+    )
+    for row in rows:
+        Event.objects.filter(pk=row.pop('event_id')).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0022_registration_short_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='checked_in_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Número de entradas validadas.'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='child_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Registros de tipo niño.'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='guest_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Registros de tipo invitado.'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='member_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Registros de tipo fallero.'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='registered_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Número de registros (QR) del evento.'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
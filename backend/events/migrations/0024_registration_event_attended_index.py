@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-19 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0023_event_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='registration',
+            index=models.Index(fields=['event', 'attended_at'], name='registration_event_attended'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.27 on 2026-10-19 13:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0024_registration_event_attended_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('transaction_type', models.CharField(choices=[('deposit', 'Depósito'), ('payment', 'Pago'), ('refund', 'Reembolso'), ('withdrawal', 'Retiro')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, help_text='Suma de `amount` (con signo).', max_digits=14)),
+            ],
+            options={
+                'ordering': ['day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet', 'created_at'], name='transaction_wallet_created'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['event', 'created_at'], name='transaction_event_created'),
+        ),
+        migrations.AddField(
+            model_name='dailyrevenue',
+            name='event',
+            field=models.ForeignKey(blank=True, help_text='Vacío para movimientos sin evento (depósitos, retiros).', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_revenue', to='events.event'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrevenue',
+            constraint=models.UniqueConstraint(fields=('day', 'event', 'transaction_type'), name='unique_daily_revenue'),
+        ),
+    ]
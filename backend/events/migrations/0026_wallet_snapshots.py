@@ -0,0 +1,43 @@
+# Generated by Django 4.2.27 on 2026-10-19 13:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0025_revenue_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_transaction_id', models.BigIntegerField(help_text='Última transacción incluida en el saldo')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-last_transaction_id'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='transaction_wallet_created',
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet', 'created_at', 'id'], name='transaction_wallet_created'),
+        ),
+        migrations.AddField(
+            model_name='walletsnapshot',
+            name='wallet',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='events.wallet'),
+        ),
+        migrations.AddConstraint(
+            model_name='walletsnapshot',
+            constraint=models.UniqueConstraint(fields=('wallet', 'last_transaction_id'), name='unique_wallet_snapshot'),
+        ),
+    ]
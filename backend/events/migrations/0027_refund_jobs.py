@@ -0,0 +1,68 @@
+# Generated by Django 4.2.27 on 2026-10-19 13:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('events', '0026_wallet_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='cancelled_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Fecha de cancelación; los pagos se devuelven con un RefundJob.', null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='refund_of',
+            field=models.OneToOneField(blank=True, help_text='Pago que devuelve esta transacción; un pago solo puede devolverse una vez.', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='refund', to='events.transaction'),
+        ),
+        migrations.CreateModel(
+            name='RefundJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('running', 'En proceso'), ('done', 'Completado'), ('failed', 'Fallido')], default='pending', max_length=20)),
+                ('total_payments', models.IntegerField(default=0)),
+                ('refunded_payments', models.IntegerField(default=0)),
+                ('refunded_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('error_text', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='refund_jobs', to='events.event')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='refund_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OutboxEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient', models.EmailField(max_length=254)),
+                ('subject', models.CharField(max_length=300)),
+                ('body', models.TextField(blank=True)),
+                ('dedupe_key', models.CharField(blank=True, help_text='Evita encolar dos veces el mismo aviso (p.ej. refund:<evento>:<billetera>).', max_length=100, null=True, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('sent', 'Enviado'), ('failed', 'Fallido')], default='pending', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error_text', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'id'], name='outbox_status_id')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='refundjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('event',), name='unique_active_refund_job'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.27 on 2026-10-19 13:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0027_refund_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='distributiongroup',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, help_text='Última modificación (también la de los contadores); base de los ETag.'),
+        ),
+        migrations.AddField(
+            model_name='registration',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
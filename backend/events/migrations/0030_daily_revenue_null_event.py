@@ -0,0 +1,45 @@
+# Generated by Django 4.2.27 on 2026-10-19 13:47
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+def merge_event_less_rows(apps, schema_editor):
+    # Rows left by deleted events (SET_NULL) may repeat a (day, type) pair: fold them into one
+    DailyRevenue = apps.get_model('events', 'DailyRevenue')
+    duplicates = (DailyRevenue.objects.filter(event__isnull=True).order_by().values('day', 'transaction_type')
+                  .annotate(rows=Count('id'), n=Sum('count'), amount=Sum('total')).filter(rows__gt=1))
+    for row in duplicates:
+        rows = DailyRevenue.objects.filter(event__isnull=True, day=row['day'], transaction_type=row['transaction_type']).order_by('id')
+        keep = rows.first()
+        rows.exclude(pk=keep.pk).delete()
+        DailyRevenue.objects.filter(pk=keep.pk).update(count=row['n'], total=row['amount'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0029_sync_tombstones'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='dailyrevenue',
+            name='unique_daily_revenue',
+        ),
+        migrations.AlterField(
+            model_name='dailyrevenue',
+            name='event',
+            field=models.ForeignKey(blank=True, help_text='Vacío para movimientos sin evento (depósitos, retiros) o de eventos borrados.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_revenue', to='events.event'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrevenue',
+            constraint=models.UniqueConstraint(condition=models.Q(('event__isnull', False)), fields=('day', 'event', 'transaction_type'), name='unique_daily_revenue'),
+        ),
+        migrations.RunPython(merge_event_less_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dailyrevenue',
+            constraint=models.UniqueConstraint(condition=models.Q(('event__isnull', True)), fields=('day', 'transaction_type'), name='unique_daily_revenue_no_event'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.27 on 2026-10-19 14:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0030_daily_revenue_null_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rollupwatermark',
+            name='open_from',
+            field=models.DateField(blank=True, help_text='Primer día aún abierto: se recalcula en cada ejecución.', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['created_at'], name='transaction_created'),
+        ),
+    ]
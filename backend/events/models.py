@@ -1,8 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 from users.models import User
 from django.utils import timezone
 import uuid
 from evento_app.utils import generate_qr_code
+from .codes import generate_short_code, qr_payload
 
 class Event(models.Model):
     name = models.CharField(max_length=200)
@@ -18,6 +19,16 @@ class Event(models.Model):
     is_public = models.BooleanField(default=True, help_text='Si es True, el evento es visible para todos. Si es False, solo visible para miembros del grupo.')
     price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, help_text='Precio de entrada al evento. 0 = gratis')
     registration_deadline = models.DateTimeField(null=True, blank=True, help_text='Fecha límite para inscribirse. Dejar en blanco para ilimitado.')
+    is_live = models.BooleanField(default=False, help_text='Evento en curso: los códigos de entrada se cargan en memoria para validar QR sin consultar la base de datos.')
+    codes_version = models.PositiveIntegerField(default=0, editable=False, help_text='Se incrementa al crear o borrar registros; invalida la caché de códigos de entrada.')
+    # Denormalized counters, kept in step by events.counters
+    registered_count = models.IntegerField(default=0, editable=False, help_text='Número de registros (QR) del evento.')
+    checked_in_count = models.IntegerField(default=0, editable=False, help_text='Número de entradas validadas.')
+    member_count = models.IntegerField(default=0, editable=False, help_text='Registros de tipo fallero.')
+    guest_count = models.IntegerField(default=0, editable=False, help_text='Registros de tipo invitado.')
+    child_count = models.IntegerField(default=0, editable=False, help_text='Registros de tipo niño.')
+    cancelled_at = models.DateTimeField(null=True, blank=True, editable=False, help_text='Fecha de cancelación; los pagos se devuelven con un RefundJob.')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, help_text='Última modificación (también la de los contadores); base de los ETag y de /api/sync/.')
     
     def __str__(self):
         return self.name
@@ -51,6 +62,7 @@ class Registration(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     event = models.ForeignKey(Event, on_delete=models.CASCADE)
     entry_code = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    short_code = models.CharField(max_length=8, default=generate_short_code, editable=False, help_text='Código corto (Crockford base32) para teclear a mano; único por evento.')
     qr_code = models.ImageField(upload_to='qrcodes', blank=True)
     used = models.BooleanField(default=False)
     
@@ -63,6 +75,7 @@ class Registration(models.Model):
     alias = models.CharField(max_length=100, blank=True, help_text='Nombre identificativo del QR (ej: Entrada VIP)')
     created_at = models.DateTimeField(auto_now_add=True)
     attended_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def get_attendee_name(self):
         if self.attendee_first_name and self.attendee_last_name:
@@ -72,13 +85,55 @@ class Registration(models.Model):
             return self.user.get_full_name()
         return self.user.username
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'short_code'], name='unique_registration_short_code'),
+        ]
+        indexes = [
+            # Arrival analytics and the live stream cursor
+            models.Index(fields=['event', 'attended_at'], name='registration_event_attended'),
+            # Delta sync (/api/sync/)
+            models.Index(fields=['user', 'updated_at'], name='registration_user_updated'),
+        ]
+
+    def _render_qr_code(self):
+        filename, file_obj = generate_qr_code(qr_payload(self))
+        if filename and file_obj:
+            self.qr_code.save(filename, file_obj, save=False)
+            return True
+        return False
+
+    def ensure_qr_code(self):
+        """Render the QR image of a row stored without one (see `manage.py render_qr_codes`)."""
+        if not self.qr_code and self.pk and self._render_qr_code():
+            Registration.objects.filter(pk=self.pk).update(qr_code=self.qr_code.name, updated_at=timezone.now())
+        return self.qr_code
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Stored check-in state, so save() can keep the Event counters in step
+        instance._loaded_used = instance.__dict__.get('used')
+        return instance
+
     def save(self, *args, **kwargs):
+        from .counters import bump_event_counters
+        from .live import has_listeners, publish_checkin
         # Only generate and save a QR code if one isn't already present.
         if not self.qr_code:
-            filename, file_obj = generate_qr_code(self.entry_code)
-            if filename and file_obj:
-                self.qr_code.save(filename, file_obj, save=False)
-        super().save(*args, **kwargs)
+            self._render_qr_code()
+        adding = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        previous_used = getattr(self, '_loaded_used', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                bump_event_counters(self.event_id, registered=1, checked_in=int(self.used), types={self.attendee_type: 1})
+            elif previous_used is not None and self.used != previous_used and (update_fields is None or 'used' in update_fields):
+                bump_event_counters(self.event_id, checked_in=1 if self.used else -1)
+                if self.used and has_listeners(self.event_id):
+                    publish_checkin(self.event_id, self.pk, self.get_attendee_name(), self.attendee_type, self.attended_at)
+        self._loaded_used = self.used
 
 
 class EmailLog(models.Model):
@@ -112,6 +167,7 @@ class DistributionGroup(models.Model):
     admins = models.ManyToManyField(User, related_name='managed_distribution_groups', blank=True)
     # Users allowed to create events within this group (in addition to admins)
     creators = models.ManyToManyField(User, related_name='group_creations_allowed', blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.name
@@ -231,11 +287,231 @@ class Transaction(models.Model):
     event = models.ForeignKey(Event, on_delete=models.SET_NULL, null=True, blank=True, related_name='transactions')
     created_at = models.DateTimeField(auto_now_add=True)
     balance_after = models.DecimalField(max_digits=10, decimal_places=2)
+    refund_of = models.OneToOneField('self', on_delete=models.PROTECT, null=True, blank=True, related_name='refund',
+                                     help_text='Pago que devuelve esta transacción; un pago solo puede devolverse una vez.')
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['wallet', 'created_at', 'id'], name='transaction_wallet_created'),
+            models.Index(fields=['event', 'created_at'], name='transaction_event_created'),
+            # Revenue rollup: the open days are re-read on every run
+            models.Index(fields=['created_at'], name='transaction_created'),
+        ]
     
     def __str__(self):
         return f"{self.wallet.user.username} - {self.transaction_type}: {self.amount}"
 
 
+class WalletSnapshot(models.Model):
+    """Saldo de una billetera hasta una transacción; el saldo actual es el último snapshot más las transacciones posteriores."""
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='snapshots')
+    last_transaction_id = models.BigIntegerField(help_text='Última transacción incluida en el saldo')
+    balance = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-last_transaction_id']
+        constraints = [
+            models.UniqueConstraint(fields=['wallet', 'last_transaction_id'], name='unique_wallet_snapshot'),
+        ]
+
+    def __str__(self):
+        return f"Snapshot {self.wallet_id} @{self.last_transaction_id}: {self.balance}"
+
+
+class DailyRevenue(models.Model):
+    """Totales diarios de Transaction por evento y tipo, mantenidos por `manage.py rollup_revenue`."""
+    day = models.DateField()
+    event = models.ForeignKey(Event, on_delete=models.SET_NULL, null=True, blank=True, related_name='daily_revenue',
+                              help_text='Vacío para movimientos sin evento (depósitos, retiros) o de eventos borrados.')
+    transaction_type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPES)
+    count = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text='Suma de `amount` (con signo).')
+
+    class Meta:
+        ordering = ['day']
+        constraints = [
+            # NULLs are distinct in a plain unique constraint: the event-less rows need their own
+            models.UniqueConstraint(fields=['day', 'event', 'transaction_type'], condition=models.Q(event__isnull=False),
+                                    name='unique_daily_revenue'),
+            models.UniqueConstraint(fields=['day', 'transaction_type'], condition=models.Q(event__isnull=True),
+                                    name='unique_daily_revenue_no_event'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.event_id or '-'} {self.transaction_type}: {self.total}"
+
+
+class RollupWatermark(models.Model):
+    """Posición de un rollup incremental (p.ej. 'daily_revenue')."""
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    open_from = models.DateField(null=True, blank=True, help_text='Primer día aún abierto: se recalcula en cada ejecución.')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_id}"
+
+
+
+
+class ExportJob(models.Model):
+    """Informe generado en segundo plano (p.ej. todos los eventos de un grupo).
+
+    `fingerprint` identifica la petición (grupo, eventos, formato) y
+    `data_version` el estado de los datos con el que se generó el fichero, de
+    modo que peticiones idénticas reutilizan el mismo job mientras los datos
+    no cambien.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('running', 'En proceso'),
+        ('done', 'Completado'),
+        ('failed', 'Fallido'),
+    ]
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel'),
+    ]
+
+    group = models.ForeignKey(DistributionGroup, on_delete=models.CASCADE, null=True, blank=True, related_name='export_jobs')
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='export_jobs')
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='xlsx')
+    params = models.JSONField(default=dict, blank=True)
+    fingerprint = models.CharField(max_length=64, db_index=True)
+    data_version = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    total_rows = models.IntegerField(default=0)
+    processed_rows = models.IntegerField(default=0)
+    file = models.FileField(upload_to='exports', blank=True)
+    error_text = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            # Only one pending/running job per identical request
+            models.UniqueConstraint(
+                fields=['fingerprint'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_export_job',
+            ),
+        ]
+
+    @property
+    def progress(self):
+        if self.status == 'done':
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(99, int(self.processed_rows * 100 / self.total_rows))
+
+    def __str__(self):
+        return f"Export {self.pk} ({self.status})"
+
+
+class RefundJob(models.Model):
+    """Devolución en segundo plano de todos los pagos de un evento cancelado.
+
+    Se procesa por bloques de billeteras; cada bloque es una transacción, así
+    que un job interrumpido se reanuda sin devolver dos veces el mismo pago
+    (`Transaction.refund_of` es único).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('running', 'En proceso'),
+        ('done', 'Completado'),
+        ('failed', 'Fallido'),
+    ]
+
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='refund_jobs')
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='refund_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    total_payments = models.IntegerField(default=0)
+    refunded_payments = models.IntegerField(default=0)
+    refunded_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    error_text = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['event'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_refund_job',
+            ),
+        ]
+
+    @property
+    def progress(self):
+        if self.status == 'done':
+            return 100
+        if not self.total_payments:
+            return 0
+        return min(99, int(self.refunded_payments * 100 / self.total_payments))
+
+    def __str__(self):
+        return f"Refund {self.pk} evento {self.event_id} ({self.status})"
+
+
+class OutboxEmail(models.Model):
+    """Email en cola; lo envía `manage.py send_queued_emails` fuera de la petición."""
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('sent', 'Enviado'),
+        ('failed', 'Fallido'),
+    ]
+
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=300)
+    body = models.TextField(blank=True)
+    dedupe_key = models.CharField(max_length=100, null=True, blank=True, unique=True,
+                                  help_text='Evita encolar dos veces el mismo aviso (p.ej. refund:<evento>:<billetera>).')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error_text = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'id'], name='outbox_status_id')]
+
+    def __str__(self):
+        return f"Email to {self.recipient} ({self.status})"
+
+
+class Tombstone(models.Model):
+    """Registro de un borrado para la sincronización incremental (/api/sync/).
+
+    `user` vacío significa que el borrado afecta a todos (evento o grupo
+    eliminado); con usuario, solo a él (su inscripción o su pertenencia a un
+    grupo). Se purgan pasados SYNC_TOMBSTONE_RETENTION_DAYS.
+    """
+    KIND_CHOICES = [
+        ('event', 'Evento'),
+        ('registration', 'Inscripción'),
+        ('group', 'Grupo'),
+        ('membership', 'Pertenencia a grupo'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['deleted_at']
+        indexes = [
+            models.Index(fields=['deleted_at'], name='tombstone_deleted'),
+            models.Index(fields=['user', 'deleted_at'], name='tombstone_user_deleted'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} borrado {self.deleted_at:%Y-%m-%d %H:%M}"
@@ -0,0 +1,50 @@
+"""Queued outgoing email.
+
+Code that would otherwise send mail inside a request (or inside a long job)
+inserts `OutboxEmail` rows instead, in the same transaction as the change
+they announce, and `manage.py send_queued_emails` delivers them.
+"""
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+
+MAX_ATTEMPTS = 5
+
+
+def queue_email(recipient, subject, body, dedupe_key=None):
+    """Queue one email. With `dedupe_key`, a second call with the same key is ignored."""
+    if dedupe_key is None:
+        return OutboxEmail.objects.create(recipient=recipient, subject=subject, body=body)
+    email, _ = OutboxEmail.objects.get_or_create(
+        dedupe_key=dedupe_key, defaults={'recipient': recipient, 'subject': subject, 'body': body},
+    )
+    return email
+
+
+def send_queued_emails(batch_size=100):
+    """Send up to `batch_size` pending emails. Returns (sent, failed)."""
+    sent = failed = 0
+    with transaction.atomic():
+        # skip_locked lets several senders share the queue
+        emails = list(OutboxEmail.objects.select_for_update(skip_locked=True)
+                      .filter(status='pending').order_by('id')[:batch_size])
+        for email in emails:
+            email.attempts += 1
+            try:
+                send_mail(email.subject, email.body, settings.DEFAULT_FROM_EMAIL, [email.recipient], fail_silently=False)
+            except Exception as e:
+                email.error_text = str(e)
+                if email.attempts >= MAX_ATTEMPTS:
+                    email.status = 'failed'
+                failed += 1
+            else:
+                email.status = 'sent'
+                email.sent_at = timezone.now()
+                email.error_text = ''
+                sent += 1
+            email.save(update_fields=['attempts', 'status', 'sent_at', 'error_text'])
+    return sent, failed
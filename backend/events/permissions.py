@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from .authz import get_authz
+
 
 class IsEventAdminOrReadOnly(permissions.BasePermission):
     """Allow only event admins or staff to edit/delete; read-only for others.
@@ -19,21 +21,18 @@ class IsEventAdminOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
 
-        # Determine event instance
-        event = None
+        # Determine event id
+        event_id = None
         if hasattr(obj, 'admins'):
             # obj is Event
-            event = obj
-        elif hasattr(obj, 'event'):
+            event_id = obj.pk
+        elif hasattr(obj, 'event_id'):
             # obj is Registration - users can delete their own registrations
-            try:
-                if hasattr(obj, 'user') and obj.user and obj.user == request.user:
-                    return True
-            except Exception:
-                pass
-            event = obj.event
+            if getattr(obj, 'user_id', None) is not None and obj.user_id == request.user.pk:
+                return True
+            event_id = obj.event_id
 
-        if not event:
+        if not event_id:
             return False
 
         # Staff users can do anything
@@ -41,10 +40,7 @@ class IsEventAdminOrReadOnly(permissions.BasePermission):
             return True
 
         # Check if user is in event.admins
-        try:
-            return event.admins.filter(pk=request.user.pk).exists()
-        except Exception:
-            return False
+        return get_authz(request).is_event_admin(event_id)
 
 
 class IsGroupOrEventAdmin(permissions.BasePermission):
@@ -70,13 +66,14 @@ class IsGroupOrEventAdmin(permissions.BasePermission):
         if user.is_staff:
             return True
 
+        authz = get_authz(request)
         # If obj is a DistributionGroup
         if hasattr(obj, 'admins') and hasattr(obj, 'members'):
-            return obj.admins.filter(pk=user.pk).exists()
+            return authz.is_group_admin(obj)
 
         # If obj has event attribute -> check event admins
-        if hasattr(obj, 'event') and obj.event is not None:
-            return obj.event.admins.filter(pk=user.pk).exists()
+        if getattr(obj, 'event_id', None) is not None:
+            return authz.is_event_admin(obj.event_id)
 
         return False
 
@@ -96,13 +93,10 @@ class IsGroupAdminOrCreatorOrEventAdmin(permissions.BasePermission):
         if user.is_staff:
             return True
 
+        authz = get_authz(request)
         # DistributionGroup object
         if hasattr(obj, 'admins') and hasattr(obj, 'members'):
-            if obj.admins.filter(pk=user.pk).exists():
-                return True
-            if obj.creators.filter(pk=user.pk).exists():
-                return True
-            return False
+            return authz.can_manage_group(obj)
 
         # Event object or object with event attribute
         event = None
@@ -113,11 +107,5 @@ class IsGroupAdminOrCreatorOrEventAdmin(permissions.BasePermission):
 
         if event is not None:
             # event admins or group's creators/admins
-            if event.admins.filter(pk=user.pk).exists():
-                return True
-            if event.group:
-                if event.group.admins.filter(pk=user.pk).exists():
-                    return True
-                if event.group.creators.filter(pk=user.pk).exists():
-                    return True
+            return authz.can_manage_event(event)
         return False
@@ -0,0 +1,144 @@
+"""Cancel an event and refund every payment made for it.
+
+`request_event_refund()` marks the event cancelled and queues a RefundJob;
+the `run_refund_jobs` worker processes it in chunks of wallets. Each chunk
+is one transaction that:
+
+- locks the chunk's wallets (the same lock `ledger.post_transaction` takes)
+  and reads their balances from the ledger (`ledger.wallet_balances`),
+- bulk-creates one `refund` Transaction per unrefunded payment, linked to it
+  through the unique `refund_of`, with `balance_after` following the ledger,
+- mirrors the resulting ledger balances into `Wallet.balance` with one
+  bulk update,
+- queues the notification emails in the outbox and bumps the job progress.
+
+A crash loses at most the chunk in flight, and re-running only sees the
+payments that still have no refund, so nothing is refunded twice.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .ledger import wallet_balances
+from .models import Event, OutboxEmail, RefundJob, Transaction, Wallet
+
+
+REFUND_CHUNK_SIZE = 200  # wallets per transaction
+
+
+def pending_payments(event_id):
+    """Payments for the event that have not been refunded yet."""
+    return Transaction.objects.filter(event_id=event_id, transaction_type='payment', refund__isnull=True)
+
+
+def request_event_refund(event, user=None):
+    """Cancel `event` and return `(job, created)`, reusing an active job."""
+    now = timezone.now()
+    Event.objects.filter(pk=event.pk, cancelled_at__isnull=True).update(cancelled_at=now, updated_at=now)
+    event.refresh_from_db(fields=['cancelled_at'])
+
+    active = RefundJob.objects.filter(event=event, status__in=['pending', 'running']).first()
+    if active:
+        return active, False
+    try:
+        with transaction.atomic():
+            job = RefundJob.objects.create(
+                event=event,
+                requested_by=user if user and user.is_authenticated else None,
+                total_payments=pending_payments(event.pk).count(),
+            )
+    except IntegrityError:
+        return RefundJob.objects.get(event=event, status__in=['pending', 'running']), False
+    return job, True
+
+
+def _refund_email(event, wallet, amount):
+    body = (f'El evento {event.name} ha sido cancelado.\n\n'
+            f'Hemos devuelto {amount} {wallet.currency} a tu billetera. Saldo actual: {wallet.balance} {wallet.currency}.')
+    return OutboxEmail(
+        recipient=wallet.user.email,
+        subject=f'Cancelación de {event.name}: reembolso',
+        body=body,
+        dedupe_key=f'refund:{event.pk}:{wallet.pk}',
+    )
+
+
+def refund_chunk(job, event, chunk_size=REFUND_CHUNK_SIZE):
+    """Refund the pending payments of the next `chunk_size` wallets. Returns the number of refunds."""
+    with transaction.atomic():
+        wallet_ids = list(pending_payments(event.pk).order_by('wallet_id')
+                          .values_list('wallet_id', flat=True).distinct()[:chunk_size])
+        if not wallet_ids:
+            return 0
+        wallets = {w.pk: w for w in Wallet.objects.select_for_update().filter(pk__in=wallet_ids)
+                   .select_related('user').order_by('pk')}
+        # Read again under the lock: another run may have refunded some meanwhile
+        payments = list(pending_payments(event.pk).filter(wallet_id__in=wallet_ids).order_by('wallet_id', 'id'))
+
+        # The ledger, not the Wallet.balance mirror, is the source of truth
+        balances = wallet_balances(wallet_ids)
+        credited = defaultdict(Decimal)
+        refunds = []
+        for payment in payments:
+            amount = -payment.amount
+            balances[payment.wallet_id] += amount
+            credited[payment.wallet_id] += amount
+            refunds.append(Transaction(
+                wallet_id=payment.wallet_id,
+                amount=amount,
+                transaction_type='refund',
+                description=f'Reembolso por cancelación de {event.name}',
+                event_id=event.pk,
+                balance_after=balances[payment.wallet_id],
+                refund_of=payment,
+            ))
+        Transaction.objects.bulk_create(refunds, batch_size=500)
+
+        now = timezone.now()
+        for wallet_id in credited:
+            wallets[wallet_id].balance = balances[wallet_id]
+            wallets[wallet_id].updated_at = now
+        Wallet.objects.bulk_update([wallets[pk] for pk in credited], ['balance', 'updated_at'])
+
+        OutboxEmail.objects.bulk_create(
+            [_refund_email(event, wallets[pk], amount) for pk, amount in credited.items() if wallets[pk].user.email],
+            ignore_conflicts=True,
+        )
+        RefundJob.objects.filter(pk=job.pk).update(
+            refunded_payments=F('refunded_payments') + len(refunds),
+            refunded_amount=F('refunded_amount') + sum(credited.values(), Decimal('0')),
+        )
+    return len(refunds)
+
+
+def run_refund_job(job, chunk_size=REFUND_CHUNK_SIZE, progress=None):
+    """Process `job` to the end. `progress(job)` is called after every chunk."""
+    event = job.event
+    while refund_chunk(job, event, chunk_size):
+        job.refresh_from_db(fields=['refunded_payments', 'refunded_amount'])
+        if progress:
+            progress(job)
+    job.status = 'done'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'finished_at'])
+    return job
+
+
+def run_pending_refund_jobs(resume=False, progress=None):
+    """Claim and run pending jobs; with `resume`, also jobs left 'running' by a dead worker."""
+    statuses = ['pending', 'running'] if resume else ['pending']
+    processed = 0
+    for job in RefundJob.objects.filter(status__in=statuses).order_by('created_at'):
+        claimed = RefundJob.objects.filter(pk=job.pk, status=job.status).update(status='running', started_at=timezone.now())
+        if not claimed:
+            continue
+        job.refresh_from_db()
+        try:
+            run_refund_job(job, progress=progress)
+        except Exception as e:
+            RefundJob.objects.filter(pk=job.pk).update(status='failed', error_text=str(e), finished_at=timezone.now())
+        processed += 1
+    return processed
@@ -0,0 +1,185 @@
+"""Group-wide reports built by the export worker (`run_export_jobs`).
+
+A report covers every event of a DistributionGroup (or a subset of them) and
+joins attendance with the payments recorded in `Transaction`.
+"""
+import hashlib
+import json
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+from .exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, ATTENDEE_TYPE_LABELS
+from .models import Event, ExportJob, Registration, Transaction
+
+
+GROUP_REPORT_HEADER = [
+    'Evento', 'Fecha del evento', 'ID', 'Usuario (Cuenta)', 'Email', 'Asistente (Nombre)',
+    'Tipo', 'Usado', 'Fecha de entrada', 'Pagado (usuario/evento)', 'Reembolsado (usuario/evento)',
+]
+
+
+def group_report_events(group, event_ids=None):
+    """Events linked to `group`, either through `Event.group` or `DistributionGroup.events`."""
+    events = Event.objects.filter(Q(group=group) | Q(distribution_groups=group)).distinct()
+    if event_ids:
+        events = events.filter(pk__in=event_ids)
+    return events.order_by('date', 'id')
+
+
+def report_fingerprint(group_id, event_ids, file_format):
+    payload = json.dumps({
+        'kind': 'group_report',
+        'group': group_id,
+        'events': sorted(event_ids or []),
+        'format': file_format,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def report_data_version(event_ids):
+    """Cheap signature of everything the report reads.
+
+    Built from a handful of aggregates, so it changes whenever registrations
+    (added, deleted or edited), check-ins, the attendees' accounts, payments or
+    the events themselves change.
+    """
+    regs = Registration.objects.filter(event_id__in=event_ids).aggregate(
+        total=Count('id'), last=Max('id'), used=Count('id', filter=Q(used=True)), last_entry=Max('attended_at'),
+        last_update=Max('updated_at'), last_user_update=Max('user__updated_at'),
+    )
+    txs = Transaction.objects.filter(event_id__in=event_ids).aggregate(total=Count('id'), last=Max('id'))
+    events = list(Event.objects.filter(pk__in=event_ids).order_by('id').values_list('id', 'name', 'date', 'location'))
+    payload = json.dumps([regs, txs, events], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def requeue_stale_export_jobs(fingerprint=None):
+    """Put jobs left 'running' by a dead worker back to 'pending'. Returns how many.
+
+    A job counts as abandoned once it has been running for longer than
+    `EXPORT_JOB_TIMEOUT_SECONDS`.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.EXPORT_JOB_TIMEOUT_SECONDS)
+    stale = ExportJob.objects.filter(status='running', started_at__lt=cutoff)
+    if fingerprint is not None:
+        stale = stale.filter(fingerprint=fingerprint)
+    return stale.update(status='pending', started_at=None, processed_rows=0)
+
+
+def request_group_report(group, user, event_ids=None, file_format='xlsx'):
+    """Return an ExportJob for the report, reusing an active or still valid one.
+
+    Returns `(job, created)`.
+    """
+    event_ids = sorted(int(pk) for pk in (event_ids or []))
+    fingerprint = report_fingerprint(group.pk, event_ids, file_format)
+
+    # An abandoned job would otherwise be handed out forever: queue it again
+    requeue_stale_export_jobs(fingerprint)
+    active = ExportJob.objects.filter(fingerprint=fingerprint, status__in=['pending', 'running']).first()
+    if active:
+        return active, False
+
+    version = report_data_version(list(group_report_events(group, event_ids).values_list('id', flat=True)))
+    cached = ExportJob.objects.filter(fingerprint=fingerprint, status='done', data_version=version).exclude(file='').first()
+    if cached:
+        return cached, False
+
+    try:
+        with transaction.atomic():
+            job = ExportJob.objects.create(
+                group=group,
+                requested_by=user if user and user.is_authenticated else None,
+                file_format=file_format,
+                params={'event_ids': event_ids},
+                fingerprint=fingerprint,
+            )
+    except IntegrityError:
+        # Another request created the same job concurrently
+        return ExportJob.objects.get(fingerprint=fingerprint, status__in=['pending', 'running']), False
+    return job, True
+
+
+def _group_report_rows(job, events):
+    processed = 0
+    for event in events:
+        # One aggregate per event for payments/refunds, keyed by user
+        money = {}
+        for row in (Transaction.objects.filter(event=event, transaction_type__in=['payment', 'refund'])
+                    .values('wallet__user_id', 'transaction_type').annotate(total=Sum('amount'))):
+            paid, refunded = money.get(row['wallet__user_id'], (0, 0))
+            if row['transaction_type'] == 'payment':
+                paid -= row['total']
+            else:
+                refunded += row['total']
+            money[row['wallet__user_id']] = (paid, refunded)
+
+        registrations = (Registration.objects.filter(event=event).select_related('user')
+                         .only('id', 'used', 'attended_at', 'attendee_type', 'attendee_first_name', 'attendee_last_name',
+                               'user__username', 'user__first_name', 'user__last_name', 'user__email')
+                         .order_by('id'))
+        for reg in registrations.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            paid, refunded = money.get(reg.user_id, (0, 0))
+            yield [
+                event.name,
+                event.date.isoformat() if event.date else '',
+                reg.id,
+                reg.user.get_full_name() or reg.user.username,
+                reg.user.email,
+                reg.get_attendee_name(),
+                ATTENDEE_TYPE_LABELS.get(reg.attendee_type, reg.attendee_type),
+                'Sí' if reg.used else 'No',
+                reg.attended_at.isoformat() if reg.attended_at else '',
+                str(paid),
+                str(refunded),
+            ]
+            processed += 1
+            if processed % EXPORT_CHUNK_SIZE == 0:
+                ExportJob.objects.filter(pk=job.pk).update(processed_rows=processed)
+    ExportJob.objects.filter(pk=job.pk).update(processed_rows=processed)
+
+
+def build_export_job(job):
+    """Generate the file for `job` and store it in the default storage."""
+    events = list(group_report_events(job.group, job.params.get('event_ids')))
+    event_ids = [event.pk for event in events]
+    job.data_version = report_data_version(event_ids)
+    job.total_rows = Registration.objects.filter(event_id__in=event_ids).count()
+    job.save(update_fields=['data_version', 'total_rows'])
+
+    writer, _ = EXPORT_FORMATS[job.file_format]
+    with tempfile.TemporaryFile() as tmp:
+        for chunk in writer(GROUP_REPORT_HEADER, _group_report_rows(job, events)):
+            tmp.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        tmp.seek(0)
+        job.file.save(f'informe_grupo_{job.group_id}_{job.pk}.{job.file_format}', File(tmp), save=False)
+
+    job.status = 'done'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['file', 'status', 'finished_at'])
+    return job
+
+
+def run_pending_export_jobs(limit=None):
+    """Claim and build pending jobs one by one, after re-queueing abandoned ones. Returns the number processed."""
+    requeue_stale_export_jobs()
+    processed = 0
+    for job in ExportJob.objects.filter(status='pending').order_by('created_at'):
+        if limit is not None and processed >= limit:
+            break
+        claimed = ExportJob.objects.filter(pk=job.pk, status='pending').update(status='running', started_at=timezone.now())
+        if not claimed:
+            continue
+        job.refresh_from_db()
+        try:
+            build_export_job(job)
+        except Exception as e:
+            ExportJob.objects.filter(pk=job.pk).update(status='failed', error_text=str(e), finished_at=timezone.now())
+        processed += 1
+    return processed
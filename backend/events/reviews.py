@@ -0,0 +1,120 @@
+"""Bulk review of event and group access requests.
+
+The selected pending requests are locked, their status is changed with one
+UPDATE per outcome, registrations (or memberships) are inserted in bulk and
+the notification emails are queued in the outbox, all in one transaction.
+Event approvals lock the event row and stop at the free places left, so two
+concurrent bulk approvals cannot overbook it; the requests that did not fit
+stay pending.
+"""
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .bulk import bulk_add_m2m, bulk_create_registrations
+from .hotcache import bump_codes_version
+from .models import AccessRequest, Event, GroupAccessRequest, OutboxEmail, Registration
+
+
+def select_requests(queryset, data):
+    """Narrow `queryset` with the request body: `request_ids` or `all_pending` (+ `requested_before`).
+
+    Returns the queryset, or an error message.
+    """
+    ids = data.get('request_ids')
+    if ids:
+        try:
+            return queryset.filter(id__in=[int(pk) for pk in ids])
+        except (TypeError, ValueError):
+            return 'request_ids debe ser una lista de IDs'
+    if str(data.get('all_pending', '')).lower() in ('1', 'true', 'yes'):
+        before = data.get('requested_before')
+        if before:
+            parsed = parse_datetime(str(before))
+            if parsed is None:
+                return 'requested_before debe ser una fecha ISO 8601'
+            queryset = queryset.filter(requested_at__lt=parsed)
+        return queryset
+    return 'Indica request_ids o all_pending'
+
+
+def free_places(event):
+    """Registrations still allowed by `max_qr_codes` and `capacity`, or None when unlimited."""
+    limits = [limit for limit in (event.max_qr_codes, event.capacity) if limit]
+    if not limits:
+        return None
+    return max(0, min(limits) - event.registered_count)
+
+
+def _event_email(event, user, approved, admin_notes):
+    if approved:
+        subject = f'Solicitud aprobada: {event.name}'
+        body = (f'Hola {user.username},\n\nTu solicitud para asistir al evento "{event.name}" ha sido aprobada.\n\n'
+                f'Puedes ver tu código QR de entrada en la sección "Mis Inscripciones".\n\n¡Nos vemos en el evento!\n\nSaludos,\nEventoApp')
+    else:
+        subject = f'Solicitud rechazada: {event.name}'
+        notes = f'Notas del administrador: {admin_notes}\n\n' if admin_notes else ''
+        body = (f'Hola {user.username},\n\nLamentamos informarte que tu solicitud para asistir al evento "{event.name}" ha sido rechazada.\n\n'
+                f'{notes}Si tienes alguna pregunta, por favor contacta con los organizadores del evento.\n\nSaludos,\nEventoApp')
+    return OutboxEmail(recipient=user.email, subject=subject, body=body)
+
+
+def _group_email(group, user, approved, admin_notes):
+    if approved:
+        subject = f'Solicitud aprobada: {group.name}'
+        body = f'Tu solicitud para unirte al grupo "{group.name}" ha sido aprobada.\n\nYa puedes acceder a los eventos del grupo.'
+    else:
+        subject = f'Solicitud rechazada: {group.name}'
+        body = f'Tu solicitud para unirte al grupo "{group.name}" ha sido rechazada.'
+        if admin_notes:
+            body += f'\n\nMotivo: {admin_notes}'
+    return OutboxEmail(recipient=user.email, subject=subject, body=body)
+
+
+def _mark(model, ids, status, reviewer, admin_notes, now):
+    if ids:
+        model.objects.filter(id__in=ids).update(status=status, reviewed_at=now, reviewed_by=reviewer, admin_notes=admin_notes)
+
+
+def review_event_requests(event, queryset, approve, reviewer, admin_notes=''):
+    """Approve or reject the pending requests in `queryset`. Returns a report dict."""
+    now = timezone.now()
+    with transaction.atomic():
+        event = Event.objects.select_for_update().get(pk=event.pk)
+        pending = list(queryset.filter(event=event, status='pending').select_for_update(of=('self',))
+                       .select_related('user').order_by('requested_at', 'id'))
+        waiting = []
+        if approve:
+            places = free_places(event)
+            if places is not None and len(pending) > places:
+                pending, waiting = pending[:places], pending[places:]
+        ids = [req.id for req in pending]
+        _mark(AccessRequest, ids, 'approved' if approve else 'rejected', reviewer, admin_notes, now)
+        if approve and pending:
+            bulk_create_registrations([Registration(user_id=req.user_id, event_id=event.pk) for req in pending])
+        OutboxEmail.objects.bulk_create(
+            [_event_email(event, req.user, approve, admin_notes) for req in pending if req.user.email])
+    if approve and pending:
+        bump_codes_version([event.pk])
+    if not approve:
+        return {'rejected': ids}
+    return {
+        'approved': ids,
+        'left_pending': [req.id for req in waiting],
+        'free_places': free_places(Event.objects.get(pk=event.pk)),
+    }
+
+
+def review_group_requests(group, queryset, approve, reviewer, admin_notes=''):
+    """Approve (add as members) or reject the pending group requests in `queryset`."""
+    now = timezone.now()
+    with transaction.atomic():
+        pending = list(queryset.filter(group=group, status='pending').select_for_update(of=('self',))
+                       .select_related('user').order_by('requested_at', 'id'))
+        ids = [req.id for req in pending]
+        _mark(GroupAccessRequest, ids, 'approved' if approve else 'rejected', reviewer, admin_notes, now)
+        if approve:
+            bulk_add_m2m(group, 'members', {req.user_id for req in pending})
+        OutboxEmail.objects.bulk_create(
+            [_group_email(group, req.user, approve, admin_notes) for req in pending if req.user.email])
+    return {'approved' if approve else 'rejected': ids}
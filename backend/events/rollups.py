@@ -0,0 +1,129 @@
+"""Incremental daily revenue rollup from Transaction.
+
+`rollup_daily_revenue()` recomputes, on every run, the DailyRevenue rows of
+the days that are still open: it aggregates their transactions by (day,
+event, type) and upserts the totals, so a transaction that commits late
+(after rows with higher ids) is still counted by the next run. A day is
+closed, and never read again, once `ROLLUP_SAFETY_LAG_SECONDS` have passed
+since it ended; the 'daily_revenue' watermark keeps the first open day.
+
+Reports (`revenue_report`) read only the rollup table. Rows without an event
+hold deposits, withdrawals and the totals of deleted events.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyRevenue, RollupWatermark, Transaction
+
+
+WATERMARK = 'daily_revenue'
+# Money earned by the event: payments are stored negative, refunds positive
+REVENUE_TYPES = ('payment', 'refund')
+
+
+def _day_start(day):
+    """Midnight of `day` in the current time zone (the one TruncDate groups by)."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _recompute_days(first, last):
+    """Make the DailyRevenue rows of `first`..`last` match their transactions. Returns how many were counted."""
+    rows = (Transaction.objects.filter(created_at__gte=_day_start(first), created_at__lt=_day_start(last + timedelta(days=1)))
+            .annotate(day=TruncDate('created_at'))
+            .order_by().values('day', 'event_id', 'transaction_type')
+            .annotate(n=Count('id'), amount=Sum('amount')))
+    stored = {(row.day, row.event_id, row.transaction_type): row
+              for row in DailyRevenue.objects.filter(day__gte=first, day__lte=last)}
+    to_create, to_update, counted = [], [], 0
+    for row in rows:
+        current = stored.pop((row['day'], row['event_id'], row['transaction_type']), None)
+        if current is None:
+            to_create.append(DailyRevenue(day=row['day'], event_id=row['event_id'], transaction_type=row['transaction_type'],
+                                          count=row['n'], total=row['amount']))
+        elif (current.count, current.total) != (row['n'], row['amount']):
+            current.count, current.total = row['n'], row['amount']
+            to_update.append(current)
+        counted += row['n']
+    # Left over: their transactions are gone (e.g. a deleted wallet)
+    DailyRevenue.objects.filter(pk__in=[row.pk for row in stored.values()]).delete()
+    DailyRevenue.objects.bulk_update(to_update, ['count', 'total'])
+    DailyRevenue.objects.bulk_create(to_create)
+    return counted
+
+
+def rollup_daily_revenue(days_per_batch=31):
+    """Recompute DailyRevenue for the open days. Returns the number of transactions counted.
+
+    The first run (no watermark yet) starts at the oldest transaction and
+    works through the history `days_per_batch` days per database transaction.
+    """
+    lag = timedelta(seconds=getattr(settings, 'ROLLUP_SAFETY_LAG_SECONDS', 60))
+    counted = 0
+    while True:
+        with transaction.atomic():
+            watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK)
+            today = timezone.localdate()
+            first = watermark.open_from
+            if first is None:
+                oldest = Transaction.objects.aggregate(m=Min('created_at'))['m']
+                first = timezone.localdate(oldest) if oldest else today
+            last = min(today, first + timedelta(days=days_per_batch - 1))
+            counted += _recompute_days(first, last)
+            # Days that ended more than `lag` ago are final
+            watermark.open_from = min(last + timedelta(days=1), timezone.localdate(timezone.now() - lag))
+            watermark.save(update_fields=['open_from', 'updated_at'])
+        if last >= today:
+            return counted
+
+
+def fold_event_revenue(event_id):
+    """Move an event's DailyRevenue rows into the event-less rows before the event is deleted.
+
+    Called from Event pre_delete: SET_NULL alone would leave a second row for
+    a (day, type) that already has an event-less one.
+    """
+    with transaction.atomic():
+        for row in DailyRevenue.objects.filter(event_id=event_id).values('day', 'transaction_type', 'count', 'total'):
+            key = {'day': row['day'], 'event_id': None, 'transaction_type': row['transaction_type']}
+            updated = DailyRevenue.objects.filter(**key).update(count=F('count') + row['count'], total=F('total') + row['total'])
+            if not updated:
+                DailyRevenue.objects.create(count=row['count'], total=row['total'], **key)
+        DailyRevenue.objects.filter(event_id=event_id).delete()
+
+
+def revenue_report(event_ids=None, date_from=None, date_to=None):
+    """Daily rows and totals from DailyRevenue for the given events (all when None)."""
+    qs = DailyRevenue.objects.all()
+    if event_ids is not None:
+        qs = qs.filter(event_id__in=event_ids)
+    if date_from:
+        qs = qs.filter(day__gte=date_from)
+    if date_to:
+        qs = qs.filter(day__lte=date_to)
+
+    revenue = -Sum('total', filter=Q(transaction_type__in=REVENUE_TYPES))
+    days = (qs.order_by().values('day', 'event_id')
+            .annotate(
+                payments=Sum('count', filter=Q(transaction_type='payment')),
+                refunds=Sum('count', filter=Q(transaction_type='refund')),
+                revenue=revenue,
+            ).order_by('day', 'event_id'))
+    by_type = qs.order_by().values('transaction_type').annotate(count=Sum('count'), total=Sum('total')).order_by('transaction_type')
+    totals = qs.aggregate(revenue=revenue)
+
+    watermark = RollupWatermark.objects.filter(name=WATERMARK).first()
+    return {
+        'days': [
+            {**row, 'payments': row['payments'] or 0, 'refunds': row['refunds'] or 0, 'revenue': row['revenue'] or Decimal('0')}
+            for row in days
+        ],
+        'by_type': list(by_type),
+        'revenue': totals['revenue'] or Decimal('0'),
+        'up_to': watermark.updated_at if watermark else None,
+    }
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from .models import Event, Registration, DistributionGroup, AccessRequest, GroupAccessRequest, Wallet, Transaction
 from users.models import User
 from rest_framework import exceptions
+from .fieldsets import SparseFieldsSerializerMixin
 
 class UserSerializer(serializers.ModelSerializer):
     avatar_url = serializers.SerializerMethodField()
@@ -25,26 +26,34 @@ class ForSelectUserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username']
 
-class EventSerializer(serializers.ModelSerializer):
+class EventSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     admins = UserSerializer(many=True, read_only=True)
     group = serializers.PrimaryKeyRelatedField(queryset=DistributionGroup.objects.all(), allow_null=True, required=False)
     group_name = serializers.CharField(source='group.name', read_only=True, allow_null=True)
 
+    expandable_fields = {'admins': lambda: serializers.PrimaryKeyRelatedField(many=True, read_only=True)}
+    values_fields = {'group': 'group_id', 'group_name': 'group__name'}
+
     class Meta:
         model = Event
-        fields = ['id','name','description','date','location','capacity','max_qr_codes','admins','group','group_name','requires_approval','is_public','price']
+        fields = ['id','name','description','date','location','capacity','max_qr_codes','admins','group','group_name','requires_approval','is_public','price','is_live',
+                  'registered_count','checked_in_count','member_count','guest_count','child_count','cancelled_at']
 
-class RegistrationSerializer(serializers.ModelSerializer):
+class RegistrationSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     qr_url = serializers.SerializerMethodField(read_only=True)
 
+    expandable_fields = {'user': lambda: serializers.PrimaryKeyRelatedField(read_only=True)}
+    values_fields = {'user': 'user_id', 'event': 'event_id'}
+
     class Meta:
         model = Registration
-        fields = ['id','user','event','entry_code','qr_code','qr_url','used', 'attendee_first_name', 'attendee_last_name', 'attendee_type']
-        read_only_fields = ['entry_code','qr_code','qr_url']
+        fields = ['id','user','event','entry_code','short_code','qr_code','qr_url','used', 'attendee_first_name', 'attendee_last_name', 'attendee_type']
+        read_only_fields = ['entry_code','short_code','qr_code','qr_url']
 
     def get_qr_url(self, obj):
         request = self.context.get('request')
+        # Never rendered here: a GET must not write (and move updated_at under its own ETag)
         if obj.qr_code and hasattr(obj.qr_code, 'url'):
             return request.build_absolute_uri(obj.qr_code.url) if request else obj.qr_code.url
         return None
@@ -61,10 +70,32 @@ class RegistrationSerializer(serializers.ModelSerializer):
         return registration
 
 
+class MyTicketSerializer(serializers.ModelSerializer):
+    """Compact ticket for `GET /api/registrations/mine/`: the QR plus the event data the app shows."""
+    qr_url = serializers.SerializerMethodField()
+    event_name = serializers.CharField(source='event.name', read_only=True)
+    event_date = serializers.DateTimeField(source='event.date', read_only=True)
+    event_location = serializers.CharField(source='event.location', read_only=True)
+    event_cancelled_at = serializers.DateTimeField(source='event.cancelled_at', read_only=True)
+
+    class Meta:
+        model = Registration
+        fields = ['id', 'event', 'event_name', 'event_date', 'event_location', 'event_cancelled_at', 'entry_code',
+                  'short_code', 'qr_url', 'used', 'attended_at', 'attendee_first_name', 'attendee_last_name',
+                  'attendee_type', 'alias']
+        read_only_fields = fields
+
+    def get_qr_url(self, obj):
+        request = self.context.get('request')
+        if obj.qr_code:
+            return request.build_absolute_uri(obj.qr_code.url) if request else obj.qr_code.url
+        return None
+
+
 from .models import DistributionGroup, Event
 
 
-class DistributionGroupSerializer(serializers.ModelSerializer):
+class DistributionGroupSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     member_count = serializers.SerializerMethodField()
     is_member = serializers.SerializerMethodField()
     
@@ -78,16 +109,16 @@ class DistributionGroupSerializer(serializers.ModelSerializer):
     def get_is_member(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.members.filter(id=request.user.id).exists()
+            from .authz import get_authz
+            return get_authz(request).is_group_member(obj)
         return False
     
     def to_representation(self, instance):
         # For GET: return lists of IDs
         ret = super().to_representation(instance)
-        ret['members'] = list(instance.members.values_list('id', flat=True))
-        ret['admins'] = list(instance.admins.values_list('id', flat=True))
-        ret['creators'] = list(instance.creators.values_list('id', flat=True))
-        ret['events'] = list(instance.events.values_list('id', flat=True))
+        for name in ('members', 'admins', 'creators', 'events'):
+            if name in self.fields:
+                ret[name] = list(getattr(instance, name).values_list('id', flat=True))
         return ret
 
     def create(self, validated_data):
@@ -205,3 +236,37 @@ class TransactionSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'balance_after']
 
 
+
+
+from .models import ExportJob
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    progress = serializers.IntegerField(read_only=True)
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = ['id', 'group', 'file_format', 'params', 'status', 'progress', 'total_rows', 'processed_rows',
+                  'download_url', 'error_text', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status != 'done' or not obj.file:
+            return None
+        url = f'/api/export-jobs/{obj.pk}/download/'
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+from .models import RefundJob
+
+
+class RefundJobSerializer(serializers.ModelSerializer):
+    progress = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = RefundJob
+        fields = ['id', 'event', 'status', 'progress', 'total_payments', 'refunded_payments', 'refunded_amount',
+                  'error_text', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
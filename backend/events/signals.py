@@ -0,0 +1,182 @@
+"""Signal receivers for the events app."""
+from collections import Counter, defaultdict
+
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.utils import timezone
+
+from .authz import invalidate_authz
+from .counters import bump_event_counters
+from .hotcache import bump_codes_version
+from .listcache import bump_list_version
+from .models import Event, DistributionGroup, Registration, Tombstone, User
+from .rollups import fold_event_revenue
+
+
+AUTHZ_RELATIONS = (
+    Event.admins.through,
+    DistributionGroup.admins.through,
+    DistributionGroup.creators.through,
+    DistributionGroup.members.through,
+)
+
+
+def _invalidate_role_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    """Drop the cached role sets of every user touched by an admin/creator/member change."""
+    if reverse:
+        # instance is the user (e.g. user.managed_events.add(...))
+        invalidate_authz([instance.pk])
+        return
+    if action == 'pre_clear':
+        # pk_set is not provided for clear(); remember who is about to be removed
+        source = sender._meta.get_field(type(instance)._meta.model_name).attname
+        instance._authz_cleared_ids = list(sender.objects.filter(**{source: instance.pk}).values_list('user_id', flat=True))
+    elif action == 'post_clear':
+        invalidate_authz(getattr(instance, '_authz_cleared_ids', []))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        invalidate_authz(pk_set)
+
+
+for _through in AUTHZ_RELATIONS:
+    m2m_changed.connect(_invalidate_role_cache, sender=_through, dispatch_uid=f'authz_{_through._meta.label}')
+
+
+# Registrations that go with a deleted event or user (CASCADE) are handled
+# set-wise in the event/user pre_delete receivers, so the per-row receivers
+# below skip them instead of costing a few queries per registration. The
+# delete's `origin` tells them apart; unlike a flag set in pre_delete and
+# cleared in post_delete, it cannot outlive a delete that fails half-way.
+def _cascaded(origin):
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return origin is not None and model is not Registration
+
+
+def _event_deleting(sender, instance, **kwargs):
+    """The event's registrations need no counters or code reload; tombstone them in one INSERT."""
+    Tombstone.objects.bulk_create([
+        Tombstone(kind='registration', object_id=pk, user_id=user_id)
+        for pk, user_id in Registration.objects.filter(event_id=instance.pk).values_list('pk', 'user_id')
+    ], batch_size=1000)
+
+
+def _user_deleting(sender, instance, **kwargs):
+    """Adjust the counters of the user's events once per event (no tombstones: the user is gone)."""
+    deltas = defaultdict(Counter)
+    for event_id, used, attendee_type in Registration.objects.filter(user_id=instance.pk).values_list('event_id', 'used', 'attendee_type'):
+        deltas[event_id]['registered'] -= 1
+        deltas[event_id]['checked_in'] -= int(used)
+        deltas[event_id][attendee_type] -= 1
+    for event_id, delta in deltas.items():
+        bump_event_counters(event_id, registered=delta.pop('registered'), checked_in=delta.pop('checked_in'), types=delta)
+    bump_codes_version(deltas)
+
+
+def _event_revenue_folding(sender, instance, **kwargs):
+    """Its DailyRevenue rows join the event-less ones instead of becoming duplicates (see events.rollups)."""
+    fold_event_revenue(instance.pk)
+
+
+def _registration_codes_changed(sender, instance, created=False, **kwargs):
+    """New, deleted or re-enabled entry codes invalidate the live-event code cache."""
+    if kwargs.get('signal') is post_delete and _cascaded(kwargs.get('origin')):
+        return
+    if created or not instance.used or kwargs.get('signal') is post_delete:
+        bump_codes_version([instance.event_id])
+
+
+def _registration_deleted(sender, instance, **kwargs):
+    if _cascaded(kwargs.get('origin')):
+        return
+    bump_event_counters(instance.event_id, registered=-1, checked_in=-int(instance.used), types={instance.attendee_type: -1})
+
+
+pre_delete.connect(_event_deleting, sender=Event, dispatch_uid='registrations_cascade_event')
+pre_delete.connect(_event_revenue_folding, sender=Event, dispatch_uid='daily_revenue_fold_event')
+pre_delete.connect(_user_deleting, sender=User, dispatch_uid='registrations_cascade_user')
+post_delete.connect(_registration_deleted, sender=Registration, dispatch_uid='event_counters_delete')
+post_save.connect(_registration_codes_changed, sender=Registration, dispatch_uid='hot_codes_save')
+post_delete.connect(_registration_codes_changed, sender=Registration, dispatch_uid='hot_codes_delete')
+
+
+def _event_list_changed(sender, **kwargs):
+    """Anything shown in the public event list changed: orphan the cached pages."""
+    if kwargs.get('signal') is m2m_changed and not kwargs['action'].startswith('post_'):
+        return
+    bump_list_version()
+
+
+post_save.connect(_event_list_changed, sender=Event, dispatch_uid='event_list_save')
+post_delete.connect(_event_list_changed, sender=Event, dispatch_uid='event_list_delete')
+m2m_changed.connect(_event_list_changed, sender=Event.admins.through, dispatch_uid='event_list_admins')
+# group_name is part of each list item
+post_save.connect(_event_list_changed, sender=DistributionGroup, dispatch_uid='event_list_group_save')
+
+
+def _touch_updated_at(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """M2M changes show up in the event/group payloads: move `updated_at` so their ETags change."""
+    if reverse and action == 'pre_clear':
+        # e.g. user.distribution_groups.clear(): pk_set is not provided, remember the rows touched
+        own = sender._meta.get_field(type(instance)._meta.model_name).attname
+        other = sender._meta.get_field(model._meta.model_name).attname
+        instance._touch_cleared_ids = list(sender.objects.filter(**{own: instance.pk}).values_list(other, flat=True))
+        return
+    if not action.startswith('post_'):
+        return
+    now = timezone.now()
+    if not reverse:
+        type(instance).objects.filter(pk=instance.pk).update(updated_at=now)
+    else:
+        pks = pk_set if action != 'post_clear' else getattr(instance, '_touch_cleared_ids', None)
+        if pks:
+            model.objects.filter(pk__in=pks).update(updated_at=now)
+
+
+for _through in AUTHZ_RELATIONS + (DistributionGroup.events.through,):
+    m2m_changed.connect(_touch_updated_at, sender=_through, dispatch_uid=f'updated_at_{_through._meta.label}')
+
+
+# Tombstones for the delta sync (events.sync)
+
+def _event_deleted(sender, instance, **kwargs):
+    Tombstone.objects.create(kind='event', object_id=instance.pk)
+
+
+def _registration_tombstone(sender, instance, **kwargs):
+    if _cascaded(kwargs.get('origin')):
+        return
+    Tombstone.objects.create(kind='registration', object_id=instance.pk, user_id=instance.user_id)
+
+
+def _group_deleting(sender, instance, **kwargs):
+    # Its events lose the group (SET_NULL, no save()): make them show up in the next sync
+    Event.objects.filter(group=instance).update(updated_at=timezone.now())
+
+
+def _group_deleted(sender, instance, **kwargs):
+    Tombstone.objects.create(kind='group', object_id=instance.pk)
+
+
+def _membership_removed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        column = 'user_id' if not reverse else 'distributiongroup_id'
+        own = 'distributiongroup_id' if not reverse else 'user_id'
+        instance._sync_cleared_ids = list(sender.objects.filter(**{own: instance.pk}).values_list(column, flat=True))
+        return
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_sync_cleared_ids', [])
+    elif action != 'post_remove':
+        return
+    if not pk_set:
+        return
+    if reverse:
+        rows = [Tombstone(kind='membership', object_id=group_id, user_id=instance.pk) for group_id in pk_set]
+    else:
+        rows = [Tombstone(kind='membership', object_id=instance.pk, user_id=user_id) for user_id in pk_set]
+    Tombstone.objects.bulk_create(rows)
+
+
+post_delete.connect(_event_deleted, sender=Event, dispatch_uid='sync_event_delete')
+post_delete.connect(_registration_tombstone, sender=Registration, dispatch_uid='sync_registration_delete')
+pre_delete.connect(_group_deleting, sender=DistributionGroup, dispatch_uid='sync_group_deleting')
+post_delete.connect(_group_deleted, sender=DistributionGroup, dispatch_uid='sync_group_delete')
+m2m_changed.connect(_membership_removed, sender=DistributionGroup.members.through, dispatch_uid='sync_membership_remove')
@@ -0,0 +1,118 @@
+"""Delta sync for the mobile app (`GET /api/sync/?since=<watermark>`).
+
+Changes are read from the indexed `updated_at` columns (events, the user's
+registrations, groups) and from the wallet's transactions by `created_at`;
+deletes come from the Tombstone table, which the receivers in
+events.signals fill. Each query touches only the rows changed since the
+watermark, so a sync costs what changed, not the user's history.
+
+The returned watermark lags `SYNC_SAFETY_SECONDS` behind the server clock:
+a row saved just before the sync but committed after it is sent again next
+time instead of being missed. Clients upsert by id, so repeats are harmless.
+A watermark older than the tombstone retention gets a full snapshot.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .authz import get_authz
+from .models import DistributionGroup, Event, Registration, Tombstone, Transaction, Wallet
+
+
+GROUP_FIELDS = ('id', 'name', 'description', 'logo', 'is_public', 'updated_at')
+
+
+def parse_watermark(value):
+    """The client's watermark as an aware datetime, None for a full sync, or False if invalid."""
+    if not value:
+        return None
+    parsed = parse_datetime(value.replace(' ', '+'))  # a bare '+' in a query string arrives as a space
+    if parsed is None:
+        return False
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def retention_cutoff():
+    return timezone.now() - timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+
+
+def _visible(authz):
+    if authz.is_staff:
+        return Q()
+    return Q(is_public=True) | Q(pk__in=authz.managed_events) | Q(group_id__in=authz.member_groups)
+
+
+def _group_row(row, request):
+    if row['logo']:
+        row['logo'] = request.build_absolute_uri(default_storage.url(row['logo']))
+    return row
+
+
+def sync_changes(request, since):
+    """Build the sync payload for `request.user`. `since=None` returns everything."""
+    from .serializers import EventSerializer, RegistrationSerializer, TransactionSerializer
+
+    user = request.user
+    started = timezone.now()
+    full = since is None or since < retention_cutoff()
+    if full:
+        since = None
+    authz = get_authz(request)
+    member_groups = set(authz.member_groups)
+
+    events = Event.objects.select_related('group').prefetch_related('admins')
+    registrations = Registration.objects.filter(user=user).select_related('user', 'event')
+    groups = DistributionGroup.objects.filter(pk__in=member_groups)
+    wallet = Wallet.objects.filter(user=user).first()
+    transactions = wallet.transactions.select_related('event') if wallet else Transaction.objects.none()
+    deleted = {'events': set(), 'registrations': set(), 'groups': set()}
+
+    if since is None:
+        events = events.filter(_visible(authz))
+    else:
+        tombstones = Tombstone.objects.filter(Q(user=None) | Q(user=user), deleted_at__gt=since)
+        removed_groups = set()
+        for kind, object_id in tombstones.values_list('kind', 'object_id'):
+            if kind == 'event':
+                deleted['events'].add(object_id)
+            elif kind == 'registration':
+                deleted['registrations'].add(object_id)
+            else:
+                deleted['groups'].add(object_id)
+                removed_groups.add(object_id)
+
+        groups = groups.filter(updated_at__gt=since)
+        changed_groups = set(groups.values_list('pk', flat=True))
+        # Events change when they are edited, or appear/disappear with a membership change
+        touched = list(events.filter(Q(updated_at__gt=since) | Q(group_id__in=changed_groups | removed_groups)))
+        visible = set(Event.objects.filter(pk__in=[event.pk for event in touched]).filter(_visible(authz)).values_list('pk', flat=True))
+        events = [event for event in touched if event.pk in visible]
+        deleted['events'].update(event.pk for event in touched if event.pk not in visible)
+        registrations = registrations.filter(updated_at__gt=since)
+        transactions = transactions.filter(created_at__gt=since)
+
+    context = {'request': request}
+    watermark = started - timedelta(seconds=getattr(settings, 'SYNC_SAFETY_SECONDS', 5))
+    return {
+        'watermark': watermark,
+        'full': full,
+        'events': EventSerializer(events, many=True, context=context).data,
+        'registrations': RegistrationSerializer(registrations, many=True, context=context).data,
+        'groups': [_group_row(row, request) for row in groups.values(*GROUP_FIELDS)],
+        'wallet': {'id': wallet.pk, 'balance': wallet.balance, 'currency': wallet.currency}
+        if wallet and (since is None or wallet.updated_at > since) else None,
+        'transactions': TransactionSerializer(transactions.order_by('created_at', 'id'), many=True).data,
+        'deleted': {kind: sorted(ids) for kind, ids in deleted.items()},
+    }
+
+
+def purge_tombstones():
+    """Delete tombstones past the retention window. Returns how many were removed."""
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=retention_cutoff()).delete()
+    return deleted
@@ -0,0 +1,1404 @@
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import User
+from events.hotcache import hot_codes
+from events.models import Event, Registration
+
+
+def make_event(name, **kwargs):
+    return Event.objects.create(name=name, date=timezone.now() + timedelta(days=1), location='Sala', capacity=100, **kwargs)
+
+
+class VerifyQrScanTests(TestCase):
+    def setUp(self):
+        hot_codes.clear()
+        caches['ratelimit'].clear()
+        self.staff = User.objects.create_user(username='staff', email='staff@example.com', password='x', is_staff=True)
+        self.attendee = User.objects.create_user(username='attendee', email='attendee@example.com', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def tearDown(self):
+        hot_codes.clear()
+
+    def scan(self, qr_content, event_id=None):
+        data = {'qr_content': qr_content}
+        if event_id is not None:
+            data['event_id'] = event_id
+        return self.client.post('/api/registrations/validate_qr/', data, format='json', secure=True)
+
+    def test_short_code_of_live_event_is_not_accepted_for_another_event(self):
+        scanned_at = make_event('No en directo')
+        live = make_event('En directo', is_live=True)
+        registration = Registration.objects.create(user=self.attendee, event=live)
+
+        response = self.scan(registration.short_code, event_id=scanned_at.pk)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.data['valid'])
+        registration.refresh_from_db()
+        self.assertFalse(registration.used)
+
+    def test_entry_code_of_another_event_is_rejected(self):
+        scanned_at = make_event('No en directo')
+        live = make_event('En directo', is_live=True)
+        registration = Registration.objects.create(user=self.attendee, event=live)
+
+        response = self.scan(str(registration.entry_code), event_id=scanned_at.pk)
+
+        self.assertEqual(response.status_code, 404)
+        registration.refresh_from_db()
+        self.assertFalse(registration.used)
+
+    def test_short_code_checks_in_once(self):
+        event = make_event('En directo', is_live=True)
+        registration = Registration.objects.create(user=self.attendee, event=event)
+
+        first = self.scan(registration.short_code, event_id=event.pk)
+        second = self.scan(registration.short_code, event_id=event.pk)
+
+        self.assertTrue(first.data['valid'])
+        self.assertFalse(second.data['valid'])
+        event.refresh_from_db()
+        self.assertEqual(event.checked_in_count, 1)
+
+
+class CheckInCounterTests(TestCase):
+    def setUp(self):
+        hot_codes.clear()
+        caches['ratelimit'].clear()
+        self.staff = User.objects.create_user(username='staff', email='staff@example.com', password='x', is_staff=True)
+        self.attendee = User.objects.create_user(username='attendee', email='attendee@example.com', password='x')
+        self.event = make_event('No en directo')
+        self.registration = Registration.objects.create(user=self.attendee, event=self.event)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def checked_in_count(self):
+        self.event.refresh_from_db()
+        return self.event.checked_in_count
+
+    def test_second_check_in_of_a_stale_row_is_not_counted(self):
+        from events.counters import check_in
+        # Two scans that both read the row before either wrote it
+        self.assertTrue(check_in(self.registration.pk, self.event.pk, timezone.now()))
+        self.assertFalse(check_in(self.registration.pk, self.event.pk, timezone.now()))
+        self.assertEqual(self.checked_in_count(), 1)
+
+    def test_verify_qr_scan_of_non_live_event_counts_once(self):
+        url = '/api/registrations/validate_qr/'
+        data = {'qr_content': str(self.registration.entry_code)}
+        first = self.client.post(url, data, format='json', secure=True)
+        second = self.client.post(url, data, format='json', secure=True)
+        self.assertTrue(first.data['valid'])
+        self.assertFalse(second.data['valid'])
+        self.assertEqual(self.checked_in_count(), 1)
+
+    def test_validate_qr_counts_once(self):
+        url = f'/api/registrations/{self.registration.pk}/validate_qr/'
+        first = self.client.post(url, secure=True)
+        second = self.client.post(url, secure=True)
+        self.assertFalse(first.data['already_used'])
+        self.assertTrue(second.data['already_used'])
+        self.assertEqual(self.checked_in_count(), 1)
+
+
+class CascadeDeleteTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f'u{i}', email=f'u{i}@example.com', password='x') for i in range(3)]
+        self.event = make_event('Borrable')
+        self.other = make_event('Otro')
+        for i in range(30):
+            Registration.objects.create(user=self.users[i % 3], event=self.event, used=i % 2 == 0)
+        Registration.objects.create(user=self.users[0], event=self.other, used=True)
+
+    def test_event_delete_costs_a_fixed_number_of_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from events.models import Tombstone
+
+        with CaptureQueriesContext(connection) as queries:
+            self.event.delete()
+
+        self.assertLess(len(queries), 20)
+        self.assertEqual(Tombstone.objects.filter(kind='registration').count(), 30)
+        self.assertEqual(Tombstone.objects.filter(kind='event').count(), 1)
+        self.other.refresh_from_db()
+        self.assertEqual((self.other.registered_count, self.other.checked_in_count), (1, 1))
+
+    def test_user_delete_adjusts_counters_per_event(self):
+        from events.counters import computed_counters
+
+        self.users[0].delete()
+
+        for event in (self.event, self.other):
+            event.refresh_from_db()
+            counted = computed_counters([event.pk]).get(event.pk, {'registered_count': 0, 'checked_in_count': 0, 'member_count': 0})
+            self.assertEqual(event.registered_count, counted['registered_count'])
+            self.assertEqual(event.checked_in_count, counted['checked_in_count'])
+            self.assertEqual(event.member_count, counted['member_count'])
+
+    def test_single_registration_delete_still_counts_and_tombstones(self):
+        from events.models import Tombstone
+
+        registration = Registration.objects.filter(event=self.other).get()
+        pk = registration.pk
+        registration.delete()
+
+        self.other.refresh_from_db()
+        self.assertEqual((self.other.registered_count, self.other.checked_in_count), (0, 0))
+        self.assertTrue(Tombstone.objects.filter(kind='registration', object_id=pk).exists())
+
+    def test_failed_delete_does_not_leak_into_later_deletes(self):
+        from django.db import transaction
+        from django.db.models.signals import pre_delete
+        from events.models import Tombstone
+
+        def fail(sender, instance, **kwargs):
+            raise RuntimeError('boom')
+
+        pre_delete.connect(fail, sender=Event, dispatch_uid='test_failing_delete')
+        try:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.event.delete()
+        finally:
+            pre_delete.disconnect(sender=Event, dispatch_uid='test_failing_delete')
+
+        registration = Registration.objects.filter(event=self.event).first()
+        pk = registration.pk
+        registration.delete()
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.registered_count, 29)
+        self.assertTrue(Tombstone.objects.filter(kind='registration', object_id=pk).exists())
+
+    def test_queryset_delete_of_events_is_handled_set_wise(self):
+        from events.models import Tombstone
+
+        Event.objects.filter(pk__in=[self.event.pk, self.other.pk]).delete()
+
+        self.assertEqual(Tombstone.objects.filter(kind='registration').count(), 31)
+        self.assertEqual(Tombstone.objects.filter(kind='event').count(), 2)
+
+
+class AuthzCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='admin', email='admin@example.com', password='x')
+        self.event = make_event('Evento')
+        self.event.admins.add(self.user)
+
+    def test_locmem_cache_is_not_used_across_requests(self):
+        from events.authz import AuthzContext
+
+        self.assertTrue(AuthzContext.for_user(self.user).is_event_admin(self.event))
+        # As another worker would: its m2m_changed receiver clears only its own locmem
+        Event.admins.through.objects.filter(user_id=self.user.pk).delete()
+        self.assertFalse(AuthzContext.for_user(self.user).is_event_admin(self.event))
+
+    def test_shared_cache_keeps_role_sets(self):
+        import tempfile
+        from django.core.cache import cache
+        from django.test import override_settings
+        from events.authz import AuthzContext, _cache_key
+
+        shared = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tempfile.mkdtemp()}
+        with override_settings(CACHES={'default': shared}):
+            AuthzContext.for_user(self.user)
+            self.assertIsNotNone(cache.get(_cache_key(self.user.pk)))
+
+
+class DailyRevenueTests(TestCase):
+    def setUp(self):
+        from events.models import Wallet
+        user = User.objects.create_user(username='buyer', email='buyer@example.com', password='x')
+        self.wallet = Wallet.objects.create(user=user)
+        self.event = make_event('De pago', price=5)
+
+    def post(self, amount, transaction_type, event=None):
+        from events.models import Transaction
+        return Transaction.objects.create(wallet=self.wallet, amount=amount, transaction_type=transaction_type,
+                                          event=event, balance_after=0)
+
+    def test_deleted_event_rows_are_folded_into_the_event_less_row(self):
+        from decimal import Decimal
+        from django.test import override_settings
+        from events.models import DailyRevenue
+        from events.rollups import rollup_daily_revenue
+
+        with override_settings(ROLLUP_SAFETY_LAG_SECONDS=0):
+            self.post(Decimal('-5'), 'payment', self.event)
+            self.post(Decimal('-7'), 'payment')
+            rollup_daily_revenue()
+            self.event.delete()
+            self.post(Decimal('-3'), 'payment')
+            rollup_daily_revenue()
+
+        rows = DailyRevenue.objects.filter(transaction_type='payment')
+        self.assertEqual(rows.count(), 1)
+        row = rows.get()
+        self.assertIsNone(row.event_id)
+        self.assertEqual((row.count, row.total), (3, Decimal('-15')))
+
+    def test_late_commit_with_a_lower_id_is_counted(self):
+        from decimal import Decimal
+        from django.test import override_settings
+        from events.models import DailyRevenue, Transaction
+        from events.rollups import rollup_daily_revenue
+
+        first = self.post(Decimal('-1'), 'deposit')
+        Transaction.objects.filter(pk=first.pk).delete()
+        later = self.post(Decimal('-5'), 'payment', self.event)
+        with override_settings(ROLLUP_SAFETY_LAG_SECONDS=0):
+            rollup_daily_revenue()
+            # Got its id before `later` but committed after the run
+            Transaction.objects.create(id=first.pk, wallet=self.wallet, amount=Decimal('-2'), transaction_type='payment',
+                                       event=self.event, balance_after=0)
+            rollup_daily_revenue()
+
+        row = DailyRevenue.objects.get(event=self.event, transaction_type='payment')
+        self.assertEqual((row.count, row.total), (2, Decimal('-7')))
+
+    def test_closed_days_are_not_read_again(self):
+        from decimal import Decimal
+        from events.models import DailyRevenue, RollupWatermark, Transaction
+        from events.rollups import rollup_daily_revenue
+
+        from django.test import override_settings
+
+        old = self.post(Decimal('-5'), 'payment', self.event)
+        Transaction.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=3))
+        with override_settings(ROLLUP_SAFETY_LAG_SECONDS=0):
+            rollup_daily_revenue()
+            self.assertEqual(RollupWatermark.objects.get().open_from, timezone.localdate())
+
+            Transaction.objects.filter(pk=old.pk).delete()
+            rollup_daily_revenue()
+        self.assertEqual(DailyRevenue.objects.get().count, 1)
+
+
+class GroupReportJobTests(TestCase):
+    def setUp(self):
+        from events.models import DistributionGroup
+        self.user = User.objects.create_user(username='socio', email='socio@example.com', password='x')
+        self.group = DistributionGroup.objects.create(name='Falla')
+        self.event = make_event('Cena', group=self.group)
+        self.registration = Registration.objects.create(user=self.user, event=self.event, attendee_first_name='Ana')
+
+    def version(self):
+        from events.reports import report_data_version
+        return report_data_version([self.event.pk])
+
+    def test_running_job_of_a_dead_worker_is_queued_again(self):
+        from django.test import override_settings
+        from events.models import ExportJob
+        from events.reports import request_group_report
+
+        job, created = request_group_report(self.group, self.user, file_format='csv')
+        ExportJob.objects.filter(pk=job.pk).update(status='running', started_at=timezone.now() - timedelta(hours=2))
+
+        with override_settings(EXPORT_JOB_TIMEOUT_SECONDS=3600):
+            again, created = request_group_report(self.group, self.user, file_format='csv')
+
+        self.assertFalse(created)
+        self.assertEqual(again.pk, job.pk)
+        self.assertEqual(again.status, 'pending')
+
+    def test_worker_builds_abandoned_jobs(self):
+        import tempfile
+        from django.test import override_settings
+        from events.models import ExportJob
+        from events.reports import request_group_report, run_pending_export_jobs
+
+        job, _ = request_group_report(self.group, self.user, file_format='csv')
+        recent = ExportJob.objects.create(group=self.group, file_format='xlsx', fingerprint='otro', status='running',
+                                          started_at=timezone.now())
+        ExportJob.objects.filter(pk=job.pk).update(status='running', started_at=timezone.now() - timedelta(hours=2))
+
+        with override_settings(EXPORT_JOB_TIMEOUT_SECONDS=3600, MEDIA_ROOT=tempfile.mkdtemp()):
+            self.assertEqual(run_pending_export_jobs(), 1)
+
+        job.refresh_from_db()
+        recent.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(recent.status, 'running')
+
+    def test_data_version_follows_attendee_and_account_edits(self):
+        before = self.version()
+        self.registration.attendee_first_name = 'Eva'
+        self.registration.save()
+        after_attendee = self.version()
+        self.user.email = 'nuevo@example.com'
+        self.user.save()
+        after_account = self.version()
+
+        self.assertNotEqual(before, after_attendee)
+        self.assertNotEqual(after_attendee, after_account)
+
+
+class EventListCacheTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.conf import settings
+        caches['ratelimit'].clear()
+        self.shared = dict(settings.CACHES, eventlist={
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tempfile.mkdtemp(),
+        })
+        self.event = make_event('Pública', is_public=True)
+        self.client = APIClient()
+
+    def get(self, host='testserver'):
+        return self.client.get('/api/events/', secure=True, HTTP_HOST=host)
+
+    def test_disabled_on_locmem(self):
+        self.assertNotIn('X-Cache', self.get())
+
+    def test_pages_are_cached_until_an_event_changes(self):
+        from django.test import override_settings
+        with override_settings(CACHES=self.shared):
+            self.assertEqual(self.get()['X-Cache'], 'MISS')
+            self.assertEqual(self.get()['X-Cache'], 'HIT')
+            self.event.name = 'Renombrada'
+            self.event.save()
+            response = self.get()
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['name'], 'Renombrada')
+
+    def test_pages_are_keyed_by_host(self):
+        from django.test import override_settings
+        with override_settings(CACHES=self.shared, ALLOWED_HOSTS=['testserver', 'api.example.com']):
+            self.get()
+            response = self.get(host='api.example.com')
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_parameters_are_normalized(self):
+        from django.test import override_settings
+        with override_settings(CACHES=self.shared):
+            self.client.get('/api/events/', {'is_free': 'true', 'search': 'Pú', 'utm_source': 'x'}, secure=True)
+            response = self.client.get('/api/events/', {'search': 'Pú', 'is_free': 'true', 'visibility': ''}, secure=True)
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_group_rename_and_admin_changes_invalidate(self):
+        from django.test import override_settings
+        from events.models import DistributionGroup
+        group = DistributionGroup.objects.create(name='Falla')
+        with override_settings(CACHES=self.shared):
+            self.get()
+            group.name = 'Falla Nueva'
+            group.save()
+            self.assertEqual(self.get()['X-Cache'], 'MISS')
+            self.event.admins.add(User.objects.create_user(username='admin', email='admin@example.com', password='x'))
+            self.assertEqual(self.get()['X-Cache'], 'MISS')
+
+    def test_authenticated_requests_are_not_cached(self):
+        from django.test import override_settings
+        self.client.force_authenticate(User.objects.create_user(username='socio', email='socio@example.com', password='x'))
+        with override_settings(CACHES=self.shared):
+            self.get()
+            self.assertNotIn('X-Cache', self.get())
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        from events.models import DistributionGroup
+        caches['ratelimit'].clear()
+        self.staff = User.objects.create_user(username='staff', email='staff@example.com', password='x', is_staff=True)
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', first_name='Ana')
+        self.event = make_event('Cena')
+        self.event.admins.add(self.admin)
+        self.group = DistributionGroup.objects.create(name='Falla')
+        self.group.members.add(self.staff)
+        Registration.objects.create(user=self.admin, event=self.event)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def get(self, url, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, secure=True, **headers)
+
+    def rename_admin(self):
+        self.admin.first_name = 'Eva'
+        self.admin.save()
+
+    def assert_changes(self, url, change):
+        etag = self.get(url)['ETag']
+        self.assertEqual(self.get(url, etag).status_code, 304)
+        change()
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return response
+
+    def test_event_list_follows_admin_edits(self):
+        response = self.assert_changes('/api/events/', self.rename_admin)
+        self.assertEqual(response.data['results'][0]['admins'][0]['first_name'], 'Eva')
+
+    def test_event_detail_follows_admin_edits(self):
+        self.assert_changes(f'/api/events/{self.event.pk}/', self.rename_admin)
+
+    def test_registration_list_follows_user_edits(self):
+        self.assert_changes('/api/registrations/', self.rename_admin)
+
+    def test_group_list_follows_membership_cleared_from_the_user_side(self):
+        response = self.assert_changes('/api/groups/', self.staff.distribution_groups.clear)
+        self.assertFalse(response.data['results'][0]['is_member'])
+
+    def test_event_list_of_a_non_staff_admin_sees_other_admins_edits(self):
+        other = User.objects.create_user(username='otro', email='otro@example.com', password='x')
+        self.event.is_public = False
+        self.event.save()
+        self.event.admins.add(other)
+        self.client.force_authenticate(self.admin)
+        self.admin = other
+        self.assert_changes('/api/events/', self.rename_admin)
+
+    def test_deletes_change_the_list_etag(self):
+        other = make_event('Comida')
+        self.assert_changes('/api/events/', other.delete)
+
+    def test_etags_are_per_user_and_weakly_compared(self):
+        etag = self.get('/api/events/')['ETag']
+        self.assertEqual(self.get('/api/events/', f'"other", {etag[2:]}').status_code, 304)
+
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.get('/api/events/', etag).status_code, 200)
+
+    def test_detail_honours_if_modified_since(self):
+        url = f'/api/events/{self.event.pk}/'
+        last_modified = self.get(url)['Last-Modified']
+
+        response = self.client.get(url, secure=True, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['Last-Modified'], last_modified)
+
+    def test_wallet_etag_follows_deposits(self):
+        from decimal import Decimal
+        from events.ledger import post_transaction
+        from events.models import Wallet
+        wallet = Wallet.objects.create(user=self.staff)
+        self.assert_changes('/api/wallets/my_wallet/', lambda: post_transaction(wallet, Decimal('5'), 'deposit'))
+
+
+class WalletLedgerTests(TestCase):
+    def setUp(self):
+        from events.models import Wallet
+        caches['ratelimit'].clear()
+        self.user = User.objects.create_user(username='fan', email='fan@example.com', password='x')
+        self.wallet = Wallet.objects.create(user=self.user)
+
+    def post(self, amount, transaction_type='deposit', **kwargs):
+        from decimal import Decimal
+        from events.ledger import post_transaction
+        return post_transaction(self.wallet, Decimal(amount), transaction_type, **kwargs)
+
+    def test_post_transaction_records_the_running_balance(self):
+        from decimal import Decimal
+        from events.ledger import InsufficientFunds
+        from events.models import Wallet
+
+        self.post('20')
+        tx = self.post('-5', 'payment')
+        with self.assertRaises(InsufficientFunds):
+            self.post('-16', 'payment')
+
+        self.assertEqual(tx.balance_after, Decimal('15'))
+        self.assertEqual(Wallet.objects.get(pk=self.wallet.pk).balance, Decimal('15'))
+        self.assertEqual(self.wallet.transactions.count(), 2)
+
+    def test_balance_is_the_snapshot_plus_the_tail(self):
+        from decimal import Decimal
+        from events.ledger import snapshot_wallet, snapshot_wallets, wallet_balance, wallet_balances
+
+        self.post('20')
+        self.post('-5', 'payment')
+        self.assertIsNone(snapshot_wallet(self.wallet.pk, min_tail=3))
+        snapshot = snapshot_wallet(self.wallet.pk)
+        self.post('7')
+
+        self.assertEqual(snapshot.balance, Decimal('15'))
+        with self.assertNumQueries(2):
+            self.assertEqual(wallet_balance(self.wallet.pk), Decimal('22'))
+        self.assertEqual(wallet_balances([self.wallet.pk]), {self.wallet.pk: Decimal('22')})
+        self.assertEqual(snapshot_wallets(min_tail=2), [])
+        self.assertEqual(len(snapshot_wallets(min_tail=1)), 1)
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        from decimal import Decimal
+        from io import StringIO
+        from django.core.management import call_command
+        from events.models import Wallet
+
+        self.post('20')
+        Wallet.objects.filter(pk=self.wallet.pk).update(balance=Decimal('99'))
+
+        out = StringIO()
+        with self.assertLogs('events.ledger', 'WARNING'):
+            call_command('reconcile_wallets', stdout=out)
+        self.assertIn(f'Billetera {self.wallet.pk}: ledger=20', out.getvalue())
+        self.assertIn('1 billetera(s) con diferencias', out.getvalue())
+        self.assertEqual(Wallet.objects.get(pk=self.wallet.pk).balance, Decimal('99'))
+
+        with self.assertLogs('events.ledger', 'WARNING'):
+            call_command('reconcile_wallets', '--fix', stdout=StringIO())
+        self.assertEqual(Wallet.objects.get(pk=self.wallet.pk).balance, Decimal('20'))
+
+    def test_statement_pages_with_a_cursor(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        ids = [self.post(str(amount)).pk for amount in range(1, 6)]
+        url = f'/api/wallets/{self.wallet.pk}/statement/'
+
+        first = client.get(url, {'limit': 3}, secure=True).data
+        second = client.get(url, {'limit': 3, 'cursor': first['next_cursor']}, secure=True).data
+
+        self.assertEqual([row['id'] for row in first['results'] + second['results']], ids[::-1])
+        self.assertIsNone(second['next_cursor'])
+        self.assertEqual(str(first['balance']), '15.00')
+        self.assertEqual(client.get(url, {'cursor': 'roto'}, secure=True).status_code, 400)
+
+
+class RefundLedgerTests(TestCase):
+    def setUp(self):
+        from decimal import Decimal
+        from events.ledger import post_transaction
+        from events.models import Wallet
+        self.event = make_event('Concierto', price=5)
+        self.wallets = []
+        for i in range(3):
+            user = User.objects.create_user(username=f'fan{i}', email=f'fan{i}@example.com', password='x')
+            wallet = Wallet.objects.create(user=user)
+            post_transaction(wallet, Decimal('20'), 'deposit')
+            post_transaction(wallet, Decimal('-5'), 'payment', event=self.event)
+            self.wallets.append(wallet)
+
+    def refund(self):
+        from events.refunds import request_event_refund, run_refund_job
+        job, _ = request_event_refund(self.event)
+        return run_refund_job(job, chunk_size=2)
+
+    def test_refunds_follow_the_ledger_not_the_mirror(self):
+        from decimal import Decimal
+        from events.ledger import reconcile_wallets, snapshot_wallet
+        from events.models import Transaction, Wallet
+
+        snapshot_wallet(self.wallets[0].pk)
+        # A drifted mirror must not leak into balance_after
+        Wallet.objects.filter(pk=self.wallets[1].pk).update(balance=Decimal('99'))
+
+        job = self.refund()
+
+        self.assertEqual((job.refunded_payments, job.refunded_amount), (3, Decimal('15')))
+        refunds = Transaction.objects.filter(transaction_type='refund')
+        self.assertEqual(sorted(refunds.values_list('balance_after', flat=True)), [Decimal('20')] * 3)
+        self.assertEqual(reconcile_wallets(), [])
+
+    def test_rerun_refunds_nothing_twice(self):
+        from events.models import Transaction
+        from events.refunds import refund_chunk
+
+        self.refund()
+        self.assertEqual(refund_chunk(None, self.event), 0)
+        self.assertEqual(Transaction.objects.filter(transaction_type='refund').count(), 3)
+
+
+class BootstrapTests(TestCase):
+    def setUp(self):
+        from events.models import Wallet
+        caches['ratelimit'].clear()
+        self.user = User.objects.create_user(username='socia', email='socia@example.com', password='x')
+        self.wallet = Wallet.objects.create(user=self.user)
+        self.event = make_event('Paella', is_public=True)
+        self.registration = Registration.objects.create(user=self.user, event=self.event)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get('/api/bootstrap/', secure=True, **headers)
+
+    def test_payload_carries_the_ticket_qr(self):
+        from events.codes import qr_payload
+        response = self.get()
+        self.assertEqual(response.data['registrations'][0]['qr'], qr_payload(self.registration))
+        self.assertEqual(response.data['events'][0]['id'], self.event.pk)
+
+    def test_unchanged_home_answers_304_without_building_the_payload(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        etag = self.get()['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any('"attendee_first_name"' in query['sql'] for query in queries))
+
+    def test_etag_follows_every_section(self):
+        from decimal import Decimal
+        from events.ledger import post_transaction
+
+        def rename_event():
+            self.event.name = 'Paella gigante'
+            self.event.save()
+
+        def verify_email():
+            self.user.email_verified = True
+            self.user.save(update_fields=['email_verified'])
+
+        changes = [rename_event, verify_email, lambda: post_transaction(self.wallet, Decimal('10'), 'deposit'),
+                   lambda: make_event('Nueva', is_public=True)]
+        etag = self.get()['ETag']
+        for change in changes:
+            change()
+            response = self.get(etag)
+            self.assertEqual(response.status_code, 200, change)
+            etag = response['ETag']
+
+    def test_query_count_does_not_grow_with_the_rows(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        def count():
+            with CaptureQueriesContext(connection) as queries:
+                self.get()
+            return len(queries)
+
+        before = count()
+        for i in range(5):
+            Registration.objects.create(user=self.user, event=make_event(f'Extra {i}', is_public=True))
+        self.assertEqual(count(), before)
+
+    def test_only_visible_upcoming_events_and_own_groups(self):
+        from events.models import DistributionGroup
+        group = DistributionGroup.objects.create(name='Falla')
+        group.members.add(self.user)
+        group.admins.add(self.user)
+        mine = make_event('De mi falla', is_public=False, group=group)
+        make_event('De otra falla', is_public=False, group=DistributionGroup.objects.create(name='Otra'))
+        make_event('Cancelada', is_public=True, cancelled_at=timezone.now())
+        past = make_event('Pasada', is_public=True)
+        Event.objects.filter(pk=past.pk).update(date=timezone.now() - timedelta(days=1))
+
+        data = self.get().data
+
+        self.assertEqual({event['id'] for event in data['events']}, {self.event.pk, mine.pk})
+        self.assertEqual([(g['id'], g['is_admin']) for g in data['groups']], [(group.pk, True)])
+        self.assertEqual(data['user']['username'], 'socia')
+        self.assertEqual(data['wallet']['id'], self.wallet.pk)
+
+
+class RegistrationQrTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+        media = override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+        media.enable()
+        self.addCleanup(media.disable)
+        caches['ratelimit'].clear()
+        self.user = User.objects.create_user(username='socio', email='socio@example.com', password='x')
+        self.event = make_event('Cena')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_created_registrations_get_their_qr_image(self):
+        from events.bulk import bulk_create_registrations
+        bulk_create_registrations([Registration(user_id=self.user.pk, event_id=self.event.pk)])
+        self.assertTrue(Registration.objects.get().qr_code)
+
+    def test_listing_never_renders_or_touches_rows(self):
+        Registration.objects.bulk_create([Registration(user=self.user, event=self.event)])
+        before = Registration.objects.get().updated_at
+
+        response = self.client.get('/api/registrations/', secure=True)
+
+        self.assertIsNone(response.data['results'][0]['qr_url'])
+        registration = Registration.objects.get()
+        self.assertEqual((registration.qr_code.name, registration.updated_at), ('', before))
+
+    def test_render_qr_codes_command_fills_missing_images(self):
+        from django.core.management import call_command
+        from io import StringIO
+        Registration.objects.bulk_create([Registration(user=self.user, event=self.event)])
+        call_command('render_qr_codes', stdout=StringIO())
+        self.assertTrue(Registration.objects.get().qr_code)
+
+
+class RegistrationExportTests(TestCase):
+    def setUp(self):
+        caches['ratelimit'].clear()
+        self.staff = User.objects.create_user(username='staff', email='staff@example.com', password='x', is_staff=True)
+        self.user = User.objects.create_user(username='socio', email='socio@example.com', password='x',
+                                             first_name='Ana', last_name='Gil')
+        self.event = make_event('Cena')
+        self.used = Registration.objects.create(user=self.user, event=self.event, used=True,
+                                        attendee_first_name='Luis', attendee_last_name='Roig')
+        self.unused = Registration.objects.create(user=self.user, event=self.event, attendee_type='guest')
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def export(self, **params):
+        return self.client.get(f'/api/events/{self.event.pk}/export_registrations/', params, secure=True)
+
+    def test_csv_streams_the_selected_columns(self):
+        import csv
+        response = self.export(columns='id,user,type,used')
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode('utf-8-sig').splitlines()))
+        self.assertEqual(rows, [
+            ['ID', 'Usuario (Cuenta)', 'Tipo', 'Usado'],
+            [str(self.used.pk), 'Ana Gil', 'Fallero', 'Sí'],
+            [str(self.unused.pk), 'Ana Gil', 'Invitado', 'No'],
+        ])
+
+    def test_filters_on_used_and_attendee_type(self):
+        import csv
+        for params, expected in (({'used': 'false'}, self.unused), ({'attendee_type': 'member'}, self.used)):
+            response = self.export(columns='id', **params)
+            rows = list(csv.reader(b''.join(response.streaming_content).decode('utf-8-sig').splitlines()))
+            self.assertEqual(rows[1:], [[str(expected.pk)]])
+
+    def test_xlsx_is_a_readable_workbook(self):
+        import io
+        import zipfile
+        response = self.export(file_format='xlsx', columns='id,attendee')
+
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as workbook:
+            self.assertIsNone(workbook.testzip())
+            sheet = workbook.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertEqual(sheet.count('<row>'), 3)
+        self.assertIn(f'<c><v>{self.used.pk}</v></c>', sheet)
+        self.assertIn('>Luis Roig<', sheet)
+
+    def test_unknown_columns_and_formats_are_rejected(self):
+        self.assertEqual(self.export(columns='id,password').status_code, 400)
+        self.assertEqual(self.export(file_format='pdf').status_code, 400)
+
+    def test_only_admins_can_export(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.export().status_code, 403)
+
+
+class AttendeeImportTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+        from events.models import DistributionGroup
+        media = override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+        media.enable()
+        self.addCleanup(media.disable)
+        caches['ratelimit'].clear()
+        self.group = DistributionGroup.objects.create(name='Falla')
+        self.event = make_event('Cena', group=self.group)
+        self.foreign = make_event('Otra falla')
+        self.existing = User.objects.create_user(username='ana', email='Ana@Example.com', password='x')
+
+    def rows(self, text):
+        import io
+        from events.importers import read_attendee_csv
+        return read_attendee_csv(io.BytesIO(text.encode('utf-8-sig')))
+
+    def test_every_row_is_validated_before_writing(self):
+        from events.importers import import_attendees
+        rows = self.rows(
+            'email;first_name;attendee_type;event_id\n'
+            'ana@example.com;Ana;fallera;\n'
+            'no-es-email;Luis;;\n'
+            'pau@example.com;Pau;vecino;\n'
+            f'marta@example.com;Marta;;{self.foreign.pk}\n'
+        )
+
+        report = import_attendees(self.group, rows, [self.event.pk])
+
+        self.assertFalse(report['imported'])
+        self.assertEqual([err['row'] for err in report['errors']], [3, 4, 5])
+        self.assertEqual(report['valid_rows'], 1)
+        self.assertEqual(Registration.objects.count(), 0)
+        self.assertFalse(self.group.members.exists())
+
+    def test_dry_run_reports_without_writing(self):
+        from events.importers import import_attendees
+        rows = self.rows('email,first_name\nana@example.com,Ana\nnueva@example.com,Nueva\n')
+
+        report = import_attendees(self.group, rows, [self.event.pk], dry_run=True)
+
+        self.assertEqual((report['valid_rows'], report['errors'], report['imported']), (2, [], False))
+        self.assertEqual(User.objects.count(), 1)
+        self.assertEqual(Registration.objects.count(), 0)
+
+    def test_import_matches_users_by_email_and_registers_them(self):
+        from events.importers import import_attendees
+        rows = self.rows('email,first_name,attendee_type\nana@example.com,Ana,\nnueva@example.com,Nueva,invitado\n')
+
+        report = import_attendees(self.group, rows, [self.event.pk])
+
+        self.assertTrue(report['imported'])
+        self.assertEqual((report['users_matched'], report['users_created'], report['registrations_created']), (1, 1, 2))
+        self.assertEqual(set(self.group.members.values_list('email', flat=True)), {self.existing.email, 'nueva@example.com'})
+        self.assertEqual(Registration.objects.get(user__email='nueva@example.com').attendee_type, 'guest')
+
+    def test_skip_invalid_imports_the_valid_rows(self):
+        from events.importers import import_attendees
+        rows = self.rows('email\nana@example.com\nno-es-email\n')
+
+        report = import_attendees(self.group, rows, [self.event.pk], skip_invalid=True)
+
+        self.assertTrue(report['imported'])
+        self.assertEqual(Registration.objects.get().user, self.existing)
+
+    def test_max_qr_codes_is_checked_against_the_whole_file(self):
+        from events.importers import import_attendees
+        Event.objects.filter(pk=self.event.pk).update(max_qr_codes=1)
+        rows = self.rows('email\nana@example.com\nnueva@example.com\n')
+
+        report = import_attendees(self.group, rows, [self.event.pk], skip_invalid=True)
+
+        self.assertFalse(report['imported'])
+        self.assertEqual(report['errors'][0]['row'], None)
+
+    def test_endpoint_returns_the_report(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        upload = SimpleUploadedFile('asistentes.csv', b'email\nana@example.com\n', content_type='text/csv')
+
+        response = client.post(f'/api/groups/{self.group.pk}/import_attendees/',
+                               {'file': upload, 'event_ids': str(self.event.pk), 'dry_run': 'true'}, secure=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['valid_rows'], response.data['dry_run']), (1, True))
+
+
+class BulkMembershipTests(TestCase):
+    def setUp(self):
+        from django.db.models.signals import m2m_changed
+        from events.models import DistributionGroup
+        caches['ratelimit'].clear()
+        self.group = DistributionGroup.objects.create(name='Falla')
+        self.users = [User.objects.create_user(username=f'u{i}', email=f'u{i}@example.com', password='x') for i in range(4)]
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='staff', email='staff@example.com', password='x', is_staff=True))
+        self.signals = []
+        through = DistributionGroup.members.through
+
+        def record(sender, action, pk_set, **kwargs):
+            self.signals.append((action, set(pk_set or ())))
+
+        m2m_changed.connect(record, sender=through, weak=False, dispatch_uid='test_bulk_membership')
+        self.addCleanup(m2m_changed.disconnect, sender=through, dispatch_uid='test_bulk_membership')
+
+    def bulk(self, op, ids, relation='members'):
+        return self.client.post(f'/api/groups/{self.group.pk}/bulk_{op}/', {'relation': relation, 'ids': ids}, format='json', secure=True)
+
+    def test_add_sends_one_signal_for_the_whole_batch(self):
+        ids = [user.pk for user in self.users]
+        response = self.bulk('add', ids)
+
+        self.assertEqual(response.data['added'], sorted(ids))
+        self.assertEqual(self.signals, [('pre_add', set(ids)), ('post_add', set(ids))])
+        self.assertEqual(set(self.group.members.values_list('pk', flat=True)), set(ids))
+
+    def test_adding_existing_members_sends_nothing(self):
+        self.group.members.add(self.users[0])
+        self.signals.clear()
+
+        response = self.bulk('add', [self.users[0].pk])
+
+        self.assertEqual((response.data['added'], self.signals), ([], []))
+
+    def test_replace_removes_and_adds_once_each(self):
+        from events.models import Tombstone
+        self.group.members.add(self.users[0], self.users[1])
+        self.signals.clear()
+
+        response = self.bulk('replace', [self.users[1].pk, self.users[2].pk])
+
+        self.assertEqual((response.data['added'], response.data['removed']), ([self.users[2].pk], [self.users[0].pk]))
+        self.assertEqual([action for action, _ in self.signals], ['pre_remove', 'post_remove', 'pre_add', 'post_add'])
+        self.assertTrue(Tombstone.objects.filter(kind='membership', object_id=self.group.pk, user_id=self.users[0].pk).exists())
+
+    def test_role_cache_of_added_users_is_dropped(self):
+        from events.authz import AuthzContext
+        self.assertFalse(AuthzContext.for_user(self.users[0]).is_group_admin(self.group))  # now cached
+
+        self.bulk('add', [self.users[0].pk], relation='admins')
+
+        self.assertTrue(AuthzContext.for_user(self.users[0]).is_group_admin(self.group))
+
+    def test_unknown_ids_are_rejected_before_writing(self):
+        response = self.bulk('add', [self.users[0].pk, 999999])
+
+        self.assertEqual((response.status_code, response.data['not_found']), (400, [999999]))
+        self.assertEqual(self.signals, [])
+
+
+class HotCodesTests(TestCase):
+    def setUp(self):
+        hot_codes.clear()
+        self.addCleanup(hot_codes.clear)
+        self.user = User.objects.create_user(username='socio', email='socio@example.com', password='x')
+        self.event = make_event('En directo', is_live=True)
+        self.registration = Registration.objects.create(user=self.user, event=self.event)
+
+    def test_live_event_codes_are_answered_from_memory(self):
+        hot_codes.refresh(force=True)
+
+        with self.settings(HOT_CODES_RECHECK_SECONDS=60), self.assertNumQueries(0):
+            hit = hot_codes.lookup('uuid', self.registration.entry_code, self.event.pk)
+            by_short_code = hot_codes.lookup('short', self.registration.short_code)
+
+        self.assertEqual(hit.registration_id, self.registration.pk)
+        self.assertEqual(by_short_code, hit)
+
+    def test_bumped_version_is_reloaded_at_the_next_recheck(self):
+        from events.hotcache import bump_codes_version
+        hot_codes.refresh(force=True)
+        added = Registration.objects.bulk_create([Registration(user=self.user, event=self.event, short_code='ZZZZZZ')])[0]
+
+        with self.settings(HOT_CODES_RECHECK_SECONDS=60):
+            # Same version and inside the recheck window: still the old copy
+            self.assertIsNone(hot_codes.lookup('uuid', added.entry_code, self.event.pk))
+        bump_codes_version([self.event.pk])
+        with self.settings(HOT_CODES_RECHECK_SECONDS=0):
+            self.assertEqual(hot_codes.lookup('uuid', added.entry_code, self.event.pk).registration_id, added.pk)
+
+    def test_deleting_or_re_enabling_a_registration_bumps_the_version(self):
+        version = Event.objects.get(pk=self.event.pk).codes_version
+        self.registration.used = True
+        self.registration.save()
+        self.assertEqual(Event.objects.get(pk=self.event.pk).codes_version, version)
+
+        self.registration.used = False
+        self.registration.save()
+        self.assertEqual(Event.objects.get(pk=self.event.pk).codes_version, version + 1)
+
+        self.registration.delete()
+        self.assertEqual(Event.objects.get(pk=self.event.pk).codes_version, version + 2)
+
+    def test_events_that_are_not_live_are_not_kept(self):
+        from events.hotcache import bump_codes_version
+        quiet = make_event('No en directo')
+        Registration.objects.create(user=self.user, event=quiet)
+
+        bump_codes_version([quiet.pk])
+        hot_codes.refresh(force=True)
+
+        self.assertEqual(Event.objects.get(pk=quiet.pk).codes_version, 0)
+        self.assertEqual(set(hot_codes.codes), {self.event.pk})
+
+
+class LiveStreamTests(TestCase):
+    def setUp(self):
+        caches['ratelimit'].clear()
+        self.user = User.objects.create_user(username='socio', email='socio@example.com', password='x')
+        self.event = make_event('En directo')
+        self.early = Registration.objects.create(user=self.user, event=self.event, used=True,
+                                                 attended_at=timezone.now() - timedelta(minutes=5))
+        self.waiting = Registration.objects.create(user=self.user, event=self.event, attendee_first_name='Luis',
+                                                   attendee_last_name='Roig')
+
+    def message(self, text):
+        import json
+        fields = dict(line.split(': ', 1) for line in text.strip().splitlines())
+        return fields['event'], json.loads(fields['data'])
+
+    def stream(self, mode, **kwargs):
+        from events.live import attendance_stream
+        with self.settings(LIVE_STREAM_MODE=mode):
+            stream = attendance_stream(self.event.pk, poll_seconds=0, **kwargs)
+            self.addCleanup(stream.close)
+            self.assertEqual(next(stream), 'retry: 3000\n\n')
+            return stream
+
+    def test_snapshot_has_the_counts_and_last_arrivals(self):
+        kind, data = self.message(next(self.stream('db')))
+
+        self.assertEqual(kind, 'snapshot')
+        self.assertEqual(data['counts']['checked_in_count'], 1)
+        self.assertEqual([arrival['id'] for arrival in data['last_arrivals']], [self.early.pk])
+
+    def test_db_mode_reads_arrivals_after_the_cursor(self):
+        stream = self.stream('db', max_seconds=60)
+        next(stream)
+        self.assertEqual(next(stream), ': keepalive\n\n')
+
+        Registration.objects.filter(pk=self.waiting.pk).update(used=True, attended_at=timezone.now())
+
+        kind, data = self.message(next(stream))
+        self.assertEqual(kind, 'checkin')
+        self.assertEqual([(a['id'], a['attendee']) for a in data['arrivals']], [(self.waiting.pk, 'Luis Roig')])
+
+    def test_memory_mode_delivers_published_check_ins_after_commit(self):
+        from events.live import publish_checkin
+        stream = self.stream('memory', max_seconds=60)
+        next(stream)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_checkin(self.event.pk, self.waiting.pk, 'Luis Roig', 'member', timezone.now())
+
+        kind, data = self.message(next(stream))
+        self.assertEqual((kind, data['counts']['checked_in_count']), ('checkin', 2))
+        self.assertEqual(data['arrivals'][0]['id'], self.waiting.pk)
+
+    def test_stream_ends_and_unsubscribes(self):
+        from events.live import has_listeners
+        stream = self.stream('memory', max_seconds=0)
+        next(stream)
+        self.assertTrue(has_listeners(self.event.pk))
+
+        self.assertEqual(list(stream), [])
+        self.assertFalse(has_listeners(self.event.pk))
+
+    def test_only_event_admins_can_open_the_stream(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = f'/api/events/{self.event.pk}/live/'
+        self.assertEqual(client.get(url, HTTP_ACCEPT='text/event-stream', secure=True).status_code, 403)
+
+        client.force_authenticate(User.objects.create_user(username='staff', email='staff@example.com', password='x', is_staff=True))
+        with self.settings(LIVE_STREAM_MAX_SECONDS=0):
+            response = client.get(url, HTTP_ACCEPT='text/event-stream', secure=True)
+            body = b''.join(response.streaming_content).decode()
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIn('event: snapshot', body)
+
+
+class ArrivalAnalyticsTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.addCleanup(cache.clear)
+        caches['ratelimit'].clear()
+        self.user = User.objects.create_user(username='socio', email='socio@example.com', password='x')
+        self.event = make_event('Cena')
+        self.event.date = timezone.now() - timedelta(days=3)
+        self.event.save()
+        start = self.event.date.replace(minute=10, second=0, microsecond=0)
+        arrivals = [start, start + timedelta(seconds=20), start + timedelta(seconds=40), start + timedelta(minutes=7)]
+        for attended_at in arrivals:
+            Registration.objects.create(user=self.user, event=self.event, used=True, attended_at=attended_at)
+        Registration.objects.create(user=self.user, event=self.event, attendee_type='guest')
+        Registration.objects.create(user=self.user, event=self.event, attendee_type='guest', used=True, attended_at=arrivals[-1])
+        self.start = start
+
+    def test_arrivals_are_bucketed_with_the_peak_and_no_shows(self):
+        from events.analytics import event_analytics
+        data = event_analytics(self.event)
+
+        self.assertEqual([(a['time'], a['count']) for a in data['arrivals']],
+                         [(self.start, 3), (self.start + timedelta(minutes=7), 2)])
+        self.assertEqual(data['peak'], {'time': self.start, 'count': 3})
+        self.assertEqual((data['registered'], data['attended']), (6, 5))
+        guests = next(row for row in data['by_type'] if row['attendee_type'] == 'guest')
+        self.assertEqual((guests['label'], guests['no_show'], guests['no_show_rate']), ('Invitado', 1, 0.5))
+
+    def test_hour_buckets(self):
+        from events.analytics import arrivals_by_bucket
+        self.assertEqual(arrivals_by_bucket(self.event.pk, 'hour'), [(self.start.replace(minute=0), 5)])
+
+    def test_finished_events_are_cached_and_live_ones_are_not(self):
+        from events.analytics import event_analytics
+        self.assertFalse(event_analytics(self.event)['cached'])
+        with self.assertNumQueries(0):
+            self.assertTrue(event_analytics(self.event)['cached'])
+
+        self.event.is_live = True
+        self.assertFalse(event_analytics(self.event)['cached'])
+        self.assertFalse(event_analytics(self.event)['cached'])
+
+    def test_endpoint_checks_the_bucket_and_the_admin(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = f'/api/events/{self.event.pk}/analytics/'
+        self.assertEqual(client.get(url, secure=True).status_code, 403)
+
+        client.force_authenticate(User.objects.create_user(username='staff', email='staff@example.com', password='x', is_staff=True))
+        self.assertEqual(client.get(url, {'bucket': 'week'}, secure=True).status_code, 400)
+        self.assertEqual(client.get(url, {'bucket': 'day'}, secure=True).data['arrivals'][0]['count'], 5)
+
+
+class BulkAccessReviewTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+        from events.models import AccessRequest
+        media = override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+        media.enable()
+        self.addCleanup(media.disable)
+        caches['ratelimit'].clear()
+        self.event = make_event('Cena', requires_approval=True, max_qr_codes=2)
+        self.users = [User.objects.create_user(username=f'u{i}', email=f'u{i}@example.com', password='x') for i in range(4)]
+        self.requests = [AccessRequest.objects.create(user=user, event=self.event) for user in self.users]
+        AccessRequest.objects.filter(pk=self.requests[0].pk).update(requested_at=timezone.now() - timedelta(days=2))
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='staff', email='staff@example.com', password='x', is_staff=True))
+
+    def review(self, **data):
+        return self.client.post(f'/api/events/{self.event.pk}/bulk_review_access/', data, format='json', secure=True)
+
+    def test_approvals_stop_at_the_free_places(self):
+        from events.models import AccessRequest, OutboxEmail
+        Registration.objects.create(user=self.users[3], event=self.event)
+
+        response = self.review(decision='approve', all_pending=True)
+
+        self.assertEqual(response.data['approved'], [self.requests[0].pk])
+        self.assertEqual(response.data['left_pending'], [r.pk for r in self.requests[1:]])
+        self.assertEqual(response.data['free_places'], 0)
+        self.assertEqual(Registration.objects.filter(event=self.event).count(), 2)
+        self.assertEqual(AccessRequest.objects.filter(status='pending').count(), 3)
+        self.assertEqual(list(OutboxEmail.objects.values_list('recipient', flat=True)), ['u0@example.com'])
+
+    def test_requested_before_cuts_off_newer_requests(self):
+        response = self.review(decision='reject', all_pending=True, admin_notes='Completo',
+                               requested_before=(timezone.now() - timedelta(days=1)).isoformat())
+
+        self.assertEqual(response.data['rejected'], [self.requests[0].pk])
+        self.requests[0].refresh_from_db()
+        self.assertEqual((self.requests[0].status, self.requests[0].admin_notes), ('rejected', 'Completo'))
+
+    def test_reviewed_requests_are_not_reviewed_again(self):
+        ids = [self.requests[0].pk, self.requests[1].pk]
+        self.review(decision='approve', request_ids=ids)
+
+        response = self.review(decision='approve', request_ids=ids)
+
+        self.assertEqual(response.data['approved'], [])
+        self.assertEqual(Registration.objects.filter(event=self.event).count(), 2)
+
+    def test_group_approvals_add_members(self):
+        from events.models import DistributionGroup, GroupAccessRequest
+        group = DistributionGroup.objects.create(name='Falla')
+        pending = [GroupAccessRequest.objects.create(user=user, group=group) for user in self.users[:2]]
+
+        response = self.client.post(f'/api/groups/{group.pk}/bulk_review_access/',
+                                    {'decision': 'approve', 'all_pending': True}, format='json', secure=True)
+
+        self.assertEqual(response.data['approved'], [req.pk for req in pending])
+        self.assertEqual(set(group.members.all()), set(self.users[:2]))
+
+    def test_bad_requests(self):
+        self.assertEqual(self.review(decision='maybe', all_pending=True).status_code, 400)
+        self.assertEqual(self.review(decision='approve').status_code, 400)
+        self.assertEqual(self.review(decision='approve', all_pending=True, requested_before='ayer').status_code, 400)
+
+
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+        from events.models import DistributionGroup
+        media = override_settings(MEDIA_ROOT=tempfile.mkdtemp(), SYNC_SAFETY_SECONDS=0)
+        media.enable()
+        self.addCleanup(media.disable)
+        caches['ratelimit'].clear()
+        self.user = User.objects.create_user(username='socio', email='socio@example.com', password='x')
+        self.other = User.objects.create_user(username='otro', email='otro@example.com', password='x')
+        self.group = DistributionGroup.objects.create(name='Falla')
+        self.group.members.add(self.user)
+        self.public = make_event('Pública', is_public=True)
+        self.private = make_event('Privada', is_public=False, group=self.group)
+        self.mine = Registration.objects.create(user=self.user, event=self.public)
+        self.theirs = Registration.objects.create(user=self.other, event=self.public)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, since=None):
+        params = {'since': since.isoformat()} if since else {}
+        response = self.client.get('/api/sync/', params, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_full_sync_returns_everything_visible(self):
+        data = self.sync()
+
+        self.assertTrue(data['full'])
+        self.assertEqual({event['id'] for event in data['events']}, {self.public.pk, self.private.pk})
+        self.assertEqual([reg['id'] for reg in data['registrations']], [self.mine.pk])
+        self.assertEqual([group['id'] for group in data['groups']], [self.group.pk])
+
+    def test_delta_has_only_the_changes_and_own_tombstones(self):
+        watermark = self.sync()['watermark']
+        self.private.name = 'Privada (cambiada)'
+        self.private.save()
+        mine, theirs = self.mine.pk, self.theirs.pk
+        self.mine.delete()
+        self.theirs.delete()
+
+        data = self.sync(watermark)
+
+        self.assertFalse(data['full'])
+        # The public event is back because its counters moved with the deletes
+        self.assertEqual({event['id'] for event in data['events']}, {self.private.pk, self.public.pk})
+        self.assertEqual(data['registrations'], [])
+        self.assertEqual(data['deleted']['registrations'], [mine])
+        self.assertNotIn(theirs, data['deleted']['registrations'])
+
+    def test_deleted_events_and_lost_memberships_are_tombstoned(self):
+        watermark = self.sync()['watermark']
+        public = self.public.pk
+        self.public.delete()
+        self.group.members.remove(self.user)
+
+        data = self.sync(watermark)
+
+        self.assertEqual(data['deleted']['events'], sorted([public, self.private.pk]))
+        self.assertEqual(data['deleted']['groups'], [self.group.pk])
+
+    def test_old_watermarks_get_a_full_snapshot(self):
+        from events.models import Tombstone
+        from events.sync import purge_tombstones
+        Registration.objects.filter(pk=self.theirs.pk).delete()
+        Tombstone.objects.update(deleted_at=timezone.now() - timedelta(days=60))
+
+        with self.settings(SYNC_TOMBSTONE_RETENTION_DAYS=30):
+            self.assertTrue(self.sync(timezone.now() - timedelta(days=45))['full'])
+            self.assertEqual(purge_tombstones(), 1)
+
+    def test_bad_watermark(self):
+        self.assertEqual(self.client.get('/api/sync/', {'since': 'ayer'}, secure=True).status_code, 400)
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        from events.models import DistributionGroup
+        caches['ratelimit'].clear()
+        self.staff = User.objects.create_user(username='staff', email='staff@example.com', password='x', is_staff=True)
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x')
+        self.event = make_event('Cena', price=12, group=DistributionGroup.objects.create(name='Falla'))
+        self.event.admins.add(self.admin)
+        Registration.objects.create(user=self.admin, event=self.event)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def get(self, url, **params):
+        response = self.client.get(url, params, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_column_fields_match_the_full_representation(self):
+        fields = ['id', 'name', 'date', 'price', 'capacity', 'group', 'group_name', 'is_public']
+        full = self.get('/api/events/')[0]
+
+        sparse = self.get('/api/events/', fields=','.join(fields))[0]
+
+        self.assertEqual(sparse, {name: full[name] for name in fields})
+
+    def test_values_path_reads_no_instances(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            self.get('/api/events/', fields='id,name')
+        sql = [q['sql'] for q in queries]
+        # No other columns selected and no prefetch of the admins (the ETag aggregate joins them, but reads no rows)
+        self.assertFalse(any('"events_event"."description"' in q for q in sql))
+        self.assertFalse(any('"events_event_admins"."event_id" IN' in q for q in sql))
+
+    def test_nested_fields_collapse_unless_expanded(self):
+        collapsed = self.get('/api/events/', fields='id,admins')[0]
+        expanded = self.get('/api/events/', fields='id,admins', expand='admins')[0]
+
+        self.assertEqual(collapsed, {'id': self.event.pk, 'admins': [self.admin.pk]})
+        self.assertEqual(expanded['admins'][0]['username'], 'admin')
+
+    def test_registration_user_is_expandable(self):
+        self.assertEqual(self.get('/api/registrations/', fields='id,user')[0]['user'], self.admin.pk)
+        self.assertEqual(self.get('/api/registrations/', fields='user', expand='user')[0]['user']['id'], self.admin.pk)
+
+    def test_writes_ignore_fields(self):
+        response = self.client.patch(f'/api/events/{self.event.pk}/?fields=id', {'name': 'Comida'}, format='json', secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('name', response.data)
+
+
+class MyTicketsTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+        media = override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+        media.enable()
+        self.addCleanup(media.disable)
+        caches['ratelimit'].clear()
+        self.user = User.objects.create_user(username='socia', email='socia@example.com', password='x')
+        other = User.objects.create_user(username='otra', email='otra@example.com', password='x')
+        self.event = make_event('Paella')
+        self.later = make_event('Mascletà')
+        Event.objects.filter(pk=self.later.pk).update(date=timezone.now() + timedelta(days=5))
+        self.tickets = [Registration.objects.create(user=self.user, event=event) for event in (self.event, self.later)]
+        Registration.objects.create(user=other, event=self.event)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get('/api/registrations/mine/', secure=True, **headers)
+
+    def test_only_own_tickets_with_their_event_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.get()
+
+        self.assertEqual([ticket['id'] for ticket in response.data], [self.tickets[1].pk, self.tickets[0].pk])
+        ticket = response.data[1]
+        self.assertEqual((ticket['event'], ticket['event_name'], ticket['event_location']), (self.event.pk, 'Paella', 'Sala'))
+        self.assertEqual(ticket['short_code'], self.tickets[0].short_code)
+        self.assertTrue(ticket['qr_url'].startswith('https://testserver/'))
+
+    def test_etag_follows_the_events(self):
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(etag).status_code, 304)
+
+        self.event.location = 'Plaza'
+        self.event.save()
+        response = self.get(etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[1]['event_location'], 'Plaza')
+
+    def test_requires_login(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.get().status_code, 401)
+
+
+class TicketPrototypeViewTests(TestCase):
+    def setUp(self):
+        import os
+        import tempfile
+        fd, self.path = tempfile.mkstemp(suffix='.html')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(b'<html><body>Prototipo de entradas</body></html>')
+        self.addCleanup(os.remove, self.path)
+
+    def get(self, **headers):
+        with self.settings(TICKETS_PROTOTYPE_PATH=self.path, FRONTEND_DEV_SERVER_URL=''):
+            return self.client.get('/tickets/', secure=True, **headers)
+
+    def test_prototype_is_served_gzipped_from_memory(self):
+        import gzip
+        response = self.get(HTTP_ACCEPT_ENCODING='gzip, br')
+        with open(self.path, 'wb') as f:
+            f.write(b'changed on disk')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), b'<html><body>Prototipo de entradas</body></html>')
+        self.assertEqual(self.get().content, b'<html><body>Prototipo de entradas</body></html>')
+
+    def test_unchanged_prototype_answers_304(self):
+        etag = self.get()['ETag']
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response['ETag']), (304, etag))
+
+    def test_dev_server_redirect_is_opt_in(self):
+        with self.settings(FRONTEND_DEV_SERVER_URL='http://localhost:3000'):
+            response = self.client.get('/tickets/', secure=True)
+        self.assertRedirects(response, 'http://localhost:3000', fetch_redirect_response=False)
+
+    def test_template_fallback_without_a_prototype(self):
+        with self.settings(TICKETS_PROTOTYPE_PATH=self.path + '.missing', FRONTEND_DEV_SERVER_URL=''):
+            response = self.client.get('/tickets/', secure=True)
+        self.assertTemplateUsed(response, 'events/ticket_list.html')
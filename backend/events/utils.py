@@ -1,4 +1,5 @@
 from io import BytesIO
+from .codes import qr_payload
 
 
 def generate_ticket_pdf_bytes(registration):
@@ -27,6 +28,7 @@ def generate_ticket_pdf_bytes(registration):
     c.drawString(72, height - 130, f'Location: {registration.event.location}')
     c.drawString(72, height - 150, f'Holder: {registration.user.username} ({registration.user.email})')
     c.drawString(72, height - 170, f'Entry code: {registration.entry_code}')
+    c.drawString(72, height - 190, f'Short code: {registration.short_code}')
 
     # Try to get QR image
     img_reader = None
@@ -40,7 +42,7 @@ def generate_ticket_pdf_bytes(registration):
     if not img_reader:
         try:
             import qrcode
-            qr_img = qrcode.make(str(registration.entry_code))
+            qr_img = qrcode.make(qr_payload(registration))
             qr_buf = BytesIO()
             qr_img.save(qr_buf, format='PNG')
             qr_buf.seek(0)
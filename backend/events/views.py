@@ -1,29 +1,59 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.core.mail import EmailMessage, send_mail
 from django.conf import settings
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
 from io import BytesIO
-from django.db import models as dj_models
+import functools
+import hashlib
+from django.db import models as dj_models, transaction
 import logging
 
 from .models import Event, Registration, EmailLog, DistributionGroup, GroupAccessToken, GroupInvitation, AccessRequest, GroupAccessRequest
 from .serializers import EventSerializer, RegistrationSerializer, AccessRequestSerializer, GroupAccessRequestSerializer
 from .permissions import IsEventAdminOrReadOnly
 from .permissions import IsGroupAdminOrCreatorOrEventAdmin
+from .authz import get_authz
+from .hotcache import hot_codes
+from .codes import parse_ticket_code
+from .counters import check_in
+from .live import EventStreamRenderer, attendance_stream, has_listeners, publish_checkin
+from .analytics import BUCKETS, event_analytics
+from .conditional import ConditionalGetMixin, etag_matches, make_etag, not_modified
+from .fieldsets import SparseFieldsViewMixin
+from .rollups import revenue_report
 from .utils import generate_ticket_pdf_bytes
+from evento_app.throttling import TokenBucketThrottle
 
 logger = logging.getLogger('events.email')
 
 
-class EventViewSet(viewsets.ModelViewSet):
+def _report_dates(request):
+    """(since, until) dates from the query string, or a 400 Response."""
+    dates = []
+    for name in ('since', 'until'):
+        value = request.query_params.get(name)
+        parsed = parse_date(value) if value else None
+        if value and parsed is None:
+            return Response({'detail': f'{name} debe tener el formato YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        dates.append(parsed)
+    return dates
+
+
+class EventViewSet(ConditionalGetMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Event.objects.all()
     serializer_class = EventSerializer
     permission_classes = [IsEventAdminOrReadOnly]
+    # group_name and the admins' user data are part of each item
+    etag_aggregates = {'group_updated': dj_models.Max('group__updated_at'), 'admins_updated': dj_models.Max('admins__updated_at')}
 
     def get_queryset(self):
         """
@@ -85,7 +115,25 @@ class EventViewSet(viewsets.ModelViewSet):
         order_by = self.request.query_params.get('order_by', '-date')
         queryset = queryset.order_by(order_by)
         
-        return queryset
+        return queryset.select_related('group').prefetch_related('admins')
+
+    def list(self, request, *args, **kwargs):
+        """ETag-aware; anonymous pages are served from events.listcache."""
+        return self.conditional_list(request, lambda: self._cached_list(request, *args, **kwargs))
+
+    def _cached_list(self, request, *args, **kwargs):
+        from . import listcache
+        if request.user.is_authenticated or not listcache.enabled():
+            return super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+        key = listcache.list_key(request)
+        data = listcache.get_page(key)
+        if data is not None:
+            return Response(data, headers={'X-Cache': 'HIT'})
+        response = super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+        if response.status_code == 200:
+            listcache.set_page(key, response.data)
+            response['X-Cache'] = 'MISS'
+        return response
 
     def perform_create(self, serializer):
         # If the event belongs to a group, check permissions: only group admins/creators or staff can create.
@@ -97,7 +145,7 @@ class EventViewSet(viewsets.ModelViewSet):
             event.admins.add(user)
             # If a group is present, ensure the creator is allowed (group admin/creator)
             if group is not None:
-                if not (user.is_staff or group.admins.filter(pk=user.pk).exists() or group.creators.filter(pk=user.pk).exists()):
+                if not get_authz(self.request).can_manage_group(group):
                     # rollback: remove event and raise permission denied
                     event.delete()
                     from rest_framework.exceptions import PermissionDenied
@@ -161,53 +209,105 @@ class EventViewSet(viewsets.ModelViewSet):
         deleted_count, _ = Registration.objects.filter(event=event, user=u).delete()
         return Response({'detail': f'{deleted_count} registration(s) removed'})
 
+    @action(detail=True, methods=['get'], url_path='live', renderer_classes=[EventStreamRenderer, JSONRenderer])
+    def live(self, request, pk=None):
+        """Server-Sent Events stream of check-ins (counts and latest arrivals) for event admins."""
+        event = self.get_object()
+        if not get_authz(request).can_admin_event(event):
+            return Response({'detail': 'Solo los administradores del evento pueden ver la asistencia en directo.'}, status=status.HTTP_403_FORBIDDEN)
+        response = StreamingHttpResponse(attendance_stream(event.pk), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # stop nginx-style proxies from buffering the stream
+        return response
+
+    @action(detail=True, methods=['get'], url_path='revenue')
+    def revenue(self, request, pk=None):
+        """Daily revenue of the event from the DailyRevenue rollup. Query params: since, until (YYYY-MM-DD)."""
+        event = self.get_object()
+        if not get_authz(request).can_admin_event(event):
+            return Response({'detail': 'Solo los administradores del evento pueden ver sus ingresos.'}, status=status.HTTP_403_FORBIDDEN)
+        dates = _report_dates(request)
+        if isinstance(dates, Response):
+            return dates
+        return Response(revenue_report([event.pk], *dates))
+
+    @action(detail=True, methods=['get', 'post'], url_path='cancel')
+    def cancel(self, request, pk=None):
+        """POST cancels the event and refunds every payment; GET shows the refund progress.
+
+        Refunds are made by the `run_refund_jobs` worker in chunks and the
+        notification emails go through the outbox (`send_queued_emails`).
+        Posting again on a cancelled event resumes or retries the refund.
+        """
+        from .models import RefundJob
+        from .refunds import request_event_refund
+        from .serializers import RefundJobSerializer
+        event = self.get_object()
+        if not get_authz(request).can_manage_event(event):
+            return Response({'detail': 'Solo los administradores del evento pueden cancelarlo.'}, status=status.HTTP_403_FORBIDDEN)
+        if request.method == 'GET':
+            job = RefundJob.objects.filter(event=event).first()
+            if job is None:
+                return Response({'detail': 'El evento no tiene reembolsos.'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(RefundJobSerializer(job).data)
+        job, created = request_event_refund(event, request.user)
+        return Response(RefundJobSerializer(job).data, status=status.HTTP_200_OK if job.status == 'done' else status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'], url_path='analytics')
+    def analytics(self, request, pk=None):
+        """Arrivals per time bucket, peak gate load and no-show rate per attendee type.
+
+        Query param: bucket=minute|hour|day (default minute).
+        """
+        event = self.get_object()
+        if not get_authz(request).can_admin_event(event):
+            return Response({'detail': 'Solo los administradores del evento pueden ver las estadísticas.'}, status=status.HTTP_403_FORBIDDEN)
+        bucket = request.query_params.get('bucket', 'minute')
+        if bucket not in BUCKETS:
+            return Response({'detail': f'bucket debe ser uno de: {", ".join(BUCKETS)}'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(event_analytics(event, bucket))
+
     @action(detail=True, methods=['get'], url_path='export_registrations')
     def export_registrations(self, request, pk=None):
-        """Export registrations to CSV"""
+        """Stream the registrations of this event as CSV or XLSX.
+
+        Query params:
+        - `file_format`: `csv` (default) or `xlsx`
+        - `columns`: comma separated column keys (see `REGISTRATION_EXPORT_COLUMNS`)
+        - `used`: `true` / `false` to export only used or unused tickets
+        - `attendee_type`: comma separated attendee types (`member`, `guest`, `child`)
+        """
         event = self.get_object()
-        
+
         # Check permissions
         user = request.user
-        is_admin = user.is_staff or event.admins.filter(pk=user.pk).exists()
+        is_admin = user.is_staff or get_authz(request).is_event_admin(event)
         if not is_admin:
              return Response({'detail': 'No tienes permisos para exportar.'}, status=status.HTTP_403_FORBIDDEN)
-             
-        import csv
-        from django.http import HttpResponse
-        
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="participantes_{event.id}.csv"'
-        response.write(u'\ufeff'.encode('utf8')) # BOM for Excel to open UTF-8 correctly
-        
-        writer = csv.writer(response)
-        writer.writerow(['ID', 'Usuario (Cuenta)', 'Email', 'Teléfono', 'Asistente (Nombre)', 'Tipo', 'Usado', 'Código'])
-        
-        registrations = Registration.objects.filter(event=event).select_related('user')
-        
-        for reg in registrations:
-            # Determine attendee name
-            attendee_name = reg.get_attendee_name()
-            
-            # Determine attendee type label
-            type_map = {'member': 'Fallero', 'guest': 'Invitado', 'child': 'Niño'}
-            type_label = type_map.get(reg.attendee_type, reg.attendee_type)
-            
-            # User info
-            user_full_name = reg.user.get_full_name() or reg.user.username
-            user_email = reg.user.email
-            user_phone = getattr(reg.user, 'phone', '')
-            
-            writer.writerow([
-                reg.id,
-                user_full_name,
-                user_email,
-                user_phone,
-                attendee_name,
-                type_label,
-                'Sí' if reg.used else 'No',
-                str(reg.entry_code)
-            ])
-            
+
+        from .exports import EXPORT_FORMATS, REGISTRATION_EXPORT_COLUMNS, DEFAULT_REGISTRATION_COLUMNS
+        from .exports import resolve_columns, registration_export_rows
+
+        file_format = request.query_params.get('file_format', 'csv').lower()
+        if file_format not in EXPORT_FORMATS:
+            return Response({'detail': f'Formato no soportado: {file_format}'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            columns = resolve_columns(request.query_params.get('columns'), REGISTRATION_EXPORT_COLUMNS, DEFAULT_REGISTRATION_COLUMNS)
+        except ValueError as e:
+            return Response({'detail': f'Columnas desconocidas: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        registrations = Registration.objects.filter(event=event)
+        used = request.query_params.get('used')
+        if used in ('true', 'false'):
+            registrations = registrations.filter(used=(used == 'true'))
+        attendee_type = request.query_params.get('attendee_type')
+        if attendee_type:
+            registrations = registrations.filter(attendee_type__in=attendee_type.split(','))
+
+        writer, content_type = EXPORT_FORMATS[file_format]
+        header = [REGISTRATION_EXPORT_COLUMNS[key][0] for key in columns]
+        response = StreamingHttpResponse(writer(header, registration_export_rows(registrations, columns)), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="participantes_{event.id}.{file_format}"'
         return response
 
     @action(detail=True, methods=['post'], url_path='request_access', permission_classes=[permissions.IsAuthenticated])
@@ -338,6 +438,25 @@ EventoApp
         serializer = AccessRequestSerializer(access_request)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['post'], url_path='bulk_review_access')
+    def bulk_review_access(self, request, pk=None):
+        """Approve or reject many access requests at once.
+
+        Body: `decision` ('approve' | 'reject'), `request_ids` or `all_pending=true`
+        (optionally `requested_before`), `admin_notes`. Approvals stop at the
+        event's free places; the rest stay pending and are listed in `left_pending`.
+        """
+        from .reviews import review_event_requests, select_requests
+        event = self.get_object()
+        decision = request.data.get('decision')
+        if decision not in ('approve', 'reject'):
+            return Response({'detail': "decision debe ser 'approve' o 'reject'"}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = select_requests(AccessRequest.objects.all(), request.data)
+        if isinstance(queryset, str):
+            return Response({'detail': queryset}, status=status.HTTP_400_BAD_REQUEST)
+        report = review_event_requests(event, queryset, decision == 'approve', request.user, request.data.get('admin_notes', ''))
+        return Response(report)
+
     @action(detail=True, methods=['post'], url_path='reject_access')
     def reject_access(self, request, pk=None):
         """Rechazar una solicitud de acceso"""
@@ -395,11 +514,13 @@ EventoApp
         return Response(serializer.data)
 
 
-class DistributionGroupViewSet(viewsets.ModelViewSet):
+class DistributionGroupViewSet(ConditionalGetMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = DistributionGroup.objects.all()
     # read/list allowed for authenticated, modification restricted by IsGroupOrEventAdmin
     from .permissions import IsGroupOrEventAdmin
     permission_classes = [IsGroupOrEventAdmin]
+    # Set per action for TokenBucketThrottle (see evento_app.throttling)
+    throttle_scope = None
 
     def get_serializer_class(self):
         from .serializers import DistributionGroupSerializer
@@ -500,6 +621,66 @@ class DistributionGroupViewSet(viewsets.ModelViewSet):
         group.admins.remove(u)
         return Response({'detail': 'admin removed'})
 
+    BULK_RELATIONS = ('members', 'admins', 'creators', 'events')
+
+    def _bulk_membership(self, request, op):
+        """Shared implementation of bulk_add / bulk_remove / bulk_replace.
+
+        Body: `{"relation": "members" | "admins" | "creators" | "events", "ids": [...]}`.
+        Current membership is read once and changes are applied with a single
+        insert/delete on the through table.
+        """
+        group = self.get_object()
+        relation = request.data.get('relation', 'members')
+        if relation not in self.BULK_RELATIONS:
+            return Response({'detail': f'relation debe ser uno de: {", ".join(self.BULK_RELATIONS)}'}, status=status.HTTP_400_BAD_REQUEST)
+        ids = request.data.get('ids')
+        if not isinstance(ids, list):
+            return Response({'detail': 'ids debe ser una lista'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = {int(pk) for pk in ids}
+        except (TypeError, ValueError):
+            return Response({'detail': 'ids debe contener solo IDs numéricos'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if relation == 'events':
+            target_model = Event
+        else:
+            from users.models import User as UserModel
+            target_model = UserModel
+        found = set(target_model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        not_found = sorted(ids - found)
+        if not_found:
+            return Response({'detail': 'Algunos IDs no existen', 'not_found': not_found}, status=status.HTTP_400_BAD_REQUEST)
+
+        from django.db import transaction
+        from .bulk import bulk_add_m2m, bulk_remove_m2m, bulk_replace_m2m
+        added, removed = set(), set()
+        with transaction.atomic():
+            if op == 'add':
+                added = bulk_add_m2m(group, relation, ids)
+            elif op == 'remove':
+                removed = bulk_remove_m2m(group, relation, ids)
+            else:
+                added, removed = bulk_replace_m2m(group, relation, ids)
+        return Response({
+            'relation': relation,
+            'added': sorted(added),
+            'removed': sorted(removed),
+            'count': getattr(group, relation).count(),
+        })
+
+    @action(detail=True, methods=['post'], url_path='bulk_add')
+    def bulk_add(self, request, pk=None):
+        return self._bulk_membership(request, 'add')
+
+    @action(detail=True, methods=['post'], url_path='bulk_remove')
+    def bulk_remove(self, request, pk=None):
+        return self._bulk_membership(request, 'remove')
+
+    @action(detail=True, methods=['post'], url_path='bulk_replace')
+    def bulk_replace(self, request, pk=None):
+        return self._bulk_membership(request, 'replace')
+
     @action(detail=True, methods=['post'], url_path='join', permission_classes=[permissions.IsAuthenticated])
     def join_group(self, request, pk=None):
         """Join a group (public groups) or request access (private groups)"""
@@ -507,7 +688,7 @@ class DistributionGroupViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Check if user is already a member
-        if group.members.filter(pk=user.pk).exists():
+        if get_authz(request).is_group_member(group):
             return Response({'detail': 'Already a member'}, status=status.HTTP_400_BAD_REQUEST)
         
         # If group is public, add user immediately
@@ -550,7 +731,7 @@ class DistributionGroupViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Check if user is a member
-        if not group.members.filter(pk=user.pk).exists():
+        if not get_authz(request).is_group_member(group):
             return Response({'detail': 'Not a member'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Remove user from group
@@ -563,7 +744,7 @@ class DistributionGroupViewSet(viewsets.ModelViewSet):
         group = self.get_object()
         # Only admins/creators can create invitations
         user = request.user
-        if not (user.is_staff or group.admins.filter(pk=user.pk).exists() or group.creators.filter(pk=user.pk).exists()):
+        if not get_authz(request).can_manage_group(group):
             return Response({'detail': 'Only group admins can create invitations'}, status=status.HTTP_403_FORBIDDEN)
         
         # Get optional parameters
@@ -615,7 +796,7 @@ class DistributionGroupViewSet(viewsets.ModelViewSet):
         group = invitation.group
         
         # Check if user is already a member
-        if group.members.filter(pk=user.pk).exists():
+        if get_authz(request).is_group_member(group):
             return Response({'detail': 'You are already a member of this group'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Add user to members
@@ -638,7 +819,7 @@ class DistributionGroupViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Only admins/creators can view invitations
-        if not (user.is_staff or group.admins.filter(pk=user.pk).exists() or group.creators.filter(pk=user.pk).exists()):
+        if not get_authz(request).can_manage_group(group):
             return Response({'detail': 'Only group admins can view invitations'}, status=status.HTTP_403_FORBIDDEN)
         
         invitations = group.invitations.filter(active=True).order_by('-created_at')
@@ -661,7 +842,8 @@ class DistributionGroupViewSet(viewsets.ModelViewSet):
         
         return Response(invitation_data)
 
-    @action(detail=False, methods=['get'], url_path='invitation-info/(?P<token>[^/.]+)', permission_classes=[permissions.AllowAny])
+    @action(detail=False, methods=['get'], url_path='invitation-info/(?P<token>[^/.]+)', permission_classes=[permissions.AllowAny],
+            throttle_classes=[TokenBucketThrottle], throttle_scope='invitation_info')
     def invitation_info(self, request, token=None):
         """Get invitation details (public endpoint for preview)"""
         try:
@@ -688,7 +870,7 @@ class DistributionGroupViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Check if user is already a member
-        if group.members.filter(pk=user.pk).exists():
+        if get_authz(request).is_group_member(group):
             return Response({'detail': 'Ya eres miembro de este grupo'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Check if there's already a pending request
@@ -737,7 +919,7 @@ class DistributionGroupViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Only admins can view access requests
-        if not (user.is_staff or group.admins.filter(pk=user.pk).exists()):
+        if not (user.is_staff or get_authz(request).is_group_admin(group)):
             return Response({'detail': 'Solo los administradores pueden ver las solicitudes'}, status=status.HTTP_403_FORBIDDEN)
         
         requests = group.access_requests.all()
@@ -751,7 +933,7 @@ class DistributionGroupViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Only admins can approve
-        if not (user.is_staff or group.admins.filter(pk=user.pk).exists()):
+        if not (user.is_staff or get_authz(request).is_group_admin(group)):
             return Response({'detail': 'Solo los administradores pueden aprobar solicitudes'}, status=status.HTTP_403_FORBIDDEN)
         
         request_id = request.data.get('request_id')
@@ -787,6 +969,26 @@ class DistributionGroupViewSet(viewsets.ModelViewSet):
         serializer = GroupAccessRequestSerializer(access_request, context={'request': request})
         return Response(serializer.data)
 
+    @action(detail=True, methods=['post'], url_path='bulk_review_access')
+    def bulk_review_group_access(self, request, pk=None):
+        """Approve or reject many group access requests at once.
+
+        Body: `decision` ('approve' | 'reject'), `request_ids` or `all_pending=true`
+        (optionally `requested_before`), `admin_notes`.
+        """
+        from .reviews import review_group_requests, select_requests
+        group = self.get_object()
+        if not (request.user.is_staff or get_authz(request).is_group_admin(group)):
+            return Response({'detail': 'Solo los administradores pueden revisar solicitudes'}, status=status.HTTP_403_FORBIDDEN)
+        decision = request.data.get('decision')
+        if decision not in ('approve', 'reject'):
+            return Response({'detail': "decision debe ser 'approve' o 'reject'"}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = select_requests(GroupAccessRequest.objects.all(), request.data)
+        if isinstance(queryset, str):
+            return Response({'detail': queryset}, status=status.HTTP_400_BAD_REQUEST)
+        report = review_group_requests(group, queryset, decision == 'approve', request.user, request.data.get('admin_notes', ''))
+        return Response(report)
+
     @action(detail=True, methods=['post'], url_path='reject_access')
     def reject_group_access(self, request, pk=None):
         """Rechazar solicitud de acceso al grupo"""
@@ -794,7 +996,7 @@ class DistributionGroupViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Only admins can reject
-        if not (user.is_staff or group.admins.filter(pk=user.pk).exists()):
+        if not (user.is_staff or get_authz(request).is_group_admin(group)):
             return Response({'detail': 'Solo los administradores pueden rechazar solicitudes'}, status=status.HTTP_403_FORBIDDEN)
         
         request_id = request.data.get('request_id')
@@ -833,6 +1035,89 @@ class DistributionGroupViewSet(viewsets.ModelViewSet):
         serializer = GroupAccessRequestSerializer(access_request, context={'request': request})
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'], url_path='revenue')
+    def revenue(self, request, pk=None):
+        """Daily revenue of the group's events from the DailyRevenue rollup.
+
+        Query params: since, until (YYYY-MM-DD).
+        """
+        group = self.get_object()
+        if not (request.user.is_staff or get_authz(request).is_group_admin(group)):
+            return Response({'detail': 'Solo los administradores pueden ver los ingresos del grupo'}, status=status.HTTP_403_FORBIDDEN)
+        dates = _report_dates(request)
+        if isinstance(dates, Response):
+            return dates
+        from .reports import group_report_events
+        event_ids = list(group_report_events(group).values_list('id', flat=True))
+        return Response(revenue_report(event_ids, *dates))
+
+    @action(detail=True, methods=['post'], url_path='export_report')
+    def export_report(self, request, pk=None):
+        """Request a report covering all events of the group (or `event_ids`).
+
+        The report is built by the `run_export_jobs` worker; poll the returned
+        job at `/api/export-jobs/<id>/` for progress and the download link.
+        Identical requests reuse the active job, or the last finished one while
+        the underlying data has not changed.
+        """
+        group = self.get_object()
+        user = request.user
+        if not (user.is_staff or get_authz(request).is_group_admin(group)):
+            return Response({'detail': 'Solo los administradores pueden exportar informes del grupo'}, status=status.HTTP_403_FORBIDDEN)
+
+        file_format = request.data.get('file_format', 'xlsx')
+        if file_format not in dict(ExportJob.FORMAT_CHOICES):
+            return Response({'detail': f'Formato no soportado: {file_format}'}, status=status.HTTP_400_BAD_REQUEST)
+        event_ids = request.data.get('event_ids') or []
+        try:
+            event_ids = [int(pk) for pk in event_ids]
+        except (TypeError, ValueError):
+            return Response({'detail': 'event_ids debe ser una lista de IDs'}, status=status.HTTP_400_BAD_REQUEST)
+
+        from .reports import request_group_report
+        from .serializers import ExportJobSerializer
+        job, created = request_group_report(group, user, event_ids, file_format)
+        serializer = ExportJobSerializer(job, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_200_OK if job.status == 'done' else status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['post'], url_path='import_attendees')
+    def import_attendees(self, request, pk=None):
+        """Import attendees from a CSV file (`file`) into the group.
+
+        Columns: email, first_name, last_name, attendee_type, alias, event_id.
+        Rows without `event_id` get a registration for each of `event_ids`
+        (comma separated); with neither, users are only added as members.
+        Use `dry_run=true` to only validate and `skip_invalid=true` to import the
+        valid rows even if others have errors.
+        """
+        group = self.get_object()
+        user = request.user
+        if not get_authz(request).can_manage_group(group):
+            return Response({'detail': 'Solo los administradores pueden importar asistentes'}, status=status.HTTP_403_FORBIDDEN)
+
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({'detail': 'file es requerido'}, status=status.HTTP_400_BAD_REQUEST)
+        raw_event_ids = request.data.get('event_ids') or ''
+        try:
+            event_ids = [int(pk) for pk in str(raw_event_ids).split(',') if pk.strip()]
+        except ValueError:
+            return Response({'detail': 'event_ids debe ser una lista de IDs separada por comas'}, status=status.HTTP_400_BAD_REQUEST)
+
+        from .importers import read_attendee_csv, import_attendees
+        try:
+            rows = read_attendee_csv(upload)
+        except UnicodeDecodeError:
+            return Response({'detail': 'El fichero debe estar codificado en UTF-8'}, status=status.HTTP_400_BAD_REQUEST)
+        report = import_attendees(
+            group, rows, event_ids,
+            dry_run=str(request.data.get('dry_run', '')).lower() == 'true',
+            skip_invalid=str(request.data.get('skip_invalid', '')).lower() == 'true',
+        )
+        if report['errors'] and not report['imported']:
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report)
+
     @action(detail=True, methods=['post'], url_path='remove_creator')
     def remove_creator(self, request, pk=None):
         group = self.get_object()
@@ -861,17 +1146,21 @@ class DistributionGroupViewSet(viewsets.ModelViewSet):
         return Response({'detail': 'event removed'})
 
 
-class RegistrationViewSet(viewsets.ModelViewSet):
+class RegistrationViewSet(ConditionalGetMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Registration.objects.all()
     serializer_class = RegistrationSerializer
     permission_classes = [IsEventAdminOrReadOnly]
+    # Set per action for TokenBucketThrottle (see evento_app.throttling)
+    throttle_scope = None
+    # The user is embedded in each item
+    etag_aggregates = {'user_updated': dj_models.Max('user__updated_at')}
 
     def get_queryset(self):
         user = self.request.user
         if user.is_staff:
-            return Registration.objects.all()
+            return Registration.objects.select_related('user')
         # Users see their own registrations or registrations for events they administer
-        return Registration.objects.filter(dj_models.Q(user=user) | dj_models.Q(event__admins=user)).distinct()
+        return Registration.objects.filter(dj_models.Q(user=user) | dj_models.Q(event__admins=user)).distinct().select_related('user')
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data, context={'request': request})
@@ -883,6 +1172,10 @@ class RegistrationViewSet(viewsets.ModelViewSet):
         if event_id:
             event = Event.objects.filter(pk=event_id.pk).first()
             if event:
+                if event.cancelled_at:
+                    from rest_framework.exceptions import ValidationError
+                    raise ValidationError({'detail': 'Este evento ha sido cancelado.'})
+
                 # Check registration deadline
                 if event.registration_deadline and timezone.now() > event.registration_deadline:
                     from rest_framework.exceptions import ValidationError
@@ -890,43 +1183,30 @@ class RegistrationViewSet(viewsets.ModelViewSet):
 
                 # Check max_qr_codes limit
                 if event.max_qr_codes:
-                    current_count = Registration.objects.filter(event=event).count()
-                    if current_count >= event.max_qr_codes:
+                    if event.registered_count >= event.max_qr_codes:
                         from rest_framework.exceptions import ValidationError
                         raise ValidationError({'detail': f'Límite de registros alcanzado. Este evento solo permite {event.max_qr_codes} registros/QR.'})
         
         # Check if event has a price and process payment
         user = request.user
         if event and event.price > 0:
+            from .ledger import InsufficientFunds, post_transaction
             # Get or create user's wallet
             wallet, created = Wallet.objects.get_or_create(user=user)
-            
-            # Check if user has sufficient balance
-            if wallet.balance < event.price:
+
+            # Charge the ledger and create the registration together
+            try:
+                with transaction.atomic():
+                    post_transaction(wallet, -event.price, 'payment', description=f'Pago por entrada a {event.name}', event=event)
+                    self.perform_create(serializer)
+            except InsufficientFunds as exc:
                 from rest_framework.exceptions import ValidationError
                 raise ValidationError({
-                    'detail': f'Saldo insuficiente. Necesitas {event.price} {wallet.currency} pero solo tienes {wallet.balance} {wallet.currency}.',
+                    'detail': f'Saldo insuficiente. Necesitas {event.price} {wallet.currency} pero solo tienes {exc.balance} {wallet.currency}.',
                     'required': float(event.price),
-                    'available': float(wallet.balance)
+                    'available': float(exc.balance)
                 })
-            
-            # Deduct payment from wallet
-            wallet.balance -= event.price
-            wallet.save()
-            
-            # Create registration
-            self.perform_create(serializer)
             registration = serializer.instance
-            
-            # Create transaction record
-            Transaction.objects.create(
-                wallet=wallet,
-                amount=-event.price,
-                transaction_type='payment',
-                description=f'Pago por entrada a {event.name}',
-                event=event,
-                balance_after=wallet.balance
-            )
         else:
             # Free event, just create registration
             self.perform_create(serializer)
@@ -982,6 +1262,25 @@ class RegistrationViewSet(viewsets.ModelViewSet):
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
+    @action(detail=False, methods=['get'], url_path='mine', permission_classes=[permissions.IsAuthenticated])
+    def mine(self, request):
+        """The caller's own tickets with their event inline, in one query on the indexed user_id.
+
+        Supports If-None-Match: the ETag covers every ticket and its event, so
+        an unchanged list answers 304 without serializing (or rendering QRs).
+        """
+        from .serializers import MyTicketSerializer
+        registrations = list(Registration.objects.filter(user_id=request.user.pk).select_related('event')
+                             .order_by('-event__date', 'id'))
+        etag = make_etag('mine', request.user.pk, [
+            (registration.pk, registration.updated_at.isoformat(), registration.event.updated_at.isoformat())
+            for registration in registrations
+        ])
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        serializer = MyTicketSerializer(registrations, many=True, context={'request': request})
+        return Response(serializer.data, headers={'ETag': etag})
+
     @action(detail=True, methods=['get'], url_path='download_ticket')
     def download_ticket(self, request, pk=None):
         """Generate a PDF ticket with embedded QR code for this registration."""
@@ -990,7 +1289,7 @@ class RegistrationViewSet(viewsets.ModelViewSet):
         # Permission: allow owner, event admin or staff
         user = request.user
         event = registration.event
-        is_admin = user.is_staff or event.admins.filter(pk=user.pk).exists()
+        is_admin = user.is_staff or get_authz(request).is_event_admin(event)
         filename = f'ticket_{registration.entry_code}.pdf'
         response = HttpResponse(pdf_bytes, content_type='application/pdf')
         response['Content-Disposition'] = f'inline; filename="{filename}"'
@@ -1013,10 +1312,7 @@ class RegistrationViewSet(viewsets.ModelViewSet):
             
         # Check permissions (Event admin or Group admin)
         user = request.user
-        is_event_admin = event.admins.filter(pk=user.pk).exists()
-        is_group_admin = event.group and event.group.admins.filter(pk=user.pk).exists()
-        
-        if not (user.is_staff or is_event_admin or is_group_admin):
+        if not get_authz(request).can_admin_event(event):
             return Response({'detail': 'No permission to issue tickets for this event'}, status=status.HTTP_403_FORBIDDEN)
             
         from users.models import User as UserModel
@@ -1042,27 +1338,63 @@ class RegistrationViewSet(viewsets.ModelViewSet):
             'id': reg.id
         }, status=status.HTTP_201_CREATED)
 
-    @action(detail=False, methods=['post'], url_path='validate_qr', permission_classes=[permissions.IsAuthenticated])
+    @action(detail=False, methods=['post'], url_path='validate_qr', permission_classes=[permissions.IsAuthenticated],
+            throttle_classes=[TokenBucketThrottle], throttle_scope='validate_qr')
     def verify_qr_scan(self, request):
+        """Check in a scanned QR or a typed code. `event_id` (optional) narrows the lookup to one event.
+
+        `qr_content` may be the UUID entry code (or a URL ending in it), the
+        QR payload `<event id>-<short code>` or a bare short code; a bare short
+        code that exists in several events needs `event_id`. Codes of live
+        events are answered from the worker's memory (see events.hotcache);
+        with `event_id` of a live event, unknown codes are rejected without a
+        database query.
+        """
         qr_content = request.data.get('qr_content')
         if not qr_content:
             return Response({'valid': False, 'message': 'No QR content provided.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Assuming qr_content is the UUID string
+        event_id = request.data.get('event_id')
+        if event_id not in (None, ''):
+            try:
+                event_id = int(event_id)
+            except (TypeError, ValueError):
+                return Response({'valid': False, 'message': 'event_id inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            event_id = None
+
+        parsed = parse_ticket_code(qr_content)
+        if parsed is None:
+            return Response({'valid': False, 'message': 'Código QR no encontrado en el sistema.'}, status=status.HTTP_404_NOT_FOUND)
+        kind, code, code_event_id = parsed
+        if code_event_id is not None:
+            if event_id is not None and event_id != code_event_id:
+                return Response({'valid': False, 'message': 'Esta entrada es de otro evento.'}, status=status.HTTP_400_BAD_REQUEST)
+            event_id = code_event_id
+
+        if event_id is not None:
+            # An event that is not live is checked in the database, never against other live events
+            live_event = hot_codes.get_event(event_id)
+            hit = hot_codes.lookup(kind, code, event_id=event_id) if live_event is not None else None
+        else:
+            hit = hot_codes.lookup(kind, code)
+            live_event = hot_codes.get_event(hit.event_id) if hit is not None else None
+        if hit is not None and event_id is not None and hit.event_id != event_id:
+            hit = None
+        if live_event is not None:
+            return self._verify_live_scan(request, hit, live_event)
+
         try:
-            # Try to match the UUID directly
-            registration = Registration.objects.filter(entry_code=qr_content).first()
-            if not registration:
-                # If content is a URL, try to extract UUID (rudimentary check)
-                import uuid
-                try:
-                    # Look for uuid pattern
-                    parts = qr_content.split('/')
-                    possible_id = parts[-1]
-                    uuid.UUID(possible_id) # validates format
-                    registration = Registration.objects.filter(entry_code=possible_id).first()
-                except ValueError:
-                    pass
+            if kind == 'uuid':
+                candidates = Registration.objects.filter(entry_code=code)
+            else:
+                candidates = Registration.objects.filter(short_code=code)
+            if event_id is not None:
+                candidates = candidates.filter(event_id=event_id)
+            candidates = list(candidates.select_related('event', 'user')[:2])
+            if len(candidates) > 1:
+                return Response({'valid': False, 'message': 'Código corto presente en varios eventos: indica el evento.'}, status=status.HTTP_400_BAD_REQUEST)
+            registration = candidates[0] if candidates else None
 
             if not registration:
                 return Response({'valid': False, 'message': 'Código QR no encontrado en el sistema.'}, status=status.HTTP_404_NOT_FOUND)
@@ -1071,15 +1403,7 @@ class RegistrationViewSet(viewsets.ModelViewSet):
             user = request.user
             event = registration.event
             
-            is_event_admin = event.admins.filter(pk=user.pk).exists()
-            # Check if user is admin of the group related to the event
-            is_group_admin = False
-            if event.group:
-                is_group_admin = event.group.admins.filter(pk=user.pk).exists()
-            
-            is_admin = user.is_staff or is_event_admin or is_group_admin
-            
-            if not is_admin:
+            if not get_authz(request).can_admin_event(event):
                  return Response({'valid': False, 'message': 'No tienes permisos de administrador para este evento.'}, status=status.HTTP_403_FORBIDDEN)
 
             # Check usage
@@ -1093,12 +1417,22 @@ class RegistrationViewSet(viewsets.ModelViewSet):
                     'attended_at': registration.attended_at
                 })
 
-            # Mark as used
-            registration.used = True
-            registration.attended_at = timezone.now()
-            registration.save()
+            # Mark as used; a concurrent scan of the same code may have won the race
+            now = timezone.now()
+            if not check_in(registration.pk, event.pk, now):
+                registration.refresh_from_db(fields=['used', 'attended_at'])
+                return Response({
+                    'valid': False,
+                    'message': f'QR YA UTILIZADO anteriormente.',
+                    'attendee': registration.get_attendee_name(),
+                    'event': event.name,
+                    'attended_at': registration.attended_at
+                })
+            registration.used, registration.attended_at = True, now
             
             attendee_name = registration.get_attendee_name()
+            if has_listeners(event.pk):
+                publish_checkin(event.pk, registration.pk, attendee_name, registration.attendee_type, now)
             return Response({
                 'valid': True, 
                 'message': 'Entrada Válida. Acceso permitido.', 
@@ -1109,7 +1443,43 @@ class RegistrationViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({'valid': False, 'message': f'Error validando: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    @action(detail=True, methods=['post'], url_path='validate_qr')
+    def _verify_live_scan(self, request, hit, event):
+        """verify_qr_scan for a live event: only a first check-in touches the database."""
+        if hit is None:
+            return Response({'valid': False, 'message': 'Código QR no encontrado en el sistema.'}, status=status.HTTP_404_NOT_FOUND)
+
+        authz = get_authz(request)
+        if not (authz.is_staff or authz.is_event_admin(event.id) or authz.is_group_admin(event.group_id)):
+            return Response({'valid': False, 'message': 'No tienes permisos de administrador para este evento.'}, status=status.HTTP_403_FORBIDDEN)
+
+        if not hit.used:
+            now = timezone.now()
+            if check_in(hit.registration_id, event.id, now):
+                hot_codes.mark_used(hit, now)
+                publish_checkin(event.id, hit.registration_id, hit.attendee, hit.attendee_type, now)
+                return Response({
+                    'valid': True,
+                    'message': 'Entrada Válida. Acceso permitido.',
+                    'attendee': hit.attendee,
+                    'event': event.name
+                })
+            # Checked in through another worker since our last reload
+            row = Registration.objects.filter(pk=hit.registration_id).values('attended_at').first()
+            if row is None:
+                return Response({'valid': False, 'message': 'Código QR no encontrado en el sistema.'}, status=status.HTTP_404_NOT_FOUND)
+            hit = hit._replace(attended_at=row['attended_at'])
+            hot_codes.mark_used(hit, hit.attended_at)
+
+        return Response({
+            'valid': False,
+            'message': 'QR YA UTILIZADO anteriormente.',
+            'attendee': hit.attendee,
+            'event': event.name,
+            'attended_at': hit.attended_at
+        })
+
+    @action(detail=True, methods=['post'], url_path='validate_qr',
+            throttle_classes=[TokenBucketThrottle], throttle_scope='validate_qr')
     def validate_qr(self, request, pk=None):
         """Mark a registration as used when QR is scanned by an admin."""
         registration = self.get_object()
@@ -1117,26 +1487,29 @@ class RegistrationViewSet(viewsets.ModelViewSet):
         event = registration.event
         
         # Check if event belongs to a group and user is admin of that group
-        if event.group:
-            is_group_admin = event.group.admins.filter(pk=user.pk).exists()
-            is_event_admin = event.admins.filter(pk=user.pk).exists()
-            if not (user.is_staff or is_group_admin or is_event_admin):
+        authz = get_authz(request)
+        if event.group_id:
+            if not authz.can_admin_event(event):
                 return Response({'detail': 'Solo admins del grupo pueden validar QR.'}, status=status.HTTP_403_FORBIDDEN)
         else:
             # Event not in group, check event admin
-            is_admin = user.is_staff or event.admins.filter(pk=user.pk).exists()
-            if not is_admin:
+            if not (user.is_staff or authz.is_event_admin(event)):
                 return Response({'detail': 'No tienes permisos para validar este QR.'}, status=status.HTTP_403_FORBIDDEN)
         
-        if registration.used:
+        now = timezone.now()
+        # Conditional update: a concurrent scan of the same code counts only once
+        if registration.used or not check_in(registration.pk, event.pk, now):
+            if not registration.used:
+                registration.refresh_from_db(fields=['used', 'attended_at', 'updated_at'])
             return Response({
                 'detail': 'Este QR ya fue usado anteriormente.',
                 'already_used': True,
                 'registration': RegistrationSerializer(registration).data
             }, status=status.HTTP_200_OK)
         
-        registration.used = True
-        registration.save()
+        registration.used, registration.attended_at, registration.updated_at = True, now, now
+        if has_listeners(event.pk):
+            publish_checkin(event.pk, registration.pk, registration.get_attendee_name(), registration.attendee_type, now)
         
         return Response({
             'detail': 'QR validado exitosamente.',
@@ -1168,7 +1541,7 @@ class GroupAccessTokenViewSet(viewsets.ModelViewSet):
         token = self.get_object()
         # permission: owner, group admin/creator, staff
         user = request.user
-        if not (user.is_staff or token.user == user or token.group.admins.filter(pk=user.pk).exists() or token.group.creators.filter(pk=user.pk).exists()):
+        if not (token.user_id == user.pk or get_authz(request).can_manage_group(token.group_id)):
             return Response({'detail': 'No permission to access this token'}, status=status.HTTP_403_FORBIDDEN)
         if token.qr_code and hasattr(token.qr_code, 'path'):
             with open(token.qr_code.path, 'rb') as f:
@@ -1179,40 +1552,47 @@ class GroupAccessTokenViewSet(viewsets.ModelViewSet):
         return Response({'detail': 'No QR available'}, status=status.HTTP_404_NOT_FOUND)
 
 
+@functools.lru_cache(maxsize=None)
+def _prototype_page(path):
+    """(html, gzipped html, etag) of the static prototype, read once per process; None if missing."""
+    try:
+        with open(path, 'rb') as f:
+            content = f.read()
+    except OSError:
+        return None
+    return content, compress_string(content), make_etag('prototype', hashlib.sha1(content).hexdigest())
+
+
 def ticket_list_view(request):
-    """Smart redirect: if React dev server responds on localhost:3000, redirect there;
-    otherwise render the Django template as a fallback.
+    """Landing page for /tickets/.
+
+    Redirects to FRONTEND_DEV_SERVER_URL when configured (local React
+    development); otherwise serves the static prototype from memory, with
+    ETag and gzip; and if there is none, the Django template fallback.
     """
-    # try to detect React dev server
-    try:
-        from urllib.request import urlopen
-        resp = urlopen('http://localhost:3000', timeout=1)
-        if resp.status == 200:
-            return redirect('http://localhost:3000')
-    except Exception:
-        # dev server not available; render Django fallback
-        pass
-
-    # Serve the static prototype index.html from the repository to avoid CORS/network issues.
-    # Prototype path: ../frontend_web/prototype/index.html (relative to backend BASE_DIR)
-    try:
-        import os
-        from django.conf import settings
-        prototype_path = os.path.normpath(os.path.join(str(settings.BASE_DIR), '..', 'frontend_web', 'prototype', 'index.html'))
-        if os.path.exists(prototype_path):
-            with open(prototype_path, 'rb') as f:
-                content = f.read()
-            return HttpResponse(content, content_type='text/html')
-    except Exception:
-        pass
+    if settings.FRONTEND_DEV_SERVER_URL:
+        return redirect(settings.FRONTEND_DEV_SERVER_URL)
+
+    page = _prototype_page(settings.TICKETS_PROTOTYPE_PATH)
+    if page is not None:
+        content, gzipped, etag = page
+        if etag_matches(request, etag):
+            response = HttpResponseNotModified()
+        elif 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+            response = HttpResponse(gzipped, content_type='text/html')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(content, content_type='text/html')
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
 
     user = request.user
     regs = Registration.objects.none()
     if user.is_authenticated:
-        regs = Registration.objects.filter(user=user)
+        regs = Registration.objects.filter(user=user).select_related('event')
     return render(request, 'events/ticket_list.html', {'registrations': regs, 'user': user})
 
-
 from .models import Wallet, Transaction
 from .serializers import WalletSerializer, TransactionSerializer
 from decimal import Decimal
@@ -1231,9 +1611,13 @@ class WalletViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='my_wallet')
     def my_wallet(self, request):
         """Get or create wallet for current user"""
-        wallet, created = Wallet.objects.get_or_create(user=request.user)
+        wallet, created = Wallet.objects.select_related('user').get_or_create(user_id=request.user.pk)
+        # user_username is part of the payload
+        etag = make_etag('wallet', wallet.pk, wallet.updated_at.isoformat(), wallet.user.updated_at.isoformat())
+        if etag_matches(request, etag):
+            return not_modified(etag, wallet.updated_at)
         serializer = self.get_serializer(wallet)
-        return Response(serializer.data)
+        return Response(serializer.data, headers={'ETag': etag})
     
     @action(detail=True, methods=['post'], url_path='add_funds')
     def add_funds(self, request, pk=None):
@@ -1251,20 +1635,11 @@ class WalletViewSet(viewsets.ModelViewSet):
             amount = Decimal(str(amount))
             if amount <= 0:
                 return Response({'detail': 'El monto debe ser mayor a 0'}, status=status.HTTP_400_BAD_REQUEST)
-        except (ValueError, TypeError):
+        except (ValueError, TypeError, ArithmeticError):
             return Response({'detail': 'Monto inválido'}, status=status.HTTP_400_BAD_REQUEST)
         
-        wallet.balance += amount
-        wallet.save()
-        
-        # Create transaction record
-        Transaction.objects.create(
-            wallet=wallet,
-            amount=amount,
-            transaction_type='deposit',
-            description=request.data.get('description', 'Depósito de fondos'),
-            balance_after=wallet.balance
-        )
+        from .ledger import post_transaction
+        post_transaction(wallet, amount, 'deposit', description=request.data.get('description', 'Depósito de fondos'))
         
         return Response({
             'detail': 'Fondos agregados exitosamente',
@@ -1279,10 +1654,36 @@ class WalletViewSet(viewsets.ModelViewSet):
             return Response({'detail': 'No tienes permiso para ver estas transacciones'}, 
                           status=status.HTTP_403_FORBIDDEN)
         
-        transactions = wallet.transactions.all()
+        transactions = wallet.transactions.select_related('event')
         serializer = TransactionSerializer(transactions, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'], url_path='statement')
+    def statement(self, request, pk=None):
+        """Paginated statement, newest first.
+
+        Query params: cursor (from the previous page's `next_cursor`), limit (max 200).
+        Pages are keyset queries over (wallet, created_at, id), so deep pages cost the same as the first.
+        """
+        from .ledger import statement_page, wallet_balance
+        wallet = self.get_object()
+        if wallet.user != request.user and not request.user.is_staff:
+            return Response({'detail': 'No tienes permiso para ver estas transacciones'},
+                          status=status.HTTP_403_FORBIDDEN)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 50)), 1), 200)
+        except ValueError:
+            return Response({'detail': 'limit debe ser un número'}, status=status.HTTP_400_BAD_REQUEST)
+        rows, next_cursor = statement_page(wallet, request.query_params.get('cursor'), limit)
+        if rows is None:
+            return Response({'detail': 'cursor inválido'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'balance': wallet_balance(wallet.pk),
+            'currency': wallet.currency,
+            'results': TransactionSerializer(rows, many=True).data,
+            'next_cursor': next_cursor,
+        })
+
 
 class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = TransactionSerializer
@@ -1293,3 +1694,67 @@ class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
         if user.is_staff:
             return Transaction.objects.all()
         return Transaction.objects.filter(wallet__user=user)
+
+
+from rest_framework.views import APIView
+
+
+class SyncView(APIView):
+    """Delta sync for the mobile app: `GET /api/sync/?since=<watermark>`.
+
+    Returns the events, own registrations, groups and wallet transactions
+    changed since the watermark, the ids deleted since then (`deleted`) and
+    the next `watermark`. Without `since` (or with one older than the
+    tombstone retention) everything is returned and `full` is true.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        from .sync import parse_watermark, sync_changes
+        since = parse_watermark(request.query_params.get('since'))
+        if since is False:
+            return Response({'detail': 'since debe ser una fecha ISO 8601 (el watermark de la última sincronización)'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(sync_changes(request, since))
+
+
+class BootstrapView(APIView):
+    """Home screen in one request: profile, wallet, registrations (with their event), upcoming events and groups.
+
+    Send the previous `ETag` in `If-None-Match` to get a 304 when nothing changed.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        from .bootstrap import home_etag, home_payload
+        etag = home_etag(request)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        return Response(home_payload(request), headers={'ETag': etag})
+
+
+from .models import ExportJob
+from .serializers import ExportJobSerializer
+
+
+class ExportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = ExportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_staff:
+            return ExportJob.objects.all()
+        # Jobs requested by the user or belonging to groups they administer
+        return ExportJob.objects.filter(dj_models.Q(requested_by=user) | dj_models.Q(group__admins=user)).distinct()
+
+    @action(detail=True, methods=['get'], url_path='download')
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != 'done' or not job.file:
+            return Response({'detail': 'El informe todavía no está disponible'}, status=status.HTTP_409_CONFLICT)
+        from django.http import FileResponse
+        from .exports import EXPORT_FORMATS
+        _, content_type = EXPORT_FORMATS[job.file_format]
+        return FileResponse(job.file.open('rb'), as_attachment=True,
+                            filename=f'informe_grupo_{job.group_id}.{job.file_format}', content_type=content_type)
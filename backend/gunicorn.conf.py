@@ -0,0 +1,12 @@
+"""Gunicorn settings, loaded automatically when gunicorn starts from this directory.
+
+Workers keep gunicorn's default class (sync, one request at a time) unless
+GUNICORN_WORKER_CLASS is set. A process that serves the live attendance
+stream (SSE) can use GUNICORN_WORKER_CLASS=gthread so each stream holds a
+thread instead of a whole worker; see DEPLOYMENT_GUIDE.md before doing so.
+"""
+import os
+
+if os.getenv('GUNICORN_WORKER_CLASS'):
+    worker_class = os.getenv('GUNICORN_WORKER_CLASS')
+    threads = int(os.getenv('GUNICORN_THREADS', '1'))
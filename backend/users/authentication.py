@@ -0,0 +1,115 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .tokens import SLIM_USER_FIELDS, USER_CLAIMS_KEY
+
+
+# Attribute of the Django HttpRequest holding the JWT authentication result
+JWT_RESULT_ATTR = '_jwt_auth_result'
+
+# Per-worker cache of slim user rows: user_id -> (expires_at, values)
+_user_cache = {}
+USER_CACHE_MAX_ENTRIES = 10000
+
+
+def invalidate_cached_user(user_id):
+    _user_cache.pop(user_id, None)
+
+
+def _slim_user(values):
+    """Build a User from a {field: value} dict of SLIM_USER_FIELDS.
+
+    The instance behaves like one loaded with `.only(*SLIM_USER_FIELDS)`, except
+    that the first access to another field loads the rest of the row in one
+    query (see `User.refresh_from_db`). Its flags come from a token claim or a cached
+    row and may be stale, so it is marked as a snapshot and `User.save()`
+    refuses to write it back without an explicit `update_fields`.
+    """
+    model = get_user_model()
+    # from_db() expects the values in concrete field order
+    names = [f.attname for f in model._meta.concrete_fields if f.attname in values]
+    user = model.from_db(DEFAULT_DB_ALIAS, names, [values[name] for name in names])
+    user._auth_snapshot = True
+    return user
+
+
+def _load_slim_user(user_id):
+    ttl = getattr(settings, 'JWT_USER_CACHE_TTL', 30)
+    now = time.monotonic()
+    entry = _user_cache.get(user_id)
+    if entry is not None and entry[0] > now:
+        return _slim_user(entry[1])
+    values = get_user_model().objects.filter(pk=user_id).values(*SLIM_USER_FIELDS).first()
+    if values is None:
+        invalidate_cached_user(user_id)
+        return None
+    if ttl > 0:
+        if len(_user_cache) >= USER_CACHE_MAX_ENTRIES:
+            _user_cache.clear()
+        _user_cache[user_id] = (now + ttl, values)
+    return _slim_user(values)
+
+
+class RequestCachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that runs at most once per request.
+
+    When `EmailVerificationMiddleware` is enabled it authenticates the bearer
+    token before the view runs; its result (or the exception it raised) is
+    stored on the underlying Django request and reused here, so the signature
+    check and the user lookup are not repeated by DRF. The middleware is not in
+    MIDDLEWARE at the moment, so DRF is the only caller and this sharing has no
+    effect until it is re-enabled.
+
+    The user itself is built from the token's `usr` claim when present (see
+    `users.tokens`), otherwise from a slim row cached per worker for
+    `JWT_USER_CACHE_TTL` seconds and dropped on `User` post_save/post_delete.
+    """
+
+    def authenticate(self, request):
+        http_request = getattr(request, '_request', request)
+        if hasattr(http_request, JWT_RESULT_ATTR):
+            result = getattr(http_request, JWT_RESULT_ATTR)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        try:
+            result = super().authenticate(request)
+        except Exception as e:
+            setattr(http_request, JWT_RESULT_ATTR, e)
+            raise
+        setattr(http_request, JWT_RESULT_ATTR, result)
+        return result
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN or api_settings.USER_ID_FIELD != 'id':
+            # Needs the password hash / a different lookup: use the stock query
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        try:
+            user_id = get_user_model()._meta.pk.to_python(user_id)
+        except ValidationError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        claims = validated_token.get(USER_CLAIMS_KEY)
+        if isinstance(claims, dict) and all(field in claims for field in SLIM_USER_FIELDS[1:]):
+            user = _slim_user({**claims, 'id': user_id})
+        else:
+            user = _load_slim_user(user_id)
+            if user is None:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
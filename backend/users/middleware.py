@@ -1,8 +1,11 @@
+import re
+
 from django.http import JsonResponse
 from django.conf import settings
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 
+from .authentication import RequestCachedJWTAuthentication
+
 
 class EmailVerificationMiddleware:
     """
@@ -29,14 +32,17 @@ class EmailVerificationMiddleware:
         '/static/',
         '/auth/',  # OAuth paths
     ]
-    
+    # Single anchored regex instead of one startswith() per entry
+    ALLOWED_PATHS_RE = re.compile('|'.join(re.escape(path) for path in ALLOWED_PATHS))
+
     def __init__(self, get_response):
         self.get_response = get_response
-        self.jwt_authenticator = JWTAuthentication()
+        # Shares its result with DRF, so the token is only verified once per request
+        self.jwt_authenticator = RequestCachedJWTAuthentication()
 
     def __call__(self, request):
         # Permitir acceso a rutas permitidas primero
-        if any(request.path.startswith(path) for path in self.ALLOWED_PATHS):
+        if self.ALLOWED_PATHS_RE.match(request.path):
             return self.get_response(request)
         
         # Intentar autenticar con JWT si no hay usuario autenticado
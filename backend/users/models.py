@@ -13,10 +13,28 @@ class User(AbstractUser):
     bio = models.TextField(blank=True, null=True, verbose_name='Biografía')
     email_verified = models.BooleanField(default=False, verbose_name='Email verificado')
     phone_verified = models.BooleanField(default=False, verbose_name='Teléfono verificado')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Última modificación')
     
     def __str__(self):
         return self.username
 
+    def save(self, *args, **kwargs):
+        # request.user built by users.authentication carries flags from a token or a
+        # cached row; a full save would write possibly stale is_staff/is_active/role back
+        if getattr(self, '_auth_snapshot', False) and kwargs.get('update_fields') is None:
+            raise ValueError('request.user is an authentication snapshot: save it with update_fields '
+                             'or reload it with User.objects.get(pk=...)')
+        super().save(*args, **kwargs)
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        # The snapshot only holds the slim fields: the first read of any other one
+        # loads all of them, instead of one query per deferred attribute
+        if getattr(self, '_auth_snapshot', False) and fields is not None:
+            deferred = self.get_deferred_fields()
+            if set(fields) <= deferred:
+                fields = deferred
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+
 
 class VerificationCode(models.Model):
     """Códigos de verificación para email y teléfono"""
@@ -3,7 +3,7 @@ Custom social auth pipeline for EventoApp
 """
 from django.shortcuts import redirect
 from django.conf import settings
-from rest_framework_simplejwt.tokens import RefreshToken
+from .tokens import UserClaimsRefreshToken
 import logging
 
 logger = logging.getLogger(__name__)
@@ -33,7 +33,7 @@ def redirect_with_jwt(backend, user, response, *args, **kwargs):
     """
     if user and user.is_authenticated:
         # Generate JWT tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = UserClaimsRefreshToken.for_user(user)
         access_token = str(refresh.access_token)
         refresh_token = str(refresh)
         
@@ -0,0 +1,14 @@
+"""Signal receivers for the users app."""
+from django.db.models.signals import post_delete, post_save
+
+from .authentication import invalidate_cached_user
+from .models import User
+
+
+def _invalidate_cached_user(sender, instance, **kwargs):
+    """Drop the worker-local copy used by JWT authentication (see users.authentication)."""
+    invalidate_cached_user(instance.pk)
+
+
+post_save.connect(_invalidate_cached_user, sender=User, dispatch_uid='jwt_user_cache_save')
+post_delete.connect(_invalidate_cached_user, sender=User, dispatch_uid='jwt_user_cache_delete')
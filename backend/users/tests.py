@@ -0,0 +1,72 @@
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from users.authentication import _user_cache
+from users.models import User, VerificationCode
+
+
+class SnapshotUserSaveTests(TestCase):
+    """request.user is built from token claims or a cached row and must not write stale flags back."""
+
+    def setUp(self):
+        _user_cache.clear()
+        caches['ratelimit'].clear()
+        self.user = User.objects.create_user(username='ana', email='ana@example.com', password='secret', is_staff=True)
+        self.client = APIClient()
+
+    def login(self):
+        response = self.client.post('/api/token/', {'username': 'ana', 'password': 'secret'}, format='json', secure=True)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def revoke_staff_elsewhere(self):
+        # As another worker would: no signal reaches this worker's cache
+        User.objects.filter(pk=self.user.pk).update(is_staff=False)
+
+    def verify_email(self):
+        code = VerificationCode.objects.create(user=self.user, verification_type='email')
+        response = self.client.post('/api/users/verify-email/', {'code': code.code}, format='json', secure=True)
+        self.assertEqual(response.status_code, 200)
+
+    def assert_flags(self):
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.email_verified)
+        self.assertFalse(self.user.is_staff)
+
+    @override_settings(JWT_EMBED_USER_CLAIMS=True)
+    def test_verify_email_keeps_revoked_staff_with_token_claims(self):
+        self.login()
+        self.revoke_staff_elsewhere()
+        self.verify_email()
+        self.assert_flags()
+
+    @override_settings(JWT_EMBED_USER_CLAIMS=False, JWT_USER_CACHE_TTL=300)
+    def test_verify_email_keeps_revoked_staff_with_cached_row(self):
+        self.login()
+        self.client.get('/api/users/me/', secure=True)  # caches the slim row
+        self.revoke_staff_elsewhere()
+        self.verify_email()
+        self.assert_flags()
+
+    def test_snapshot_refuses_full_save(self):
+        from users.authentication import _slim_user
+        snapshot = _slim_user({'id': self.user.pk, 'username': 'ana', 'is_staff': True})
+        with self.assertRaises(ValueError):
+            snapshot.save()
+
+
+class SnapshotUserDeferredFieldsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='ana', email='ana@example.com', password='secret',
+                                             first_name='Ana', phone='600000000')
+
+    def test_other_fields_load_in_one_query(self):
+        from users.authentication import _slim_user
+        from users.tokens import SLIM_USER_FIELDS
+        snapshot = _slim_user(User.objects.filter(pk=self.user.pk).values(*SLIM_USER_FIELDS).get())
+
+        with self.assertNumQueries(1):
+            values = (snapshot.phone, snapshot.first_name, snapshot.phone_verified, snapshot.bio, snapshot.last_login)
+
+        self.assertEqual(values[:2], ('600000000', 'Ana'))
+        self.assertEqual(snapshot.username, 'ana')
@@ -0,0 +1,58 @@
+"""JWT tokens that can carry a slim copy of the user.
+
+With `JWT_EMBED_USER_CLAIMS` enabled the access token includes the fields in
+`SLIM_USER_FIELDS` under the `usr` claim, and `users.authentication` builds
+`request.user` from it without querying the database. Claims are refreshed
+every time a new access token is issued (login or /api/token/refresh/), so a
+role or flag change reaches the client after at most ACCESS_TOKEN_LIFETIME.
+"""
+from django.conf import settings
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+
+# Fields needed by authentication and role checks. `id` comes from the user_id claim.
+SLIM_USER_FIELDS = (
+    'id', 'username', 'email', 'is_active', 'is_staff', 'is_superuser', 'role', 'email_verified',
+)
+
+USER_CLAIMS_KEY = 'usr'
+
+
+def slim_user_values(user):
+    """Values of SLIM_USER_FIELDS (without id) as a dict."""
+    return {field: getattr(user, field) for field in SLIM_USER_FIELDS if field != 'id'}
+
+
+def embed_user_claims(token, user):
+    if getattr(settings, 'JWT_EMBED_USER_CLAIMS', False):
+        token[USER_CLAIMS_KEY] = slim_user_values(user)
+    return token
+
+
+class UserClaimsRefreshToken(RefreshToken):
+    """RefreshToken whose access tokens carry the user claims when enabled."""
+
+    @classmethod
+    def for_user(cls, user):
+        return embed_user_claims(super().for_user(user), user)
+
+
+class UserClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = UserClaimsRefreshToken
+
+
+class UserClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Re-stamps the user claims so refreshed access tokens are not stale."""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        if getattr(settings, 'JWT_EMBED_USER_CLAIMS', False):
+            from .models import User
+            access = AccessToken(data['access'])
+            user = User.objects.filter(pk=access[api_settings.USER_ID_CLAIM]).first()
+            if user is not None:
+                access[USER_CLAIMS_KEY] = slim_user_values(user)
+                data['access'] = str(access)
+        return data
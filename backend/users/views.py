@@ -6,7 +6,9 @@ from django.core.mail import send_mail
 from django.conf import settings
 from django.utils import timezone
 from django.shortcuts import redirect
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView
+from evento_app.throttling import TokenBucketThrottle
+from .tokens import UserClaimsRefreshToken
 from .models import User, VerificationCode
 from .serializers import UserSerializer, UserRegistrationSerializer, UserUpdateSerializer
 import logging
@@ -18,6 +20,8 @@ class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Set per action for TokenBucketThrottle (see evento_app.throttling)
+    throttle_scope = None
 
     def get_serializer_class(self):
         if self.action in ['update', 'partial_update']:
@@ -71,7 +75,8 @@ class UserViewSet(viewsets.ModelViewSet):
         """Return the currently logged in user's profile."""
         if not request.user.is_authenticated:
             return Response({'detail': 'Not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
-        serializer = self.get_serializer(request.user)
+        # request.user only has the fields needed for authentication; load the full profile
+        serializer = self.get_serializer(User.objects.get(pk=request.user.pk))
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'], url_path='for_select')
@@ -99,12 +104,13 @@ class UserViewSet(viewsets.ModelViewSet):
             user.is_superuser = True
             user.is_staff = True
             user.email_verified = True
-            user.save()
+            user.save(update_fields=['is_superuser', 'is_staff', 'email_verified'])
             return Response({'detail': f'User {username} is now superuser'})
         except User.DoesNotExist:
             return Response({'detail': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    @action(detail=False, methods=['post'], permission_classes=[permissions.AllowAny], url_path='register')
+    @action(detail=False, methods=['post'], permission_classes=[permissions.AllowAny], url_path='register',
+            throttle_classes=[TokenBucketThrottle], throttle_scope='register')
     def register(self, request):
         """Public endpoint for user registration."""
         serializer = UserRegistrationSerializer(data=request.data)
@@ -121,7 +127,8 @@ class UserViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    @action(detail=False, methods=['post'], url_path='send-email-verification')
+    @action(detail=False, methods=['post'], url_path='send-email-verification',
+            throttle_classes=[TokenBucketThrottle], throttle_scope='email_verification')
     def send_email_verification(self, request):
         """Envía código de verificación por email"""
         user = request.user
@@ -201,7 +208,7 @@ EventoApp
             code.save()
             
             user.email_verified = True
-            user.save()
+            user.save(update_fields=['email_verified'])
             
             return Response({
                 'detail': 'Email verificado exitosamente',
@@ -214,7 +221,8 @@ EventoApp
                 status=status.HTTP_400_BAD_REQUEST
             )
     
-    @action(detail=False, methods=['post'], url_path='send-phone-verification')
+    @action(detail=False, methods=['post'], url_path='send-phone-verification',
+            throttle_classes=[TokenBucketThrottle], throttle_scope='phone_verification')
     def send_phone_verification(self, request):
         """Envía código de verificación por SMS (simulado por ahora)"""
         user = request.user
@@ -271,7 +279,7 @@ EventoApp
             code.save()
             
             user.phone_verified = True
-            user.save()
+            user.save(update_fields=['phone_verified'])
             
             return Response({
                 'detail': 'Teléfono verificado exitosamente',
@@ -285,6 +293,12 @@ EventoApp
             )
 
 
+class ThrottledTokenObtainPairView(TokenObtainPairView):
+    """/api/token/ with a per-IP token bucket against password guessing."""
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'login'
+
+
 class OAuthCallbackView(APIView):
     """
     View to handle OAuth callback and return JWT tokens.
@@ -324,7 +338,7 @@ class OAuthCallbackView(APIView):
             return redirect(f"{settings.FRONTEND_URL}/#/?error=oauth_failed")
         
         # Generate tokens if not in session
-        refresh = RefreshToken.for_user(user)
+        refresh = UserClaimsRefreshToken.for_user(user)
         access_token = str(refresh.access_token)
         refresh_token_str = str(refresh)
         